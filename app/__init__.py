@@ -2,19 +2,26 @@ import os
 
 from flask import Flask
 from flask_socketio import SocketIO
-from openai import OpenAI
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-from app.config import Configuration
+from app.config import CassetteMode, Configuration
+from app.llm import backends, telemetry
+from app.modules import cassette
+from app.modules.serialization import ORJSONProvider
 from app.modules.util import double_escape
 
 
 APP_ROOT = os.path.dirname(os.path.abspath(__file__))
 
-# Open AI configuration.
-openai_client = OpenAI(api_key=Configuration.OPENAI_API_KEY)
+# LLM configuration.
+llm_router = backends.load_llm_router(Configuration.LLM_BACKENDS_PATH)
+for backend in llm_router.backends:
+    if Configuration.CASSETTE_MODE != CassetteMode.OFF:
+        cassette.install(backend.client)
+    telemetry.install(backend.client)
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 app.config["PREFERRED_URL_SCHEME"] = "https"
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 app.config["TEMPLATES_AUTO_RELOAD"] = True
@@ -28,7 +35,7 @@ else:
     socketio = SocketIO(app, async_mode="gevent_uwsgi")
 
 
-from app import routes
+from app import commands, routes
 
 
 if __name__ == "__main__":
@@ -1,10 +1,13 @@
 import functools
+import ipaddress
 import random
+import secrets
 import uuid
 import warnings
 
 from flask import (
     abort,
+    jsonify,
     make_response,
     redirect,
     Response,
@@ -14,18 +17,23 @@ from flask import (
 )
 from werkzeug.exceptions import HTTPException
 
+from app import llm_router
 from app.config import (
     search_inspiration,
     Configuration,
+    EntryEventType,
     ProtocolKey,
+    RenderMode,
     ResponseStatus,
     UserTopicProficiency
 )
+from app.llm.telemetry import llm_call_aggregator, structured_output_tracker, token_usage_meter
 from app.modules import (
     entry,
     user,
     user_session
 )
+from app.modules.rendering import highlighted_code_cache, rendered_html_cache
 from app.modules.user import User
 from app.modules.user_session import UserSession
 
@@ -71,6 +79,32 @@ def _deprecated(func):
     return new_func
 
 
+def _entry_event_sources() -> list[EntryEventType]:
+    """
+    The sources of events an entry page asks for, as a comma-separated list
+    in the `sources` argument. Unknown ones are left out.
+    """
+
+    ret: list[EntryEventType] = []
+    for source in request.args.get(ProtocolKey.SOURCES, "").split(","):
+        try:
+            ret.append(EntryEventType(source))
+        except ValueError:
+            pass
+    return ret
+
+
+def _last_event_id() -> int | None:
+    """
+    The ID of the last event an EventSource got before it reconnected.
+    """
+
+    try:
+        return int(request.headers["Last-Event-ID"])
+    except (KeyError, ValueError):
+        return None
+
+
 def _map_response_status(response_status: ResponseStatus) -> int:
     """
     Maps service response status codes to HTTP response status codes."""
@@ -108,6 +142,47 @@ def _map_response_status(response_status: ResponseStatus) -> int:
     return ret
 
 
+def _operator_required(func):
+    """
+    [DECORATOR] Only lets operators through: requests that carry the
+    `OPERATOR_TOKEN` as a bearer token or, without one configured,
+    requests made from the server itself.
+    """
+
+    @functools.wraps(func)
+    def wrapper_operator_required(*args, **kwargs):
+        authorized = False
+        if Configuration.OPERATOR_TOKEN:
+            authorization = request.headers.get("Authorization", "")
+            authorized = secrets.compare_digest(authorization.encode("utf-8"), f"Bearer {Configuration.OPERATOR_TOKEN}".encode("utf-8"))
+        else:
+            try:
+                # Behind the proxy, this is the client's address (see ProxyFix).
+                authorized = ipaddress.ip_address(request.remote_addr).is_loopback
+            except ValueError:
+                pass
+
+        if authorized:
+            value = func(*args, **kwargs)
+        else:
+            abort(_map_response_status(ResponseStatus.FORBIDDEN))
+
+        return value
+    return wrapper_operator_required
+
+
+def _render_mode() -> RenderMode:
+    """
+    Who renders the Markdown of streamed sections, as asked for in the
+    `render` argument. The server, by default.
+    """
+
+    try:
+        return RenderMode(request.args.get(ProtocolKey.RENDER, RenderMode.SERVER.value))
+    except ValueError:
+        return RenderMode.SERVER
+
+
 def _session_id() -> str:
     session_id = request.cookies.get(ProtocolKey.USER_SESSION_ID)
     if not session_id:
@@ -276,6 +351,28 @@ def get_entry_cover_image(entry_id: str) -> Response:
     )
 
 
+def get_entry_events(entry_id: str) -> Response:
+    return Response(
+        stream_with_context(
+            entry.get_events(
+                uuid.UUID(entry_id),
+                sources=_entry_event_sources(),
+                render_mode=_render_mode(),
+                # It has the positions of each of the channel's streams.
+                last_event_id=request.headers.get("Last-Event-ID")
+            )
+        ),
+        content_type="text/event-stream"
+    )
+
+
+def get_entry_header(entry_id: str) -> Response:
+    return Response(
+        stream_with_context(entry.get_header(uuid.UUID(entry_id))),
+        content_type="text/event-stream"
+    )
+
+
 def get_entry_related_topics(entry_id: str) -> Response:
     return Response(
         stream_with_context(entry.get_related_topics(uuid.UUID(entry_id))),
@@ -283,6 +380,27 @@ def get_entry_related_topics(entry_id: str) -> Response:
     )
 
 
+@_operator_required
+def get_metrics() -> Response:
+    """
+    LLM call telemetry is per process, so every worker reports its own.
+    """
+
+    return jsonify({
+        "llm_backends": llm_router.snapshot(),
+        "llm_calls": llm_call_aggregator.snapshot(),
+        "markdown_caches": {
+            "highlighted_code": highlighted_code_cache.snapshot(),
+            "rendered_html": rendered_html_cache.snapshot()
+        },
+        "structured_output": structured_output_tracker.snapshot(),
+        "token_usage": {
+            "models": token_usage_meter.snapshot(),
+            "cost_usd": token_usage_meter.cost()
+        }
+    })
+
+
 def index() -> Response:
     session_id = _session_id()
     if session_id and UserSession.exists(session_id):
@@ -493,18 +611,32 @@ def make_chat_completion(entry_id: str) -> Response:
 
 def make_entry_section(section_id: str) -> Response:
     return Response(
-        stream_with_context(entry.make_section(uuid.UUID(section_id))),
+        stream_with_context(
+            entry.make_section(uuid.UUID(section_id), render_mode=_render_mode(), last_event_id=_last_event_id())
+        ),
         content_type="text/event-stream"
     )
 
 
 def make_entry_sections(entry_id: str) -> Response:
     return Response(
-        stream_with_context(entry.make_sections(uuid.UUID(entry_id))),
+        stream_with_context(
+            entry.make_sections(uuid.UUID(entry_id), render_mode=_render_mode(), last_event_id=_last_event_id())
+        ),
         content_type="text/event-stream"
     )
 
 
+def send_entry_channel_command(entry_id: str,
+                               channel_id: str) -> Response:
+    service_response = entry.send_channel_command(
+        uuid.UUID(entry_id),
+        uuid.UUID(channel_id),
+        request.get_json(silent=True)
+    )
+    return make_response(service_response[0], _map_response_status(service_response[1]))
+
+
 @_auth_required
 def remove_entry(entry_id: str) -> Response:
     session_id = _session_id()
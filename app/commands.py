@@ -0,0 +1,191 @@
+import concurrent.futures
+import json
+import os
+import threading
+import time
+
+import click
+
+from app import app
+from app.config import Configuration, UserTopicProficiency, search_inspiration
+from app.llm.telemetry import token_usage_meter
+from app.modules import entry, markdown_storage, util
+
+
+###########
+# CLASSES #
+###########
+
+
+class PregenerationCheckpoint:
+    """
+    The jobs that finished so far, saved after each one so that an
+    interrupted run can pick up where it left off.
+    """
+
+    def __init__(self,
+                 path: str) -> None:
+        self.completed: dict[str, dict] = {}
+        self.path: str = path
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.completed = json.load(f).get("completed", {})
+
+    def add(self,
+            key: str,
+            result: dict) -> None:
+        with self._lock:
+            self.completed[key] = result
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"completed": self.completed}, f, indent=2)
+            os.replace(temp_path, self.path)
+
+
+####################
+# MODULE FUNCTIONS #
+####################
+
+
+def entry_is_complete(e: entry.Entry) -> bool:
+    if not e or not e.summary or not e.sections:
+        return False
+
+    for section in e.sections:
+        if not section.content_md:
+            return False
+
+        for subsection in section.subsections:
+            if not subsection.content_md:
+                return False
+
+    return True
+
+
+def read_topics(path: str | None) -> list[str]:
+    if not path:
+        return list(search_inspiration)
+
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+@app.cli.command("backfill-rendered-html")
+@click.option("--batch-size", default=500, show_default=True, type=click.IntRange(min=1),
+              help="Rows updated per transaction.")
+def backfill_rendered_html(batch_size: int) -> None:
+    """
+    Brings stored sections, stats and chat messages in line with
+    MARKDOWN_ONLY_STORAGE and the current renderer: drops their HTML, or
+    renders it again where it's missing or stale.
+    """
+
+    markdown_storage.migrate_schema()
+    for table in markdown_storage.markdown_storage_columns:
+        start_time = time.monotonic()
+        count = markdown_storage.backfill(table, batch_size=batch_size)
+        click.echo(f"{table}: {count} rows ({time.monotonic() - start_time:.1f}s)")
+
+
+@app.cli.command("pregenerate")
+@click.option("--topics", "topics_path", type=click.Path(exists=True, dir_okay=False),
+              help="File with one topic per line. Defaults to the search inspiration list.")
+@click.option("--proficiency", "proficiencies", multiple=True, default=["intermediate"],
+              type=click.Choice([p.name.lower() for p in UserTopicProficiency]),
+              help="Proficiency level to make entries for. Repeat for several.")
+@click.option("--concurrency", default=4, show_default=True, type=click.IntRange(min=1),
+              help="Entries made at the same time.")
+@click.option("--token-budget", default=0, show_default=True, type=click.IntRange(min=0),
+              help="Stop starting new entries once this many tokens were spent. 0 means no limit.")
+@click.option("--checkpoint", "checkpoint_path", default="pregeneration_checkpoint.json", show_default=True,
+              type=click.Path(dir_okay=False), help="Progress file used to resume an interrupted run.")
+@click.option("--report", "report_path", type=click.Path(dir_okay=False),
+              help="Also write the final report to this JSON file.")
+@click.option("--user-id", default=Configuration.PREGENERATION_USER_ID, type=int,
+              help="Owner of the entries. Defaults to PREGENERATION_USER_ID.")
+def pregenerate(topics_path: str | None,
+                proficiencies: tuple[str, ...],
+                concurrency: int,
+                token_budget: int,
+                checkpoint_path: str,
+                report_path: str | None,
+                user_id: int | None) -> None:
+    """
+    Makes complete entries ahead of time so that visitors don't wait.
+    """
+
+    if not user_id:
+        raise click.UsageError("Pregenerated entries need an owner; set PREGENERATION_USER_ID or pass --user-id.")
+
+    checkpoint = PregenerationCheckpoint(checkpoint_path)
+    jobs = [
+        (topic, UserTopicProficiency[proficiency.upper()])
+        for topic in read_topics(topics_path)
+        for proficiency in proficiencies
+    ]
+    pending_jobs = [job for job in jobs if f"{job[0]}|{job[1].name}" not in checkpoint.completed]
+    click.echo(f"{len(jobs)} entries, {len(jobs) - len(pending_jobs)} already done, {len(pending_jobs)} to make.")
+
+    tokens_at_start = token_usage_meter.total_tokens()
+    cost_at_start = token_usage_meter.cost()
+    budget_exhausted = threading.Event()
+    latencies: list[float] = []
+    failures: list[str] = []
+    lock = threading.Lock()
+
+    def make_entry(topic: str,
+                   proficiency: UserTopicProficiency) -> None:
+        key = f"{topic}|{proficiency.name}"
+        if token_budget and token_usage_meter.total_tokens() - tokens_at_start >= token_budget:
+            budget_exhausted.set()
+            return
+
+        start_time = time.monotonic()
+        try:
+            e = entry.pregenerate(topic, proficiency, user_id)
+        except Exception as error:
+            print(error)
+            e = None
+        elapsed = time.monotonic() - start_time
+
+        if entry_is_complete(e):
+            checkpoint.add(key, {"entry_id": str(e.id), "seconds": round(elapsed, 3)})
+            with lock:
+                latencies.append(elapsed)
+            click.echo(f"✓ {key} ({elapsed:.1f}s)")
+        else:
+            with lock:
+                failures.append(key)
+            click.echo(f"✗ {key} ({elapsed:.1f}s)", err=True)
+
+    start_time = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(make_entry, *job) for job in pending_jobs]:
+            future.result()
+    elapsed = time.monotonic() - start_time
+
+    tokens = token_usage_meter.total_tokens() - tokens_at_start
+    report = {
+        "completed": len(latencies),
+        "failed": failures,
+        "stopped_by_budget": budget_exhausted.is_set(),
+        "seconds": round(elapsed, 3),
+        "entries_per_minute": round(len(latencies) / elapsed * 60, 2) if elapsed else 0.0,
+        "latency_seconds": {
+            "p50": round(util.percentile(latencies, 50), 3),
+            "p90": round(util.percentile(latencies, 90), 3),
+            "p99": round(util.percentile(latencies, 99), 3),
+            "max": round(max(latencies, default=0.0), 3)
+        },
+        "tokens": tokens,
+        "tokens_per_entry": round(tokens / len(latencies)) if latencies else 0,
+        "cost_usd": round(token_usage_meter.cost() - cost_at_start, 4)
+    }
+
+    click.echo(json.dumps(report, indent=2))
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -8,6 +8,12 @@ class AzureOpenAIDeployment:
     TEXT_EMBEDDING = "text-embedding-ada-002"
 
 
+class CassetteMode(str, Enum):
+    OFF = "off"
+    RECORD = "record"
+    REPLAY = "replay"
+
+
 class ChatMessageSenderRole(str, Enum):
     ASSISTANT = "assistant"
     SYSTEM = "system"
@@ -21,16 +27,79 @@ class Configuration:
     AWS_EC2_PROD_DATABASE_01 = os.getenv("DB_HOST", "localhost")
     # Make sure this matches your local development server.
     BASE_URL = os.getenv("BASE_URL", "http://127.0.0.1:8000" if DEBUG else "https://mycyclopedia.co")
+    CASSETTE_DIR = os.getenv("CASSETTE_DIR", os.path.join(os.path.dirname(APP_ROOT), "cassettes"))
+    CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "1"))  # 0 replays without waiting.
+    CASSETTE_MODE = CassetteMode(os.getenv("CASSETTE_MODE", CassetteMode.OFF.value))
+    # Answers first-turn entry chat questions from earlier answers to near-identical ones.
+    CHAT_ANSWER_CACHE_ENABLED = os.getenv("CHAT_ANSWER_CACHE_ENABLED", "0") == "1"
+    CHAT_ANSWER_CACHE_MAX_ANSWERS = 64  # Per section and selected context.
+    CHAT_ANSWER_CACHE_MAX_KEYS = 4096
+    CHAT_ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("CHAT_ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+    # Entry chat turns kept verbatim in the prompt; older ones are folded into a running summary.
+    CHAT_MEMORY_RECENT_TURNS = 4
+    CHAT_MEMORY_SUMMARY_MAX_WORKERS = 4
     CHAT_MESSAGE_MAX_LEN = 2048
     CHAT_PURGE_CHECK_INTERVAL = 60  # Seconds
     DATABASE_NAME = os.getenv("DB_NAME", "mycyclopedia")
     DATABASE_USER = os.getenv("DB_USER", "postgres")
+    # An entry page's event stream stays open this long with nothing to send, for the commands the page sends it.
+    # It takes one of uWSGI's async cores meanwhile; the page opens it again for a later command.
+    ENTRY_CHANNEL_IDLE_TIMEOUT = 30  # Seconds.
+    ENTRY_CHANNEL_KEEPALIVE_INTERVAL = 15  # Seconds.
+    # Below uWSGI's harakiri. The browser then reconnects and the stream resumes.
+    ENTRY_CHANNEL_MAX_DURATION = 540  # Seconds.
+    # Per process. Entry page streams are greenlets, bounded only by uWSGI's async cores, and take a thread
+    # only while one of their sources runs (four at most when a new entry is opened, then one per section
+    # asked for). A source holds its thread through a few queries, an LLM call or generation, or a wait on
+    # another worker, which notifications end early and which ends with the stream. No more LLM calls than
+    # the backends' combined max_concurrency run at once, so more threads than that would only queue in the
+    # router: 0 sizes the pool to it. Sources beyond the threads wait for one, up to ENTRY_CHANNEL_MAX_QUEUED,
+    # and the rest end at once with an error.
+    ENTRY_CHANNEL_MAX_QUEUED = 1024
+    ENTRY_CHANNEL_MAX_WORKERS = int(os.getenv("ENTRY_CHANNEL_MAX_WORKERS", "0"))
+    # Fragments of a section that complete this soon after the last write of its events are written with the next one.
+    ENTRY_EVENT_FLUSH_INTERVAL = 0.25  # Seconds.
+    # Seconds that the generation events of sections are kept, for the requests following them.
+    ENTRY_EVENT_RETENTION = 3600
+    ENTRY_HEADER_SINGLE_CALL = os.getenv("ENTRY_HEADER_SINGLE_CALL", "1") == "1"
+    ENTRY_HEADER_WAIT_TIMEOUT = 120  # Seconds.
+    ENTRY_PIPELINE_MAX_WORKERS = 32
     ENTRY_PURGE_CHECK_INTERVAL = 60  # Seconds
+    # Waiters are woken when a lock is released. This is for the notifications that are lost.
+    GENERATION_LOCK_POLL_INTERVAL = 5  # Seconds.
+    GENERATION_LOCK_WAIT_TIMEOUT = 300  # Seconds.
+    # YAML or JSON file of per-task overrides of the generation profiles in app/llm/profiles.py.
+    GENERATION_PROFILES_PATH = os.getenv("GENERATION_PROFILES_PATH") or None
+    HIGHLIGHTED_CODE_CACHE_SIZE = 2048  # Fenced code blocks.
+    # Fraction of LLM calls whose full telemetry record is also saved to the database.
+    LLM_TELEMETRY_SAMPLE_RATE = float(os.getenv("LLM_TELEMETRY_SAMPLE_RATE", "0"))
+    # YAML or JSON list of LLM backends to route calls between (see app/llm/backends.py).
+    LLM_BACKENDS_PATH = os.getenv("LLM_BACKENDS_PATH") or None
+    LLM_BACKEND_MAX_CONCURRENCY = 64  # Default calls in flight per backend.
+    LLM_BACKEND_QUEUE_TIMEOUT = 60  # Seconds to wait for a free slot when every backend is busy.
+    LLM_ROUTER_COOLDOWN = 30  # Seconds a backend with a high error rate is tried last.
+    LLM_ROUTER_ERROR_RATE_THRESHOLD = 0.5
+    LLM_ROUTER_EWMA_ALPHA = 0.2
+    # Save only the Markdown of sections, stats and chat messages, and render their HTML when read.
+    MARKDOWN_ONLY_STORAGE = os.getenv("MARKDOWN_ONLY_STORAGE", "0") == "1"
+    # Markdown at least this long (in characters) is rendered in a worker process, off the gevent hub. 0 workers turns this off.
+    MARKDOWN_PROCESS_POOL_THRESHOLD = 8192
+    MARKDOWN_PROCESS_POOL_WORKERS = int(os.getenv("MARKDOWN_PROCESS_POOL_WORKERS", "2"))
+    NOTIFICATION_RECONNECT_INTERVAL = 5  # Seconds.
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+    # Point this at an OpenAI-compatible server (e.g. mock_openai.py) instead of the real API.
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+    OPENAI_REPAIR_MAX_ATTEMPTS = 2
     OPENAI_RETRY_MAX_ATTEMPTS = 5
     OPENAI_RETRY_DELAY = 3  # Seconds.
+    # Bearer token for the operator-only endpoints (e.g. /actuator/metrics). Without one, they only answer the server itself.
+    OPERATOR_TOKEN = os.getenv("OPERATOR_TOKEN") or None
+    # Owner of pregenerated entries (see `flask pregenerate`), which are then served to every visitor.
+    PREGENERATION_USER_ID = int(os.getenv("PREGENERATION_USER_ID", "0")) or None
+    RENDERED_HTML_CACHE_SIZE = 4096
     SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY", "")
     TOPIC_MAX_LEN = 256
+    TOPIC_NORMALIZATION_CACHE_SIZE = 4096
     USER_ACCOUNT_MAX_COUNT = 5
     # --
     # DIRECTORY PATHS
@@ -41,61 +110,145 @@ class Configuration:
 
 
 class DatabaseTable:
+    ANALYTICS_ENTRY_STAGE_TIMING = "analytics_entry_stage_timing_"
+    ANALYTICS_LLM_CALL = "analytics_llm_call_"
     ANALYTICS_TOPIC_HISTORY = "analytics_topic_history_"
     CHAT = "chat_"
     CHAT_MESSAGE = "chat_message_"
     ENTRY = "entry_"
     ENTRY_COVER_IMAGE = "entry_cover_image_"
+    ENTRY_EVENT = "entry_event_"
     ENTRY_FUN_FACT = "entry_fun_fact_"
     ENTRY_RELATED_TOPIC = "entry_related_topic_"
     ENTRY_SECTION = "entry_section_"
     ENTRY_STAT = "entry_stat_"
+    TOPIC_NORMALIZATION = "topic_normalization_"
     USER = "user_"
     USER_SESSION = "user_session_"
 
 
+class EntryChannelCommand(str, Enum):
+    MAKE_SECTION = "make_section"
+
+
+class EntryEventType(str, Enum):
+    """
+    The types of the events of an entry page's event stream. Each source of
+    events has its own type. So do the sections generated on command.
+    """
+
+    COVER_IMAGE = "cover_image"
+    # A source, or a section made on command, has sent everything it had.
+    DONE = "done"
+    HEADER = "header"
+    READY = "ready"
+    RELATED_TOPICS = "related_topics"
+    SECTION = "section"
+    SECTIONS = "sections"
+
+
+class GenerationArtifact(str, Enum):
+    COVER_IMAGE = "cover_image"
+    HEADER = "header"
+    RELATED_TOPICS = "related_topics"
+    SECTION = "section"
+    TABLE_OF_CONTENTS = "table_of_contents"
+
+
+class GenerationEventType(str, Enum):
+    """
+    What the request generating a section logs for the requests waiting on
+    it (see `EntryBroadcast`).
+    """
+
+    FRAGMENT = "fragment"
+    SAVED = "saved"
+    STARTED = "started"
+
+
+class LLMTask(str, Enum):
+    CHAT = "chat"
+    CHAT_SUMMARY = "chat_summary"
+    EMBEDDING = "embedding"
+    FACTS = "facts"
+    HEADER = "header"
+    RELATED = "related"
+    SECTION = "section"
+    STATS = "stats"
+    SUMMARY = "summary"
+    TITLE = "title"
+    TOC = "toc"
+
+
+class MarkdownProfile(str, Enum):
+    CHAT = "chat"
+    CHAT_MESSAGE = "chat_message"
+    SECTION = "section"
+    STAT = "stat"
+    USER_MESSAGE = "user_message"
+
+
 class OpenAIModel:
     GPT_35 = "gpt-3.5-turbo"
     GPT_35_16K = "gpt-3.5-turbo-1106"
     GPT_4 = "gpt-4"
     GPT_4_TURBO = "gpt-4-1106-preview"
+    TEXT_EMBEDDING = "text-embedding-ada-002"
 
 
 class ProtocolKey(str):
+    ATTEMPT = "attempt"
+    BACKEND = "backend"
     CAPTION = "caption"
     CHAT = "chat"
     CHAT_ID = "chat_id"
+    COMMAND = "command"
+    COMPLETION_TOKENS = "completion_tokens"
     CONTENT_HTML = "content_html"
     CONTENT_MARKDOWN = "content_md"
     CONTEXT = "context"
     COVER_IMAGE = "cover_image"
     CREATION_DATE = "creation_date"
     CREATION_TIMESTAMP = "creation_timestamp"
+    DATA = "data"
+    DURATION_MS = "duration_ms"
     EMAIL_ADDRESS = "email_address"
     ENTRY_ID = "entry_id"
     ERROR = "error"
     ERROR_CODE = "error_code"
     ERROR_MESSAGE = "error_message"
+    FINISH_REASON = "finish_reason"
+    FRAGMENT_HTML = "fragment_html"
+    FRAGMENT_MARKDOWN = "fragment_md"
     FUN_FACTS = "fun_facts"
     ID = "id"
     INDEX = "index"
+    KEY = "key"
     IP_ADDRESS = "ip_address"
     LAST_ACTIVITY = "last_activity"
+    LAST_EVENT_ID = "last_event_id"
+    LATENCY_MS = "latency_ms"
     LOCATION = "location"
     MAC_ADDRESS = "mac_address"
     MESSAGE = "message"
     MESSAGE_ID = "message_id"
     MESSAGES = "messages"
+    MODEL = "model"
     NAME = "name"
     NAME_HTML = "name_html"
     NAME_MARKDOWN = "name_md"
     OFFSET = "offset"
     PARENT_ID = "parent_id"
+    PART_ID = "part_id"
     PASSWORD = "password"
     PERMALINK = "permalink"
     PROFICIENCY = "proficiency"
+    PROMPT_TOKENS = "prompt_tokens"
     QUERY = "query"
     RELATED_TOPICS = "related_topics"
+    RENDER = "render"
+    RENDERER_VERSION = "renderer_version"
+    REPAIR = "repair"
     RESET = "reset"
     SALT = "salt"
     SECTION_ID = "section_id"
@@ -105,11 +258,17 @@ class ProtocolKey(str):
     SENDER_ROLE = "sender_role"
     SESSION_ID = "session_id"
     SOURCE = "source"
+    SOURCES = "sources"
+    STAGE = "stage"
+    START_OFFSET_MS = "start_offset_ms"
     STATS = "stats"
+    STREAM = "stream"
     SUBSECTIONS = "subsections"
     SUMMARY = "summary"
+    TASK = "task"
     TITLE = "title"
     TOPIC = "topic"
+    TYPE = "type"
     USER = "user"
     USER_ID = "user_id"
     USER_SESSION = "user_session"
@@ -122,6 +281,12 @@ class ProtocolKey(str):
     VALUE_MARKDOWN = "value_md"
 
 
+class RenderMode(str, Enum):
+    # The browser renders the Markdown of streamed sections itself.
+    CLIENT = "client"
+    SERVER = "server"
+
+
 class ResponseStatus(IntEnum):
     # Generic
     OK = 0
@@ -172,6 +337,15 @@ openai_model_context_len = {
     OpenAIModel.GPT_4_TURBO: 128_000
 }
 
+# US dollars per 1,000 (prompt, completion) tokens.
+openai_model_pricing = {
+    OpenAIModel.GPT_35: (0.0015, 0.002),
+    OpenAIModel.GPT_35_16K: (0.001, 0.002),
+    OpenAIModel.GPT_4: (0.03, 0.06),
+    OpenAIModel.GPT_4_TURBO: (0.01, 0.03),
+    OpenAIModel.TEXT_EMBEDDING: (0.0001, 0.0)
+}
+
 openai_model_token_limits = {
     OpenAIModel.GPT_35: 4_096,
     OpenAIModel.GPT_35_16K: 4_096,
@@ -0,0 +1,464 @@
+"""
+LLM backends and the router that picks one for every call.
+
+A backend is anything that serves the OpenAI API: OpenAI itself, an Azure
+OpenAI resource or an OpenAI-compatible server such as vLLM, Ollama or
+mock_openai.py. The router sends each call to the backend expected to
+answer soonest, judged by moving averages of its latency (per task) and
+error rate, and fails over to the next one on connection errors, timeouts,
+rate limits and server errors.
+
+Backends are listed in a YAML (or JSON) file at LLM_BACKENDS_PATH, e.g.
+
+    - name: openai
+      type: openai
+      api_key_env: OPENAI_API_KEY
+      max_concurrency: 32
+    - name: azure-east
+      type: azure
+      endpoint: https://example-east.openai.azure.com
+      api_key_env: AZURE_OPENAI_API_KEY
+      api_version: 2024-06-01
+      max_concurrency: 16
+    - name: local
+      type: openai_compatible
+      base_url: http://127.0.0.1:8100/v1
+      models:
+        "*": mistral-7b-instruct
+
+Without one, every call goes to OpenAI (or OPENAI_BASE_URL) as before.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Iterator
+
+import openai
+from openai import AzureOpenAI, OpenAI
+import yaml
+
+from app.config import AzureOpenAIDeployment, Configuration, OpenAIModel
+
+
+###########
+# CLASSES #
+###########
+
+
+class LLMBackendUnavailableError(RuntimeError):
+    """
+    Raised when no backend can serve a model, or none had a free slot in
+    time.
+    """
+
+
+class LLMBackend:
+    def __init__(self,
+                 name: str,
+                 client: OpenAI,
+                 max_concurrency: int = Configuration.LLM_BACKEND_MAX_CONCURRENCY,
+                 models: dict[str, str] = None) -> None:
+        """
+        `models` maps the app's model names to the backend's. A "*" entry
+        maps every other model, and without a mapping, names pass through.
+        """
+
+        if not isinstance(name, str):
+            raise TypeError(f"Argument 'name' must be of type str, not {type(name)}.")
+
+        if not isinstance(max_concurrency, int) or max_concurrency < 1:
+            raise ValueError(f"Argument 'max_concurrency' must be a positive int, not {max_concurrency}.")
+
+        self.client: OpenAI = client
+        self.error_rate: float = 0.0
+        self.last_failure: float = 0.0
+        # Per task, in seconds.
+        self.latencies: dict[str, float] = {}
+        self.max_concurrency: int = max_concurrency
+        self.models: dict[str, str] = models or {}
+        self.name: str = name
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight: int = 0
+
+    def __repr__(self) -> str:
+        return f"LLM Backend '{self.name}'"
+
+    def acquire(self,
+                timeout: float = None) -> bool:
+        acquired = self._semaphore.acquire(blocking=timeout is not None, timeout=timeout)
+        if acquired:
+            with self._lock:
+                self._in_flight += 1
+        return acquired
+
+    def degraded(self) -> bool:
+        """
+        Whether the backend is failing too often to be tried first. After a
+        cooldown without failures it gets traffic again, which either
+        brings its error rate back down or renews the cooldown.
+        """
+
+        with self._lock:
+            return (
+                self.error_rate >= Configuration.LLM_ROUTER_ERROR_RATE_THRESHOLD and
+                time.monotonic() - self.last_failure < Configuration.LLM_ROUTER_COOLDOWN
+            )
+
+    def expected_latency(self,
+                         task: str) -> float:
+        """
+        The latency of the task's calls, divided by the share of calls that
+        succeed: the expected wait for an answer. Backends that haven't
+        served the task yet come first, so that they get measured.
+        """
+
+        with self._lock:
+            latency = self.latencies.get(task)
+            if latency is None:
+                return 0.0
+            return latency / max(1.0 - self.error_rate, 0.05)
+
+    def record(self,
+               task: str,
+               latency: float,
+               failed: bool = False) -> None:
+        alpha = Configuration.LLM_ROUTER_EWMA_ALPHA
+        with self._lock:
+            self.error_rate = alpha * (1.0 if failed else 0.0) + (1 - alpha) * self.error_rate
+            if failed:
+                self.last_failure = time.monotonic()
+            else:
+                previous = self.latencies.get(task)
+                self.latencies[task] = latency if previous is None else alpha * latency + (1 - alpha) * previous
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._semaphore.release()
+
+    def resolve_model(self,
+                      model: str) -> str | None:
+        """
+        Returns the backend's name for the model, or None if it doesn't
+        serve it.
+        """
+
+        if not self.models:
+            return model
+        return self.models.get(model) or self.models.get("*")
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "error_rate": self.error_rate,
+                "in_flight": self._in_flight,
+                "latency_seconds": dict(self.latencies),
+                "max_concurrency": self.max_concurrency
+            }
+
+
+class LLMStream:
+    """
+    A streamed response that holds its backend's slot until it is exhausted
+    or closed, and only then records the call's latency, so that streams
+    count against the backend's concurrency and latency like other calls.
+    """
+
+    def __init__(self,
+                 chunks: Iterator[Any],
+                 backend: LLMBackend,
+                 task: str,
+                 start_time: float) -> None:
+        self.backend: LLMBackend = backend
+        self.task: str = task
+        self._chunks: Iterator[Any] = chunks
+        self._closed: bool = False
+        self._start_time: float = start_time
+
+    def __del__(self) -> None:
+        self.close()
+
+    def __iter__(self) -> "LLMStream":
+        return self
+
+    def __next__(self) -> Any:
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            self.close()
+            raise
+        except LLMRouter.FAILOVER_ERRORS:
+            self.close(failed=True)
+            raise
+        except Exception:
+            self.close()
+            raise
+
+    def close(self,
+              failed: bool = False) -> None:
+        if self._closed:
+            return
+
+        self._closed = True
+        try:
+            close_stream(self._chunks)
+        finally:
+            self.backend.record(self.task, time.monotonic() - self._start_time, failed=failed)
+            self.backend.release()
+
+
+class OpenAIBackend(LLMBackend):
+    def __init__(self,
+                 name: str,
+                 api_key: str,
+                 base_url: str = None,
+                 max_concurrency: int = Configuration.LLM_BACKEND_MAX_CONCURRENCY,
+                 max_retries: int = 0,
+                 models: dict[str, str] = None) -> None:
+        """
+        The client's own retries delay failing over, so they're off unless
+        there's nothing to fail over to.
+        """
+
+        super().__init__(
+            name,
+            OpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries),
+            max_concurrency=max_concurrency,
+            models=models
+        )
+
+
+class AzureOpenAIBackend(LLMBackend):
+    """
+    Azure serves models as named deployments, by default those in
+    `AzureOpenAIDeployment`.
+    """
+
+    def __init__(self,
+                 name: str,
+                 api_key: str,
+                 endpoint: str,
+                 api_version: str,
+                 max_concurrency: int = Configuration.LLM_BACKEND_MAX_CONCURRENCY,
+                 deployments: dict[str, str] = None) -> None:
+        super().__init__(
+            name,
+            AzureOpenAI(api_key=api_key, api_version=api_version, azure_endpoint=endpoint, max_retries=0),
+            max_concurrency=max_concurrency,
+            models=deployments or {
+                OpenAIModel.GPT_35: AzureOpenAIDeployment.GPT_35,
+                OpenAIModel.GPT_35_16K: AzureOpenAIDeployment.GPT_35_16K,
+                OpenAIModel.TEXT_EMBEDDING: AzureOpenAIDeployment.TEXT_EMBEDDING
+            }
+        )
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    A self-hosted or third-party server implementing the OpenAI API.
+    """
+
+    def __init__(self,
+                 name: str,
+                 base_url: str,
+                 api_key: str = "none",
+                 max_concurrency: int = Configuration.LLM_BACKEND_MAX_CONCURRENCY,
+                 models: dict[str, str] = None) -> None:
+        super().__init__(
+            name,
+            OpenAI(api_key=api_key, base_url=base_url, max_retries=0),
+            max_concurrency=max_concurrency,
+            models=models
+        )
+
+
+class LLMRouter:
+    # Errors worth trying another backend for; anything else (e.g. a bad request) would fail there too.
+    FAILOVER_ERRORS = (
+        openai.APIConnectionError,  # Includes timeouts.
+        openai.InternalServerError,
+        openai.RateLimitError
+    )
+
+    def __init__(self,
+                 backends: list[LLMBackend]) -> None:
+        if not backends:
+            raise ValueError("An LLM router needs at least one backend.")
+
+        names = [backend.name for backend in backends]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate LLM backend names: {', '.join(names)}.")
+
+        self.backends: list[LLMBackend] = backends
+        # Calls in flight at once across the backends. Any more wait for a slot.
+        self.max_concurrency: int = sum(backend.max_concurrency for backend in backends)
+
+    def _call(self,
+              task: str,
+              model: str,
+              call: Callable[[LLMBackend, str], Any],
+              stream: bool = False) -> tuple[Any, LLMBackend]:
+        """
+        Makes the call on the backends in turn until one answers. A streamed
+        response is returned as an `LLMStream`, which keeps the backend's
+        slot until it ends.
+        """
+
+        candidates = [backend for backend in self.backends if backend.resolve_model(model)]
+        if not candidates:
+            raise LLMBackendUnavailableError(f"No LLM backend serves the model '{model}'.")
+
+        # Healthy backends first, each group fastest first.
+        candidates.sort(key=lambda backend: (backend.degraded(), backend.expected_latency(task)))
+
+        last_error: Exception | None = None
+        tried = set()
+        while len(tried) < len(candidates):
+            backend = self._reserve([backend for backend in candidates if backend not in tried])
+            tried.add(backend)
+            start_time = time.monotonic()
+            try:
+                response = call(backend, backend.resolve_model(model))
+            except self.FAILOVER_ERRORS as e:
+                backend.record(task, time.monotonic() - start_time, failed=True)
+                backend.release()
+                print(f"LLM backend '{backend.name}' failed ({type(e).__name__}), failing over.")
+                last_error = e
+                continue
+            except BaseException:
+                backend.release()
+                raise
+
+            if stream:
+                return (LLMStream(response, backend, task, start_time), backend)
+
+            backend.release()
+            backend.record(task, time.monotonic() - start_time)
+            return (response, backend)
+
+        raise last_error
+
+    def _reserve(self,
+                 candidates: list[LLMBackend]) -> LLMBackend:
+        """
+        Takes a slot on the first candidate with one free, or else waits for
+        one on the first candidate.
+        """
+
+        for backend in candidates:
+            if backend.acquire():
+                return backend
+
+        if candidates[0].acquire(timeout=Configuration.LLM_BACKEND_QUEUE_TIMEOUT):
+            return candidates[0]
+        raise LLMBackendUnavailableError(f"LLM backend '{candidates[0].name}' had no free slot in time.")
+
+    def create_completion(self,
+                          task: str,
+                          **kwargs) -> tuple[Any, LLMBackend]:
+        """
+        Makes a chat completion call with the keyword arguments and returns
+        the response and the backend that served it. Streamed responses must
+        be read to the end or closed to free the backend's slot.
+        """
+
+        return self._call(
+            task,
+            kwargs["model"],
+            lambda backend, model: backend.client.chat.completions.create(**{**kwargs, "model": model}),
+            stream=bool(kwargs.get("stream"))
+        )
+
+    def create_embedding(self,
+                         task: str,
+                         **kwargs) -> tuple[Any, LLMBackend]:
+        return self._call(
+            task,
+            kwargs["model"],
+            lambda backend, model: backend.client.embeddings.create(**{**kwargs, "model": model})
+        )
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        return {
+            backend.name: {**backend.snapshot(), "degraded": backend.degraded()}
+            for backend in self.backends
+        }
+
+
+####################
+# MODULE FUNCTIONS #
+####################
+
+
+def close_stream(chunks: Iterator[Any]) -> None:
+    """
+    Closes a streamed response, or a generator wrapping one, mid-stream.
+    """
+
+    # The client's own streams only close through their HTTP response.
+    close = getattr(chunks, "close", None) or getattr(getattr(chunks, "response", None), "close", None)
+    if close:
+        close()
+
+
+def load_llm_router(path: str | None = None) -> LLMRouter:
+    """
+    Makes a router for the backends listed in the given file, or for the
+    OpenAI API alone. API keys are read from the environment variables the
+    file names in `api_key_env`, never from the file itself.
+    """
+
+    if not path:
+        return LLMRouter([
+            OpenAIBackend(
+                "openai",
+                Configuration.OPENAI_API_KEY,
+                base_url=Configuration.OPENAI_BASE_URL,
+                max_retries=2
+            )
+        ])
+
+    with open(path, "r", encoding="utf-8") as f:
+        backends_raw = yaml.safe_load(f) or []
+
+    if not isinstance(backends_raw, list):
+        raise ValueError(f"LLM backends in '{path}' must be a list.")
+
+    backends = []
+    for data in backends_raw:
+        backend_type = data.get("type")
+        name = data.get("name") or backend_type
+        api_key = os.getenv(data["api_key_env"], "") if data.get("api_key_env") else None
+        max_concurrency = data.get("max_concurrency", Configuration.LLM_BACKEND_MAX_CONCURRENCY)
+        if backend_type == "openai":
+            backend = OpenAIBackend(
+                name,
+                api_key or Configuration.OPENAI_API_KEY,
+                base_url=data.get("base_url"),
+                max_concurrency=max_concurrency,
+                models=data.get("models")
+            )
+        elif backend_type == "azure":
+            backend = AzureOpenAIBackend(
+                name,
+                api_key,
+                data["endpoint"],
+                data["api_version"],
+                max_concurrency=max_concurrency,
+                deployments=data.get("deployments")
+            )
+        elif backend_type == "openai_compatible":
+            backend = OpenAICompatibleBackend(
+                name,
+                data["base_url"],
+                api_key=api_key or "none",
+                max_concurrency=max_concurrency,
+                models=data.get("models")
+            )
+        else:
+            raise ValueError(f"Unknown LLM backend type '{backend_type}' in '{path}'.")
+        backends.append(backend)
+
+    return LLMRouter(backends)
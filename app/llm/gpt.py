@@ -1,26 +1,351 @@
 import json
 import openai
-import re
+import pydantic
 import tiktoken
 import time
-from typing import Any
+from openai.types import CompletionUsage, CreateEmbeddingResponse
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from typing import Any, Iterator, Type, TypeVar
 
-from app import openai_client
+from app import llm_router
 from app.config import (
     ChatMessageSenderRole,
     Configuration,
+    LLMTask,
     OpenAIModel,
+    ProtocolKey,
     openai_model_context_len,
     openai_model_token_limits
 )
+from app.llm import json_repair
+from app.llm.backends import LLMBackend, close_stream
+from app.llm.schemas import (
+    EntryHeaderSchema,
+    FunFactsSchema,
+    RelatedTopicsSchema,
+    StatsSchema,
+    TableOfContentsSchema
+)
+from app.llm.profiles import GenerationProfile, get_generation_profile
+from app.llm.telemetry import LLMCallRecord, get_chunk_usage, record_llm_call, structured_output_tracker
 from app.modules.chat_message import ChatMessage
 
 
+S = TypeVar("S", bound=pydantic.BaseModel)
+
+
+def _create_completion(task: LLMTask,
+                       attempt: int = 0,
+                       repair: bool = False,
+                       **kwargs) -> ChatCompletion | Iterator[ChatCompletionChunk]:
+    """
+    Makes a chat completion call and records its telemetry, whether it
+    succeeds or raises. The keyword arguments are passed on to the client.
+    A streamed call is recorded once its stream ends or is closed.
+    """
+
+    response: ChatCompletion | None = None
+    backend: LLMBackend | None = None
+    error: str | None = None
+    start_time = time.monotonic()
+    try:
+        response, backend = llm_router.create_completion(task.value, **kwargs)
+        if kwargs.get("stream"):
+            return _record_streamed_completion(
+                task,
+                response,
+                backend,
+                start_time,
+                attempt=attempt,
+                model=kwargs.get("model")
+            )
+        return response
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        # Streams that started are recorded when they end.
+        if not (kwargs.get("stream") and backend):
+            usage = getattr(response, "usage", None)
+            choices = getattr(response, "choices", None)
+            record_llm_call(LLMCallRecord({
+                ProtocolKey.ATTEMPT: attempt,
+                ProtocolKey.BACKEND: backend.name if backend else None,
+                ProtocolKey.COMPLETION_TOKENS: usage.completion_tokens if usage else None,
+                ProtocolKey.ERROR: error,
+                ProtocolKey.FINISH_REASON: choices[0].finish_reason if choices else None,
+                ProtocolKey.LATENCY_MS: (time.monotonic() - start_time) * 1000,
+                ProtocolKey.MODEL: getattr(response, "model", None) or kwargs.get("model"),
+                ProtocolKey.PROMPT_TOKENS: usage.prompt_tokens if usage else None,
+                ProtocolKey.REPAIR: repair,
+                ProtocolKey.TASK: task
+            }))
+
+
+def _create_embedding(attempt: int = 0,
+                      **kwargs) -> CreateEmbeddingResponse:
+    """
+    Like `_create_completion`, for embeddings.
+    """
+
+    response: CreateEmbeddingResponse | None = None
+    backend: LLMBackend | None = None
+    error: str | None = None
+    start_time = time.monotonic()
+    try:
+        response, backend = llm_router.create_embedding(LLMTask.EMBEDDING.value, **kwargs)
+        return response
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        usage = getattr(response, "usage", None)
+        record_llm_call(LLMCallRecord({
+            ProtocolKey.ATTEMPT: attempt,
+            ProtocolKey.BACKEND: backend.name if backend else None,
+            ProtocolKey.COMPLETION_TOKENS: 0 if usage else None,
+            ProtocolKey.ERROR: error,
+            ProtocolKey.LATENCY_MS: (time.monotonic() - start_time) * 1000,
+            ProtocolKey.MODEL: getattr(response, "model", None) or kwargs.get("model"),
+            ProtocolKey.PROMPT_TOKENS: usage.prompt_tokens if usage else None,
+            ProtocolKey.TASK: LLMTask.EMBEDDING
+        }))
+
+
+def _format_validation_error(error: pydantic.ValidationError) -> str:
+    details = []
+    for e in error.errors():
+        location = ".".join(str(part) for part in e.get("loc", ())) or "(root)"
+        details.append(f"{location}: {e.get('msg')}")
+    return "; ".join(details)
+
+
+def _get_max_tokens(profile: GenerationProfile,
+                    token_count: int,
+                    budget_scale: int = 1) -> int:
+    """
+    Returns the profile's output budget, times `budget_scale`, capped at what
+    the model's limit leaves after the prompt.
+    """
+
+    ret = openai_model_token_limits.get(profile.model) - token_count
+    if profile.max_tokens:
+        ret = min(ret, profile.max_tokens * budget_scale)
+    return ret
+
+
+def _get_structured_completion(task: LLMTask,
+                               schema: Type[S],
+                               messages: list[dict[str, str]],
+                               attempts: int = 0,
+                               temperature: float | None = None,
+                               budget_scale: int = 1) -> S | None:
+    """
+    Asks for a JSON object conforming to the given schema and validates it
+    locally. A response that fails validation is first repaired locally and
+    failing that, sent back for repair rather than regenerated from scratch.
+    A response cut off at the token budget that can't be repaired locally is
+    generated once more with twice the budget instead.
+    """
+
+    ret: S | None = None
+    profile = get_generation_profile(task)
+    messages_final = messages + [
+        {"role": "system", "content": f"Respond with a single JSON object only, conforming to this JSON schema: {json.dumps(schema.model_json_schema())}"}
+    ]
+
+    token_count = num_tokens_from_messages(messages_final, model=profile.model)
+    try:
+        response_raw = _create_completion(
+            task,
+            attempt=attempts,
+            model=profile.model,
+            max_tokens=_get_max_tokens(profile, token_count, budget_scale=budget_scale),
+            messages=messages_final,
+            response_format={"type": "json_object"},
+            temperature=profile.temperature if temperature is None else temperature,
+            timeout=profile.timeout
+        )
+        finish_reason: str = response_raw.choices[0].finish_reason
+        # A response cut off at the token budget is often only missing its closing brackets.
+        if finish_reason in ("length", "stop"):
+            response: str = response_raw.choices[0].message.content
+            if response:
+                try:
+                    ret = schema.model_validate_json(response)
+                    structured_output_tracker.record(task)
+                except pydantic.ValidationError as e:
+                    print(f"OpenAI Error - invalid JSON ({task.value}):", response)
+                    # Most defects can be fixed locally; only call the LLM again if not.
+                    ret = json_repair.parse(response, schema)
+                    if ret:
+                        structured_output_tracker.record(task, repaired_locally=True)
+                    elif finish_reason == "length" and profile.max_tokens and budget_scale == 1:
+                        ret = _get_structured_completion(
+                            task,
+                            schema,
+                            messages,
+                            attempts=attempts + 1,
+                            temperature=temperature,
+                            budget_scale=2
+                        )
+                    else:
+                        ret = _repair_structured_completion(task, schema, response, e)
+            else:
+                print("OpenAI Error - invalid response!")
+                if attempts < profile.retry_max_attempts:
+                    # Nothing to repair so the only option is to generate again.
+                    time.sleep(profile.retry_delay)
+                    ret = _get_structured_completion(
+                        task,
+                        schema,
+                        messages,
+                        attempts=attempts + 1,
+                        temperature=temperature,
+                        budget_scale=budget_scale
+                    )
+        else:
+            print("OpenAI Error - finish_reason:", finish_reason)
+    except openai.APITimeoutError as e:
+        print("OpenAI API request timed out!")
+        if attempts < profile.retry_max_attempts:
+            time.sleep(profile.retry_delay)
+            ret = _get_structured_completion(
+                task,
+                schema,
+                messages,
+                attempts=attempts + 1,
+                temperature=temperature,
+                budget_scale=budget_scale
+            )
+    except Exception as e:
+        print(e)
+
+    return ret
+
+
+def _record_streamed_completion(task: LLMTask,
+                                chunks: Iterator[ChatCompletionChunk],
+                                backend: LLMBackend,
+                                start_time: float,
+                                attempt: int = 0,
+                                model: str | None = None) -> Iterator[ChatCompletionChunk]:
+    """
+    Passes a streamed completion's chunks on and records its telemetry once
+    the stream ends, with the usage of its last chunk.
+    """
+
+    error: str | None = None
+    finish_reason: str | None = None
+    usage: CompletionUsage | None = None
+    try:
+        for chunk in chunks:
+            model = chunk.model or model
+            usage = get_chunk_usage(chunk) or usage
+            if chunk.choices and chunk.choices[0].finish_reason:
+                finish_reason = chunk.choices[0].finish_reason
+            yield chunk
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        close_stream(chunks)
+        record_llm_call(LLMCallRecord({
+            ProtocolKey.ATTEMPT: attempt,
+            ProtocolKey.BACKEND: backend.name,
+            ProtocolKey.COMPLETION_TOKENS: usage.completion_tokens if usage else None,
+            ProtocolKey.ERROR: error,
+            ProtocolKey.FINISH_REASON: finish_reason,
+            ProtocolKey.LATENCY_MS: (time.monotonic() - start_time) * 1000,
+            ProtocolKey.MODEL: model,
+            ProtocolKey.PROMPT_TOKENS: usage.prompt_tokens if usage else None,
+            ProtocolKey.TASK: task
+        }))
+
+
+def _repair_structured_completion(task: LLMTask,
+                                  schema: Type[S],
+                                  response: str,
+                                  error: pydantic.ValidationError) -> S | None:
+    """
+    Sends an invalid response back along with its validation errors and asks
+    only for a corrected version of it, which is far cheaper than a full
+    regeneration.
+    """
+
+    ret: S | None = None
+    profile = get_generation_profile(task)
+    start_time = time.monotonic()
+    for attempt in range(Configuration.OPENAI_REPAIR_MAX_ATTEMPTS):
+        messages = [
+            {"role": "system", "content": f"You repair JSON documents. Fix the given JSON so that it is valid and conforms to this JSON schema: {json.dumps(schema.model_json_schema())}"},
+            {"role": "system", "content": "Keep the content unchanged wherever possible. Respond with the corrected JSON object only"},
+            {"role": "user", "content": f"JSON: {response}\nErrors: {_format_validation_error(error)}"}
+        ]
+
+        token_count = num_tokens_from_messages(messages, model=profile.model)
+        try:
+            response_raw = _create_completion(
+                task,
+                attempt=attempt,
+                repair=True,
+                model=profile.model,
+                max_tokens=_get_max_tokens(profile, token_count),
+                messages=messages,
+                response_format={"type": "json_object"},
+                temperature=0,
+                timeout=profile.timeout
+            )
+            response = response_raw.choices[0].message.content or ""
+            ret = schema.model_validate_json(response)
+            break
+        except pydantic.ValidationError as e:
+            print(f"OpenAI Error - invalid repaired JSON ({task.value}):", response)
+            error = e
+        except openai.APITimeoutError as e:
+            print("OpenAI API request timed out!")
+        except Exception as e:
+            print(e)
+            break
+
+    structured_output_tracker.record(
+        task,
+        repaired=ret is not None,
+        failed=ret is None,
+        added_latency=time.monotonic() - start_time
+    )
+    return ret
+
+
+def get_embedding(text: str,
+                  attempts: int = 0) -> list[float] | None:
+    embedding: list[float] | None = None
+    profile = get_generation_profile(LLMTask.EMBEDDING)
+    try:
+        response = _create_embedding(
+            attempt=attempts,
+            model=profile.model,
+            input=text,
+            timeout=profile.timeout
+        )
+        embedding = response.data[0].embedding
+    except openai.APITimeoutError as e:
+        print("OpenAI API request timed out!")
+        if attempts < profile.retry_max_attempts:
+            time.sleep(profile.retry_delay)
+            embedding = get_embedding(text, attempts=attempts + 1)
+    except Exception as e:
+        print(e)
+
+    return embedding
+
+
 def get_entry_chat_completion(context: str,
                               proficiency: str,
                               section_md: str,
                               topic: str,
                               messages: list[ChatMessage],
+                              summary: str | None = None,
                               attempts: int = 0) -> str | None:
     """
     This function interacts with the OpenAI API to generate responses.
@@ -34,15 +359,16 @@ def get_entry_chat_completion(context: str,
                         {"role": "user", "content": "hi"},
                         {"role": "assistant", "content": "Hello! How can I help you today?"}
                     ]
+    summary (str): A summary of the conversation before the given messages, if any.
 
     Returns:
     response_str (str): This is the content of the assistant's message from the response object 
                         returned by the OpenAI API.
     """
 
-    model = OpenAIModel.GPT_35_16K
-    model_context_len = openai_model_context_len.get(model)
-    model_token_limit = openai_model_token_limits.get(model)
+    response_str: str | None = None
+    profile = get_generation_profile(LLMTask.CHAT)
+    model_context_len = openai_model_context_len.get(profile.model)
     prompt = (
         f"Entry Topic: \"{topic}\"\n"
         f"Reader Proficiency: {proficiency}\n"
@@ -54,39 +380,46 @@ def get_entry_chat_completion(context: str,
             user_message = messages[0]
             user_message.content_md = f"\"{context}\"\n" + user_message.content_md
 
-        # Since we have a token limit, we insert chat messages
-        # until we're on the verge of exceeding the limit.
-        messages_reversed = messages[::-1]
         messages_final = [
             {"role": ChatMessageSenderRole.SYSTEM.value, "content": "You are the Assistant, an AI chatbot designed to assist with the entries of Mycyclopedia, which is an AI-powered encyclopedia. Be comprehensive in your responses and format them as Markdown. Use headings, tables and lists when applicable"},
             {"role": ChatMessageSenderRole.ASSISTANT.value, "content": prompt}
         ]
-        for m in messages_reversed:
-            token_count = num_tokens_from_messages(messages_final, model=model)
-            if token_count < model_context_len:
-                messages_final.insert(3, m.prompt_format())
+        if summary:
+            messages_final.append({"role": ChatMessageSenderRole.SYSTEM.value, "content": f"Summary of the conversation so far: {summary}"})
+
+        # Since we have a token limit, we insert chat messages, newest first,
+        # until we're on the verge of exceeding the limit.
+        history_index = len(messages_final)
+        for m in messages[::-1]:
+            token_count = num_tokens_from_messages(messages_final, model=profile.model)
+            if token_count >= model_context_len:
+                break
+            messages_final.insert(history_index, m.prompt_format())
 
         messages_final.append({"role": ChatMessageSenderRole.ASSISTANT.value, "content": "You: "})
 
-        token_count = num_tokens_from_messages(messages_final)
-        response = openai_client.chat.completions.create(
-            model=OpenAIModel.GPT_35_16K,
-            max_tokens=model_token_limit - token_count,
+        token_count = num_tokens_from_messages(messages_final, model=profile.model)
+        response = _create_completion(
+            LLMTask.CHAT,
+            attempt=attempts,
+            model=profile.model,
+            max_tokens=_get_max_tokens(profile, token_count),
             messages=messages_final,
-            temperature=1,
-            timeout=60
+            temperature=profile.temperature,
+            timeout=profile.timeout
         )
         response_str = response.choices[0].message.content
     except openai.APITimeoutError as e:
         print("OpenAI API request timed out!")
-        if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-            time.sleep(Configuration.OPENAI_RETRY_DELAY)
+        if attempts < profile.retry_max_attempts:
+            time.sleep(profile.retry_delay)
             response_str = get_entry_chat_completion(
                 attempts=attempts + 1,
                 context=context,
                 section_md=section_md,
                 messages=messages,
                 proficiency=proficiency,
+                summary=summary,
                 topic=topic
             )
     except Exception as e:
@@ -94,149 +427,136 @@ def get_entry_chat_completion(context: str,
     return response_str
 
 
-def get_entry_fun_facts(topic: str,
-                        attempts: int = 0,
-                        temperature: float = 0.8) -> list[str] | None:
-    facts: list[str] | None = None
-    model = OpenAIModel.GPT_35_16K
-    model_token_limit = openai_model_token_limits.get(model)
-    prompt = f"Entry Topic: \"{topic}\""
-    messages = [
-        {"role": "system", "content": "You are a documenter writing entries for an encyclopedia. Respond with 5 fun facts on the given topic as it is very important to my career"},
-        {"role": "system", "content": "Format all your responses as JSON only, in a single line without whitespaces. Do not include any commentary or text outside the JSON"},
-        {"role": "system", "content": "Replace any double quotes in the text with single quotes"},
-        {"role": "system", "content": "Do not include a bullet number (e.g. '1. <fact>', '2. <fact>', etc.) in the fact. This is very important"},
-        {"role": "system", "content": "Your response should only be a single JSON array of strings without any keys of the format: [\"fact 1\", \"fact 2\", \"fact 3\"]. Do not return any text outside the the JSON string. If you can't come up with any facts, return an empty JSON object"},
+def get_entry_chat_summary(topic: str,
+                           summary: str | None,
+                           messages: list[ChatMessage],
+                           attempts: int = 0) -> str | None:
+    """
+    Folds the given chat messages into the running summary of an entry chat
+    and returns the new summary.
+    """
+
+    new_summary: str | None = None
+    profile = get_generation_profile(LLMTask.CHAT_SUMMARY)
+    transcript = "\n".join(f"{m.sender_role.value.title()}: {m.content_md}" for m in messages)
+    prompt = (
+        f"Entry Topic: \"{topic}\"\n"
+        f"Summary so far: {summary or '(none)'}\n"
+        f"New messages: ```{transcript}```"
+    )
+    messages_final = [
+        {"role": "system", "content": "You maintain the running summary of a conversation between a reader and an assistant about an encyclopedia entry. Respond with an updated summary that adds the new messages to the summary so far"},
+        {"role": "system", "content": "Keep the questions asked, the answers given and any facts, names, numbers or code the reader may refer back to. Keep it below 250 words. Do not include any other commentary"},
         {"role": "user", "content": prompt}
     ]
 
-    token_count = num_tokens_from_messages(messages, model=model)
+    token_count = num_tokens_from_messages(messages_final, model=profile.model)
     try:
-        response_raw = openai_client.chat.completions.create(
-            model=OpenAIModel.GPT_35_16K,
-            max_tokens=model_token_limit - token_count,
-            messages=messages,
-            temperature=temperature,
-            timeout=90
+        response_raw = _create_completion(
+            LLMTask.CHAT_SUMMARY,
+            attempt=attempts,
+            model=profile.model,
+            max_tokens=_get_max_tokens(profile, token_count),
+            messages=messages_final,
+            temperature=profile.temperature,
+            timeout=profile.timeout
         )
         finish_reason: str = response_raw.choices[0].finish_reason
         if finish_reason and finish_reason == "stop":
-            response: str = response_raw.choices[0].message.content
-            if response:
-                response = re.sub("\\n|[^\x20-\x7e]", "", response)
-                response = re.sub(",\\s*\\}", "", response)
-                try:
-                    facts = json.loads(response)
-                except json.JSONDecodeError:
-                    print("OpenAI Error - invalid JSON:", response)
-                    if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-                        # LLM ignored instructions and probably returned invalid JSON.
-                        # Pause for a bit to avoid OpenAI API throttling and try again.
-                        time.sleep(Configuration.OPENAI_RETRY_DELAY)
-                        facts = get_entry_fun_facts(topic, attempts=attempts + 1, temperature=max(temperature + 0.1, 1))
-                    else:
-                        facts = None
-            else:
-                print("OpenAI Error - invalid response!")
-                if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-                    # LLM ignored instructions and probably returned invalid JSON.
-                    # Pause for a bit to avoid OpenAI API throttling and try again.
-                    time.sleep(Configuration.OPENAI_RETRY_DELAY)
-                    facts = get_entry_fun_facts(topic, attempts=attempts + 1, temperature=max(temperature + 0.1, 1))
-                else:
-                    facts = None
+            new_summary = response_raw.choices[0].message.content or None
         else:
             print("OpenAI Error - finish_reason:", finish_reason)
     except openai.APITimeoutError as e:
         print("OpenAI API request timed out!")
-        if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-            time.sleep(Configuration.OPENAI_RETRY_DELAY)
-            facts = get_entry_fun_facts(topic, attempts=attempts + 1, temperature=max(temperature + 0.1, 1))
+        if attempts < profile.retry_max_attempts:
+            time.sleep(profile.retry_delay)
+            new_summary = get_entry_chat_summary(topic, summary, messages, attempts=attempts + 1)
     except Exception as e:
         print(e)
 
+    return new_summary
+
+
+def get_entry_fun_facts(topic: str,
+                        attempts: int = 0,
+                        temperature: float | None = None) -> list[str] | None:
+    facts: list[str] | None = None
+    prompt = f"Entry Topic: \"{topic}\""
+    messages = [
+        {"role": "system", "content": "You are a documenter writing entries for an encyclopedia. Respond with 5 fun facts on the given topic as it is very important to my career"},
+        {"role": "system", "content": "Do not include a bullet number (e.g. '1. <fact>', '2. <fact>', etc.) in the fact. This is very important"},
+        {"role": "user", "content": prompt}
+    ]
+
+    response = _get_structured_completion(
+        LLMTask.FACTS,
+        FunFactsSchema,
+        messages,
+        attempts=attempts,
+        temperature=temperature
+    )
+    if response:
+        facts = response.fun_facts
+
     return facts
 
 
+def get_entry_header(topic: str) -> dict[str, Any] | None:
+    """
+    Generates an entry's summary, fun facts and stats in a single structured
+    call. Returns None if no valid response could be had, in which case the
+    caller should fall back to the per-part calls.
+    """
+
+    header: dict[str, Any] | None = None
+    prompt = f"Entry Topic: \"{topic}\""
+    messages = [
+        {"role": "system", "content": "You are a documenter writing entries for an encyclopedia. For the given topic, respond with a brief summary (below 150 words, without headings or titles), 5 fun facts and some interesting stats as it is very important to my career"},
+        {"role": "system", "content": "Use Markdown for the content of stats. Do not include a bullet number (e.g. '1. <fact>', '2. <fact>', etc.) in a fact"},
+        {"role": "user", "content": prompt}
+    ]
+
+    # The header profile has no retries: the per-part fallback is the better retry.
+    response = _get_structured_completion(
+        LLMTask.HEADER,
+        EntryHeaderSchema,
+        messages
+    )
+    if response:
+        header = {
+            ProtocolKey.SUMMARY: response.summary,
+            ProtocolKey.FUN_FACTS: response.fun_facts,
+            # Same shape as get_entry_stats() so callers can treat both alike.
+            ProtocolKey.STATS: [{stat.name: stat.value} for stat in response.stats]
+        }
+
+    return header
+
+
 def get_entry_related_topics(topic: str,
                              proficiency: str,
                              attempts: int = 0,
-                             temperature: float = 0.8) -> list[str] | None:
+                             temperature: float | None = None) -> list[str] | None:
     topics: list[str] | None = None
-    model = OpenAIModel.GPT_35_16K
-    model_token_limit = openai_model_token_limits.get(model)
     prompt = (
         f"Entry Topic: {topic}\n"
         f"Reader Proficiency: {proficiency}"
     )
     messages = [
         {"role": "system", "content": "You are a documenter writing entries for an encyclopedia. Given the following topic, respond with some other topics the reader might be interested in as it is very important to my career"},
-        {"role": "system", "content": "Format all your responses as JSON only, in a single line without whitespaces. Do not include any commentary or text outside the JSON"},
-        {"role": "system", "content": "Replace any double quotes in the text with single quotes"},
         {"role": "system", "content": "Do not include a bullet number (e.g. '1. <topic>', '2. <topic>', etc.) in the topic. This is very important"},
-        {"role": "system", "content": "Your response should only be a single JSON array of strings without any keys of the format: [\"topic 1\", \"topic 2\", \"topic 3\"]. Do not return any text outside the the JSON string. If you can't come up with any topics, return an empty JSON object"},
         {"role": "user", "content": prompt}
     ]
 
-    token_count = num_tokens_from_messages(messages, model=model)
-    try:
-        response_raw = openai_client.chat.completions.create(
-            model=OpenAIModel.GPT_35_16K,
-            max_tokens=model_token_limit - token_count,
-            messages=messages,
-            temperature=temperature,
-            timeout=90
-        )
-        finish_reason: str = response_raw.choices[0].finish_reason
-        if finish_reason and finish_reason == "stop":
-            response: str = response_raw.choices[0].message.content
-            if response:
-                response = re.sub("\\n|[^\x20-\x7e]", "", response)
-                response = re.sub(",\\s*\\}", "", response)
-                try:
-                    topics = json.loads(response)
-                except json.JSONDecodeError:
-                    print("OpenAI Error - invalid JSON:", response)
-                    if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-                        # LLM ignored instructions and probably returned invalid JSON.
-                        # Pause for a bit to avoid OpenAI API throttling and try again.
-                        time.sleep(Configuration.OPENAI_RETRY_DELAY)
-                        topics = get_entry_related_topics(
-                            attempts=attempts + 1,
-                            proficiency=proficiency,
-                            temperature=max(temperature + 0.1, 1),
-                            topic=topic
-                        )
-                    else:
-                        topics = None
-            else:
-                print("OpenAI Error - invalid response!")
-                if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-                    # LLM ignored instructions and probably returned invalid JSON.
-                    # Pause for a bit to avoid OpenAI API throttling and try again.
-                    time.sleep(Configuration.OPENAI_RETRY_DELAY)
-                    topics = get_entry_related_topics(
-                        attempts=attempts + 1,
-                        proficiency=proficiency,
-                        temperature=max(temperature + 0.1, 1),
-                        topic=topic
-                    )
-                else:
-                    topics = None
-        else:
-            print("OpenAI Error - finish_reason:", finish_reason)
-    except openai.APITimeoutError as e:
-        print("OpenAI API request timed out!")
-        if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-            time.sleep(Configuration.OPENAI_RETRY_DELAY)
-            topics = get_entry_related_topics(
-                attempts=attempts + 1,
-                proficiency=proficiency,
-                temperature=max(temperature + 0.1, 1),
-                topic=topic
-            )
-    except Exception as e:
-        print(e)
+    response = _get_structured_completion(
+        LLMTask.RELATED,
+        RelatedTopicsSchema,
+        messages,
+        attempts=attempts,
+        temperature=temperature
+    )
+    if response:
+        topics = response.related_topics
 
     return topics
 
@@ -246,8 +566,7 @@ def get_entry_section(proficiency: str,
                       section_title: str,
                       attempts: int = 0) -> str | None:
     section: str | None = None
-    model = OpenAIModel.GPT_35_16K
-    model_token_limit = openai_model_token_limits.get(model)
+    profile = get_generation_profile(LLMTask.SECTION)
     prompt = (
         f"Entry Topic: {topic}\n"
         f"Reader Proficiency: {proficiency}\n"
@@ -260,24 +579,26 @@ def get_entry_section(proficiency: str,
         {"role": "user", "content": prompt}
     ]
 
-    token_count = num_tokens_from_messages(messages, model=model)
+    token_count = num_tokens_from_messages(messages, model=profile.model)
     try:
-        response_raw = openai_client.chat.completions.create(
-            model=OpenAIModel.GPT_35_16K,
-            max_tokens=model_token_limit - token_count,
+        response_raw = _create_completion(
+            LLMTask.SECTION,
+            attempt=attempts,
+            model=profile.model,
+            max_tokens=_get_max_tokens(profile, token_count),
             messages=messages,
-            temperature=0.8,
-            timeout=90
+            temperature=profile.temperature,
+            timeout=profile.timeout
         )
         finish_reason: str = response_raw.choices[0].finish_reason
         if finish_reason and finish_reason == "stop":
             section = response_raw.choices[0].message.content
             if not section:
                 print("OpenAI Error - invalid response!")
-                if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
+                if attempts < profile.retry_max_attempts:
                     # LLM ignored instructions and probably returned invalid JSON.
                     # Pause for a bit to avoid OpenAI API throttling and try again.
-                    time.sleep(Configuration.OPENAI_RETRY_DELAY)
+                    time.sleep(profile.retry_delay)
                     section = get_entry_section(
                         attempts=attempts + 1,
                         proficiency=proficiency,
@@ -290,8 +611,8 @@ def get_entry_section(proficiency: str,
             print("OpenAI Error - finish_reason:", finish_reason)
     except openai.APITimeoutError as e:
         print("OpenAI API request timed out!")
-        if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-            time.sleep(Configuration.OPENAI_RETRY_DELAY)
+        if attempts < profile.retry_max_attempts:
+            time.sleep(profile.retry_delay)
             section = get_entry_section(
                 attempts=attempts + 1,
                 proficiency=proficiency,
@@ -304,65 +625,100 @@ def get_entry_section(proficiency: str,
     return section
 
 
-def get_entry_stats(topic: str,
-                    attempts: int = 0,
-                    temperature: float = 0.8) -> list[dict[str, str]] | None:
-    stats: list[dict[str, str]] | None = None
-    model = OpenAIModel.GPT_35_16K
-    model_token_limit = openai_model_token_limits.get(model)
-    prompt = f"Entry Topic: \"{topic}\""
+def stream_entry_section(proficiency: str,
+                         topic: str,
+                         section_title: str,
+                         attempts: int = 0) -> Iterator[str]:
+    """
+    Like `get_entry_section`, but yields the section's Markdown as it is
+    generated. The generator returns the whole section, or None if it was
+    cut short, so that it can be used with `yield from`. Only calls that
+    fail before yielding anything are retried.
+    """
+
+    profile = get_generation_profile(LLMTask.SECTION)
+    prompt = (
+        f"Entry Topic: {topic}\n"
+        f"Reader Proficiency: {proficiency}\n"
+        f"Section Title: {section_title.strip()}\n"
+    )
     messages = [
-        {"role": "system", "content": "You are a documenter writing entries for an encyclopedia. Respond with some interesting stats on the given topic and use Markdown for content formatting as it is very important to my career"},
-        {"role": "system", "content": "Format all your responses as JSON only, in a single line without whitespaces. Do not include any commentary or text outside the JSON"},
-        {"role": "system", "content": "Replace any double quotes in the text with single quotes"},
-        {"role": "system", "content": "Your response should only be a single JSON string of the format: [{\"stat 1 label\": \"stat 1 value\"}, {\"stat 2 label\": \"stat 2 value\"}, {\"stat 3 label\": \"stat 3 value\"}, ...]. Do not return any text outside the the JSON string. If you can't come up with any stats, return an empty JSON object"},
+        {"role": "system", "content": "You are a documenter writing entries for an encyclopedia. Respond comprehensively as it is very important to my career"},
+        {"role": "system", "content": "Format your response as Markdown. Use Markdown headings, tables and lists when applicable. Do not re-include the section title supplied by the user in your response. Do not include any table of contents in your response"},
+        {"role": "system", "content": "Give helpful examples when applicable"},
         {"role": "user", "content": prompt}
     ]
 
-    token_count = num_tokens_from_messages(messages, model=model)
+    token_count = num_tokens_from_messages(messages, model=profile.model)
+    pieces: list[str] = []
+    finish_reason: str | None = None
+    chunks: Iterator[ChatCompletionChunk] | None = None
     try:
-        response_raw = openai_client.chat.completions.create(
-            model=OpenAIModel.GPT_35_16K,
-            max_tokens=model_token_limit - token_count,
+        chunks = _create_completion(
+            LLMTask.SECTION,
+            attempt=attempts,
+            model=profile.model,
+            max_tokens=_get_max_tokens(profile, token_count),
             messages=messages,
-            temperature=temperature,
-            timeout=90
+            stream=True,
+            # The client predates `stream_options`. The usage comes in a last chunk without choices.
+            extra_body={"stream_options": {"include_usage": True}},
+            temperature=profile.temperature,
+            timeout=profile.timeout
         )
-        finish_reason: str = response_raw.choices[0].finish_reason
-        if finish_reason and finish_reason == "stop":
-            response: str = response_raw.choices[0].message.content
-            if response:
-                response = re.sub("\\n|[^\x20-\x7e]", "", response)
-                response = re.sub(",\\s*\\}", "", response)
-                try:
-                    stats = json.loads(response)
-                except json.JSONDecodeError:
-                    print("OpenAI Error - invalid JSON:", response)
-                    if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-                        # LLM ignored instructions and probably returned invalid JSON.
-                        # Pause for a bit to avoid OpenAI API throttling and try again.
-                        time.sleep(Configuration.OPENAI_RETRY_DELAY)
-                        stats = get_entry_stats(topic, attempts=attempts + 1, temperature=max(temperature + 0.1, 1))
-                    else:
-                        stats = None
-            else:
-                print("OpenAI Error - invalid response!")
-                if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-                    # LLM ignored instructions and probably returned invalid JSON.
-                    # Pause for a bit to avoid OpenAI API throttling and try again.
-                    time.sleep(Configuration.OPENAI_RETRY_DELAY)
-                    stats = get_entry_stats(topic, attempts=attempts + 1, temperature=max(temperature + 0.1, 1))
-                else:
-                    topic = None
-        else:
-            print("OpenAI Error - finish_reason:", finish_reason)
+        for chunk in chunks:
+            if not chunk.choices:
+                continue
+
+            content = chunk.choices[0].delta.content
+            if content:
+                pieces.append(content)
+                yield content
+
+            if chunk.choices[0].finish_reason:
+                finish_reason = chunk.choices[0].finish_reason
     except openai.APITimeoutError as e:
         print("OpenAI API request timed out!")
-        if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-            time.sleep(Configuration.OPENAI_RETRY_DELAY)
-            stats = get_entry_stats(topic, attempts=attempts + 1, temperature=max(temperature + 0.1, 1))
     except Exception as e:
         print(e)
+    finally:
+        # Also when the caller stops reading, so that the backend's slot is freed at once.
+        if chunks is not None:
+            close_stream(chunks)
+
+    if finish_reason != "stop" or not pieces:
+        print("OpenAI Error - finish_reason:", finish_reason)
+        if not pieces and attempts < profile.retry_max_attempts:
+            time.sleep(profile.retry_delay)
+            return (yield from stream_entry_section(
+                attempts=attempts + 1,
+                proficiency=proficiency,
+                section_title=section_title,
+                topic=topic
+            ))
+        return None
+    return "".join(pieces)
+
+
+def get_entry_stats(topic: str,
+                    attempts: int = 0,
+                    temperature: float | None = None) -> list[dict[str, str]] | None:
+    stats: list[dict[str, str]] | None = None
+    prompt = f"Entry Topic: \"{topic}\""
+    messages = [
+        {"role": "system", "content": "You are a documenter writing entries for an encyclopedia. Respond with some interesting stats on the given topic and use Markdown for content formatting as it is very important to my career"},
+        {"role": "user", "content": prompt}
+    ]
+
+    response = _get_structured_completion(
+        LLMTask.STATS,
+        StatsSchema,
+        messages,
+        attempts=attempts,
+        temperature=temperature
+    )
+    if response:
+        stats = [{stat.name: stat.value} for stat in response.stats]
 
     return stats
 
@@ -370,8 +726,7 @@ def get_entry_stats(topic: str,
 def get_entry_summary(topic: str,
                       attempts: int = 0) -> str | None:
     summary: str | None = None
-    model = OpenAIModel.GPT_35_16K
-    model_token_limit = openai_model_token_limits.get(model)
+    profile = get_generation_profile(LLMTask.SUMMARY)
     prompt = (
         f"Entry Topic: {topic}\n"
         f"Summary: "
@@ -382,24 +737,26 @@ def get_entry_summary(topic: str,
         {"role": "user", "content": prompt}
     ]
 
-    token_count = num_tokens_from_messages(messages, model=model)
+    token_count = num_tokens_from_messages(messages, model=profile.model)
     try:
-        response_raw = openai_client.chat.completions.create(
-            model=OpenAIModel.GPT_35_16K,
-            max_tokens=model_token_limit - token_count,
+        response_raw = _create_completion(
+            LLMTask.SUMMARY,
+            attempt=attempts,
+            model=profile.model,
+            max_tokens=_get_max_tokens(profile, token_count),
             messages=messages,
-            temperature=0.8,
-            timeout=90
+            temperature=profile.temperature,
+            timeout=profile.timeout
         )
         finish_reason: str = response_raw.choices[0].finish_reason
         if finish_reason and finish_reason == "stop":
             summary = response_raw.choices[0].message.content
             if not summary:
                 print("OpenAI Error - invalid response!")
-                if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
+                if attempts < profile.retry_max_attempts:
                     # LLM ignored instructions and probably returned invalid JSON.
                     # Pause for a bit to avoid OpenAI API throttling and try again.
-                    time.sleep(Configuration.OPENAI_RETRY_DELAY)
+                    time.sleep(profile.retry_delay)
                     summary = get_entry_summary(
                         attempts=attempts + 1,
                         topic=topic
@@ -410,8 +767,8 @@ def get_entry_summary(topic: str,
             print("OpenAI Error - finish_reason:", finish_reason)
     except openai.APITimeoutError as e:
         print("OpenAI API request timed out!")
-        if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-            time.sleep(Configuration.OPENAI_RETRY_DELAY)
+        if attempts < profile.retry_max_attempts:
+            time.sleep(profile.retry_delay)
             summary = get_entry_summary(
                 attempts=attempts + 1,
                 topic=topic
@@ -425,81 +782,26 @@ def get_entry_summary(topic: str,
 def get_entry_table_of_contents(proficiency: str,
                                 topic: str,
                                 attempts: int = 0,
-                                temperature: float = 0.8) -> list[dict[str, Any]] | None:
+                                temperature: float | None = None) -> list[dict[str, Any]] | None:
     toc: list[dict[str, Any]] | None = None
-    model = OpenAIModel.GPT_35_16K
-    model_token_limit = openai_model_token_limits.get(model)
     prompt = (
         f"Entry Topic: {topic}\n"
         f"Reader Proficiency: {proficiency}\n"
     )
     messages = [
         {"role": "system", "content": "You are a documenter writing entries for an encyclopedia. Generate a comprehensive table of contents on the given topic. Include subsections when applicable as it is very important to my career"},
-        {"role": "system", "content": "Format all your responses as JSON only, in a single line without whitespaces. Do not include any commentary or text outside the JSON"},
-        {"role": "system", "content": "Replace any double quotes in the text with single quotes"},
-        {"role": "system", "content": "Your response should only be a single JSON string of the format: [{\"title\": \"section 1 title\", \"subsections\": [{\"title\": \"subsection 1 title\"}, ...]}, {\"title\": \"section 2 title\"}, ...]. Do not return any text outside the the JSON string. If you can't come up with a table of contents, return an empty JSON object"},
         {"role": "user", "content": prompt}
     ]
 
-    token_count = num_tokens_from_messages(messages, model=model)
-    try:
-        response_raw = openai_client.chat.completions.create(
-            model=OpenAIModel.GPT_35_16K,
-            max_tokens=model_token_limit - token_count,
-            messages=messages,
-            temperature=temperature,
-            timeout=90
-        )
-        finish_reason: str = response_raw.choices[0].finish_reason
-        if finish_reason and finish_reason == "stop":
-            response: str = response_raw.choices[0].message.content
-            if response:
-                response = re.sub("\\n|[^\x20-\x7e]", "", response)
-                response = re.sub(",\\s*\\}", "", response)
-                try:
-                    toc = json.loads(response)
-                except json.JSONDecodeError:
-                    print("OpenAI Error - invalid JSON:", response)
-                    if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-                        # LLM ignored instructions and probably returned invalid JSON.
-                        # Pause for a bit to avoid OpenAI API throttling and try again.
-                        time.sleep(Configuration.OPENAI_RETRY_DELAY)
-                        toc = get_entry_table_of_contents(
-                            attempts=attempts + 1,
-                            proficiency=proficiency,
-                            temperature=max(temperature + 0.1, 1),
-                            topic=topic
-                        )
-                    else:
-                        toc = None
-            else:
-                print("OpenAI Error - invalid response!")
-                if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-                    # LLM ignored instructions and probably returned invalid JSON.
-                    # Pause for a bit to avoid OpenAI API throttling and try again.
-                    time.sleep(Configuration.OPENAI_RETRY_DELAY)
-                    toc = get_entry_table_of_contents(
-                        attempts=attempts + 1,
-                        proficiency=proficiency,
-                        temperature=max(temperature + 0.1, 1),
-                        topic=topic
-                    )
-                else:
-                    topic = None
-        else:
-            print("OpenAI Error - finish_reason:", finish_reason)
-    except openai.APITimeoutError as e:
-        print("OpenAI API request timed out!")
-        if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-            time.sleep(Configuration.OPENAI_RETRY_DELAY)
-            toc = get_entry_table_of_contents(
-                attempts=attempts + 1,
-                proficiency=proficiency,
-                temperature=max(temperature + 0.1, 1),
-                topic=topic
-            )
-    except Exception as e:
-        print(e)
+    response = _get_structured_completion(
+        LLMTask.TOC,
+        TableOfContentsSchema,
+        messages,
+        attempts=attempts,
+        temperature=temperature
+    )
+    if response:
+        toc = response.model_dump()["sections"]
 
     return toc
 
@@ -510,8 +812,7 @@ def get_entry_topic(user_input: str,
     invalid_topic_responses = {
         ".", ".'", "'.", "'.'"
     }
-    model = OpenAIModel.GPT_35_16K
-    model_token_limit = openai_model_token_limits.get(model)
+    profile = get_generation_profile(LLMTask.TITLE)
     prompt = (
         f"Snippet: \"{user_input.strip()}\"\n"
         "Title: "
@@ -523,14 +824,16 @@ def get_entry_topic(user_input: str,
         {"role": "user", "content": prompt}
     ]
 
-    token_count = num_tokens_from_messages(messages, model=model)
+    token_count = num_tokens_from_messages(messages, model=profile.model)
     try:
-        response_raw = openai_client.chat.completions.create(
-            model=OpenAIModel.GPT_35_16K,
-            max_tokens=model_token_limit - token_count,
+        response_raw = _create_completion(
+            LLMTask.TITLE,
+            attempt=attempts,
+            model=profile.model,
+            max_tokens=_get_max_tokens(profile, token_count),
             messages=messages,
-            temperature=0,
-            timeout=90
+            temperature=profile.temperature,
+            timeout=profile.timeout
         )
         finish_reason: str = response_raw.choices[0].finish_reason
         if finish_reason and finish_reason == "stop":
@@ -541,8 +844,8 @@ def get_entry_topic(user_input: str,
             print("OpenAI Error - finish_reason:", finish_reason)
     except openai.APITimeoutError as e:
         print("OpenAI API request timed out!")
-        if attempts < Configuration.OPENAI_RETRY_MAX_ATTEMPTS:
-            time.sleep(Configuration.OPENAI_RETRY_DELAY)
+        if attempts < profile.retry_max_attempts:
+            time.sleep(profile.retry_delay)
             topic = get_entry_topic(user_input, attempts=attempts + 1)
     except Exception as e:
         print(e)
@@ -0,0 +1,263 @@
+"""
+Lenient parsing of nearly-valid JSON returned by the LLM.
+
+The usual defects are a chatty preamble, a Markdown code fence, smart
+quotes, trailing commas, Python literals or raw newlines inside strings.
+All of them are cheap to fix locally, which saves another LLM call.
+"""
+
+import json
+import re
+from typing import Any, Type, TypeVar
+
+import pydantic
+
+
+S = TypeVar("S", bound=pydantic.BaseModel)
+
+_CODE_FENCE = re.compile(r"```[A-Za-z0-9_-]*\s*\n?(.*?)```", re.S)
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_PYTHON_LITERAL = re.compile(r"(True|False|None)\b")
+# Quotes that LLMs open strings with instead of a straight double quote,
+# mapped to the quotes that may close them.
+_QUOTE_CLOSERS = {
+    "'": "'‘’",
+    "‘": "'‘’",
+    "‚": "'‘’",
+    "‛": "'‘’",
+    "′": "'′",
+    "“": "\"“”",
+    "„": "\"“”",
+    "‟": "\"“”",
+    "″": "\"″"
+}
+# What may follow the end of a string: a comma, colon or closing bracket.
+_STRING_END = re.compile(r"\s*(?:[,:\]}]|$)")
+_TRAILING_COMMA = re.compile(r",(\s*[\]}])")
+
+
+def _close_brackets(text: str) -> str:
+    """
+    Appends whatever closing quotes and brackets a truncated document is
+    missing.
+    """
+
+    stack = []
+    in_string = False
+    escaped = False
+    for c in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == "\"":
+                in_string = False
+        elif c == "\"":
+            in_string = True
+        elif c in "[{":
+            stack.append("]" if c == "[" else "}")
+        elif c in "]}" and stack:
+            stack.pop()
+
+    if in_string:
+        text += "\""
+    text = _TRAILING_COMMA.sub(r"\1", text.rstrip().rstrip(","))
+    return text + "".join(reversed(stack))
+
+
+def _escape_control_characters(text: str) -> str:
+    """
+    Escapes raw newlines and tabs that appear inside string literals.
+    """
+
+    ret = []
+    in_string = False
+    escaped = False
+    for c in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == "\"":
+                in_string = False
+            elif c == "\n":
+                c = "\\n"
+            elif c == "\r":
+                c = "\\r"
+            elif c == "\t":
+                c = "\\t"
+        elif c == "\"":
+            in_string = True
+        ret.append(c)
+    return "".join(ret)
+
+
+def _normalize_quotes(text: str) -> str:
+    """
+    Rewrites strings delimited by single or smart quotes with straight
+    double quotes, escaping any double quotes they contain. Quotes inside
+    strings are content: one only closes a string when what follows it
+    couldn't be more of the string, so that apostrophes survive. `\\'`,
+    which isn't a JSON escape, becomes a bare apostrophe.
+    """
+
+    ret = []
+    closers = None
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if closers is None:
+            if c == "\"":
+                closers = "\""
+            elif c in _QUOTE_CLOSERS:
+                closers = _QUOTE_CLOSERS[c]
+                c = "\""
+            ret.append(c)
+        elif c == "\\" and i + 1 < len(text):
+            escaped = text[i + 1]
+            if escaped == "'" or (escaped in closers and escaped != "\""):
+                ret.append(escaped)
+            else:
+                ret.append(c + escaped)
+            i += 1
+        elif closers == "\"":
+            if c == "\"":
+                closers = None
+            ret.append(c)
+        elif c in closers and _STRING_END.match(text, i + 1):
+            closers = None
+            ret.append("\"")
+        elif c == "\"":
+            ret.append("\\\"")
+        else:
+            ret.append(c)
+        i += 1
+    return "".join(ret)
+
+
+def _replace_python_literals(text: str) -> str:
+    """
+    Replaces bare True/False/None tokens that sit outside of strings.
+    """
+
+    ret = []
+    in_string = False
+    escaped = False
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == "\"":
+                in_string = False
+        elif c == "\"":
+            in_string = True
+        else:
+            match = _PYTHON_LITERAL.match(text, i)
+            if match and (i == 0 or not text[i - 1].isalnum()):
+                ret.append(_PYTHON_LITERALS[match.group(1)])
+                i += len(match.group(1))
+                continue
+        ret.append(c)
+        i += 1
+    return "".join(ret)
+
+
+def extract_json(text: str) -> str | None:
+    """
+    Returns the first JSON array or object in the given text, ignoring any
+    surrounding prose or code fence, with its strings in straight double
+    quotes. A truncated document is returned as is so that its brackets can
+    be closed later.
+    """
+
+    if not isinstance(text, str):
+        raise TypeError(f"Argument 'text' must be of type str, not {type(text)}.")
+
+    fenced = _CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+
+    starts = [i for i in (text.find("["), text.find("{")) if i != -1]
+    if not starts:
+        return None
+
+    text = _normalize_quotes(text[min(starts):])
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(len(text)):
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == "\"":
+                in_string = False
+        elif c == "\"":
+            in_string = True
+        elif c in "[{":
+            depth += 1
+        elif c in "]}":
+            depth -= 1
+            if depth == 0:
+                return text[:i + 1]
+    return text
+
+
+def loads(text: str) -> Any:
+    """
+    Parses JSON as leniently as reasonably possible. Raises ValueError when
+    the text can't be salvaged.
+    """
+
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        pass
+
+    document = extract_json(text.lstrip("\ufeff"))
+    if document is None:
+        raise ValueError("No JSON array or object found.")
+
+    document = _escape_control_characters(document)
+    document = _replace_python_literals(document)
+    document = _TRAILING_COMMA.sub(r"\1", document)
+    try:
+        return json.loads(document)
+    except ValueError:
+        return json.loads(_close_brackets(document))
+
+
+def parse(text: str,
+          schema: Type[S]) -> S | None:
+    """
+    Leniently parses the text and validates it against the task's schema.
+    A bare array is accepted for schemas that wrap a single list. Returns
+    None if the text can't be repaired into a valid instance.
+    """
+
+    try:
+        document = loads(text)
+    except ValueError:
+        return None
+
+    fields = list(schema.model_fields)
+    if isinstance(document, list) and len(fields) == 1:
+        document = {fields[0]: document}
+    elif isinstance(document, dict) and len(fields) == 1 and fields[0] not in document and len(document) == 1:
+        # The right list under the wrong key, e.g. {"facts": [...]}.
+        value = next(iter(document.values()))
+        if isinstance(value, list):
+            document = {fields[0]: value}
+
+    try:
+        return schema.model_validate(document)
+    except pydantic.ValidationError:
+        return None
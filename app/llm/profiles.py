@@ -0,0 +1,168 @@
+"""
+Generation profiles: the model, output budget, temperature, timeout and
+retry policy each LLM task is called with.
+
+The defaults below can be overridden per task from a YAML (or JSON) file
+at GENERATION_PROFILES_PATH, e.g.
+
+    title:
+      model: gpt-3.5-turbo
+      max_tokens: 16
+    section:
+      timeout: 120
+
+Keys left out keep their default.
+"""
+
+import yaml
+
+from app.config import Configuration, LLMTask, OpenAIModel
+
+
+###########
+# CLASSES #
+###########
+
+
+class GenerationProfile:
+    KEYS = ("max_tokens", "model", "retry_delay", "retry_max_attempts", "temperature", "timeout")
+
+    def __init__(self, data: dict) -> None:
+        """
+        `max_tokens` caps the length of the output. None leaves all of the
+        model's output limit that the prompt doesn't use.
+        """
+
+        unknown_keys = set(data) - set(self.KEYS)
+        if unknown_keys:
+            raise ValueError(f"Unknown generation profile keys: {', '.join(sorted(unknown_keys))}.")
+
+        self.max_tokens: int | None = data.get("max_tokens")
+        self.model: str = data["model"]
+        self.retry_delay: float = data.get("retry_delay", Configuration.OPENAI_RETRY_DELAY)
+        self.retry_max_attempts: int = data.get("retry_max_attempts", Configuration.OPENAI_RETRY_MAX_ATTEMPTS)
+        self.temperature: float = data.get("temperature", 0.8)
+        self.timeout: float = data.get("timeout", 90)
+
+        if self.max_tokens is not None and (not isinstance(self.max_tokens, int) or self.max_tokens < 1):
+            raise ValueError(f"Generation profile 'max_tokens' must be a positive int or None, not {self.max_tokens}.")
+
+    def __repr__(self) -> str:
+        return f"Generation Profile ({self.model}, {self.max_tokens} tokens, {self.timeout}s)"
+
+    def as_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.KEYS}
+
+
+####################
+# MODULE FUNCTIONS #
+####################
+
+
+def get_generation_profile(task: LLMTask) -> GenerationProfile:
+    return generation_profiles[task]
+
+
+def load_generation_profiles(path: str | None = None) -> dict[LLMTask, GenerationProfile]:
+    """
+    Returns the default profiles with the overrides from the given file, if
+    any, applied on top.
+    """
+
+    profiles_raw = {task: dict(data) for task, data in default_generation_profiles.items()}
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            overrides = yaml.safe_load(f) or {}
+
+        if not isinstance(overrides, dict):
+            raise ValueError(f"Generation profiles in '{path}' must be a mapping of task to profile.")
+
+        for task_name, data in overrides.items():
+            try:
+                task = LLMTask(task_name)
+            except ValueError:
+                raise ValueError(f"Unknown task '{task_name}' in generation profiles '{path}'.")
+            profiles_raw[task].update(data or {})
+
+    return {task: GenerationProfile(data) for task, data in profiles_raw.items()}
+
+
+# Short outputs get a smaller model, a tight output budget and a short
+# timeout so that a stalled call fails (and is retried) quickly. The JSON
+# tasks need a model that supports JSON mode, and a JSON response cut off at
+# its budget that can't be repaired is generated once more with twice the
+# budget.
+default_generation_profiles: dict[LLMTask, dict] = {
+    LLMTask.CHAT: {
+        "model": OpenAIModel.GPT_35_16K,
+        "max_tokens": None,
+        "temperature": 1,
+        "timeout": 60
+    },
+    LLMTask.CHAT_SUMMARY: {
+        "model": OpenAIModel.GPT_35,
+        "max_tokens": 400,
+        "temperature": 0,
+        "timeout": 30,
+        "retry_max_attempts": 1,
+        "retry_delay": 1
+    },
+    LLMTask.EMBEDDING: {
+        "model": OpenAIModel.TEXT_EMBEDDING,
+        "max_tokens": None,
+        "timeout": 10,
+        "retry_max_attempts": 1,
+        "retry_delay": 1
+    },
+    LLMTask.FACTS: {
+        "model": OpenAIModel.GPT_35_16K,
+        "max_tokens": 400,
+        "timeout": 20,
+        "retry_delay": 1
+    },
+    LLMTask.HEADER: {
+        "model": OpenAIModel.GPT_35_16K,
+        "max_tokens": 1_200,
+        "timeout": 30,
+        # The per-part calls are the better retry.
+        "retry_max_attempts": 0
+    },
+    LLMTask.RELATED: {
+        "model": OpenAIModel.GPT_35_16K,
+        "max_tokens": 300,
+        "timeout": 20,
+        "retry_delay": 1
+    },
+    LLMTask.SECTION: {
+        "model": OpenAIModel.GPT_35_16K,
+        "max_tokens": None,
+        "timeout": 90
+    },
+    LLMTask.STATS: {
+        "model": OpenAIModel.GPT_35_16K,
+        "max_tokens": 600,
+        "timeout": 20,
+        "retry_delay": 1
+    },
+    LLMTask.SUMMARY: {
+        "model": OpenAIModel.GPT_35,
+        "max_tokens": 320,  # The prompt asks for below 150 words.
+        "timeout": 20,
+        "retry_delay": 1
+    },
+    LLMTask.TITLE: {
+        "model": OpenAIModel.GPT_35,
+        "max_tokens": 24,
+        "temperature": 0,
+        "timeout": 10,
+        "retry_max_attempts": 2,
+        "retry_delay": 1
+    },
+    LLMTask.TOC: {
+        "model": OpenAIModel.GPT_35_16K,
+        "max_tokens": 1_500,
+        "timeout": 45
+    }
+}
+
+generation_profiles = load_generation_profiles(Configuration.GENERATION_PROFILES_PATH)
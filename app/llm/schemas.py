@@ -0,0 +1,53 @@
+from typing import Any
+
+from pydantic import BaseModel, Field, model_validator
+
+
+class EntryStatSchema(BaseModel):
+    name: str = Field(min_length=1)
+    value: str = Field(min_length=1)
+
+    @model_validator(mode="before")
+    @classmethod
+    def from_label_value_pair(cls,
+                              data: Any) -> Any:
+        # Also accept the older {"<label>": "<value>"} shape.
+        if isinstance(data, dict) and len(data) == 1 and "name" not in data:
+            name, value = next(iter(data.items()))
+            data = {"name": name, "value": value}
+        return data
+
+
+class EntryHeaderSchema(BaseModel):
+    """
+    The summary, fun facts and stats of an entry, generated in one call.
+    """
+
+    summary: str = Field(min_length=1)
+    fun_facts: list[str]
+    stats: list[EntryStatSchema]
+
+
+class FunFactsSchema(BaseModel):
+    fun_facts: list[str]
+
+
+class RelatedTopicsSchema(BaseModel):
+    related_topics: list[str]
+
+
+class StatsSchema(BaseModel):
+    stats: list[EntryStatSchema]
+
+
+class TableOfContentsSubsectionSchema(BaseModel):
+    title: str = Field(min_length=1)
+
+
+class TableOfContentsSectionSchema(BaseModel):
+    title: str = Field(min_length=1)
+    subsections: list[TableOfContentsSubsectionSchema] = []
+
+
+class TableOfContentsSchema(BaseModel):
+    sections: list[TableOfContentsSectionSchema]
@@ -0,0 +1,339 @@
+import concurrent.futures
+import random
+import threading
+from typing import Any, Iterator
+
+from openai import OpenAI
+from openai.types import CompletionUsage
+
+from app.config import Configuration, LLMTask, ProtocolKey, openai_model_pricing
+from app.llm.backends import close_stream
+from app.modules.analytics import AnalyticsLLMCall
+
+
+class LLMCallRecord:
+    """
+    What a single LLM call took and returned. Calls that raised have an
+    error and no tokens or finish reason.
+    """
+
+    def __init__(self, data: dict) -> None:
+        self.attempt: int = data.get(ProtocolKey.ATTEMPT, 0)
+        self.backend: str | None = data.get(ProtocolKey.BACKEND)
+        self.completion_tokens: int | None = data.get(ProtocolKey.COMPLETION_TOKENS)
+        self.error: str | None = data.get(ProtocolKey.ERROR)
+        self.finish_reason: str | None = data.get(ProtocolKey.FINISH_REASON)
+        self.latency: float = data[ProtocolKey.LATENCY_MS] / 1000
+        self.model: str | None = data.get(ProtocolKey.MODEL)
+        self.prompt_tokens: int | None = data.get(ProtocolKey.PROMPT_TOKENS)
+        self.repair: bool = data.get(ProtocolKey.REPAIR, False)
+        self.task: LLMTask = LLMTask(data[ProtocolKey.TASK])
+
+    def __repr__(self) -> str:
+        return f"LLM Call {self.task.value} ({self.model}, {self.latency:.3f}s)"
+
+    def as_dict(self) -> dict:
+        return {
+            ProtocolKey.ATTEMPT: self.attempt,
+            ProtocolKey.BACKEND: self.backend,
+            ProtocolKey.COMPLETION_TOKENS: self.completion_tokens,
+            ProtocolKey.ERROR: self.error,
+            ProtocolKey.FINISH_REASON: self.finish_reason,
+            ProtocolKey.LATENCY_MS: round(self.latency * 1000),
+            ProtocolKey.MODEL: self.model,
+            ProtocolKey.PROMPT_TOKENS: self.prompt_tokens,
+            ProtocolKey.REPAIR: self.repair,
+            ProtocolKey.TASK: self.task.value
+        }
+
+
+class Histogram:
+    """
+    Counts observations into fixed buckets, each holding the values up to
+    and including its bound. Percentiles are estimated as the bound of the
+    bucket they fall in, capped at the largest value seen.
+    """
+
+    def __init__(self,
+                 bounds: tuple[float, ...]) -> None:
+        self.bounds: tuple[float, ...] = bounds
+        self.counts: list[int] = [0] * (len(bounds) + 1)  # The last bucket is unbounded.
+        self.count: int = 0
+        self.max: float = 0.0
+        self.sum: float = 0.0
+
+    def observe(self,
+                value: float) -> None:
+        index = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                index = i
+                break
+
+        self.counts[index] += 1
+        self.count += 1
+        self.max = max(self.max, value)
+        self.sum += value
+
+    def percentile(self,
+                   p: float) -> float:
+        if not self.count:
+            return 0.0
+
+        rank = p / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "buckets": {
+                **{str(bound): count for bound, count in zip(self.bounds, self.counts)},
+                "+Inf": self.counts[-1]
+            },
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max
+        }
+
+
+class LLMCallAggregator:
+    """
+    Aggregates LLM call records per task: call, error and retry counts,
+    finish reasons, the backends and models that served the calls, and
+    histograms of latency and token counts.
+    """
+
+    LATENCY_BOUNDS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)  # Seconds.
+    TOKEN_BOUNDS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tasks: dict[LLMTask, dict[str, Any]] = {}
+
+    def record(self,
+               record: LLMCallRecord) -> None:
+        with self._lock:
+            stats = self._tasks.get(record.task)
+            if not stats:
+                stats = {
+                    "calls": 0,
+                    "errors": 0,
+                    "retries": 0,
+                    "repairs": 0,
+                    "backends": {},
+                    "errors_by_type": {},
+                    "finish_reasons": {},
+                    "models": {},
+                    "latency_seconds": Histogram(self.LATENCY_BOUNDS),
+                    "prompt_tokens": Histogram(self.TOKEN_BOUNDS),
+                    "completion_tokens": Histogram(self.TOKEN_BOUNDS)
+                }
+                self._tasks[record.task] = stats
+
+            stats["calls"] += 1
+            if record.attempt:
+                stats["retries"] += 1
+            if record.repair:
+                stats["repairs"] += 1
+            if record.error:
+                stats["errors"] += 1
+                stats["errors_by_type"][record.error] = stats["errors_by_type"].get(record.error, 0) + 1
+            if record.finish_reason:
+                stats["finish_reasons"][record.finish_reason] = stats["finish_reasons"].get(record.finish_reason, 0) + 1
+            if record.backend:
+                stats["backends"][record.backend] = stats["backends"].get(record.backend, 0) + 1
+            if record.model:
+                stats["models"][record.model] = stats["models"].get(record.model, 0) + 1
+
+            stats["latency_seconds"].observe(record.latency)
+            if record.prompt_tokens is not None:
+                stats["prompt_tokens"].observe(record.prompt_tokens)
+            if record.completion_tokens is not None:
+                stats["completion_tokens"].observe(record.completion_tokens)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        ret: dict[str, dict[str, Any]] = {}
+        with self._lock:
+            for task, stats in self._tasks.items():
+                ret[task.value] = {
+                    key: value.snapshot() if isinstance(value, Histogram) else
+                    dict(value) if isinstance(value, dict) else value
+                    for key, value in stats.items()
+                }
+        return ret
+
+
+class StructuredOutputTracker:
+    """
+    Counts how often each task's structured output needed repairing, either
+    locally or with a repair call, and how much latency those calls added.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tasks: dict[LLMTask, dict[str, float]] = {}
+
+    def record(self,
+               task: LLMTask,
+               repaired: bool = False,
+               repaired_locally: bool = False,
+               failed: bool = False,
+               added_latency: float = 0.0) -> None:
+        with self._lock:
+            counters = self._tasks.setdefault(task, {
+                "calls": 0,
+                "local_repairs": 0,
+                "repairs": 0,
+                "repair_failures": 0,
+                "added_latency": 0.0
+            })
+            counters["calls"] += 1
+            if repaired_locally:
+                counters["local_repairs"] += 1
+            if repaired or failed:
+                counters["repairs"] += 1
+                counters["added_latency"] += added_latency
+            if failed:
+                counters["repair_failures"] += 1
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        ret: dict[str, dict[str, float]] = {}
+        with self._lock:
+            for task, counters in self._tasks.items():
+                calls = counters["calls"]
+                repairs = counters["repairs"]
+                ret[task.value] = {
+                    **counters,
+                    "repair_rate": repairs / calls if calls else 0.0,
+                    "added_latency_mean": counters["added_latency"] / repairs if repairs else 0.0
+                }
+        return ret
+
+
+class TokenUsageMeter:
+    """
+    Totals the prompt and completion tokens spent per model.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._models: dict[str, dict[str, int]] = {}
+
+    def cost(self) -> float:
+        """
+        Returns the estimated cost in US dollars of the tokens spent so far.
+        """
+
+        ret = 0.0
+        for model, counters in self.snapshot().items():
+            prompt_price, completion_price = openai_model_pricing.get(model, (0.0, 0.0))
+            ret += counters["prompt_tokens"] / 1000 * prompt_price
+            ret += counters["completion_tokens"] / 1000 * completion_price
+        return ret
+
+    def record(self,
+               model: str,
+               prompt_tokens: int,
+               completion_tokens: int) -> None:
+        with self._lock:
+            counters = self._models.setdefault(model, {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0
+            })
+            counters["calls"] += 1
+            counters["prompt_tokens"] += prompt_tokens
+            counters["completion_tokens"] += completion_tokens
+
+    def snapshot(self) -> dict[str, dict[str, int]]:
+        with self._lock:
+            return {model: dict(counters) for model, counters in self._models.items()}
+
+    def total_tokens(self) -> int:
+        return sum(
+            counters["prompt_tokens"] + counters["completion_tokens"]
+            for counters in self.snapshot().values()
+        )
+
+
+llm_call_aggregator = LLMCallAggregator()
+structured_output_tracker = StructuredOutputTracker()
+token_usage_meter = TokenUsageMeter()
+# Sampled records are saved off the request path, one at a time.
+_sample_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+
+def get_chunk_usage(chunk: Any) -> CompletionUsage | None:
+    """
+    Returns the usage a streamed chunk carries, which with
+    `stream_options.include_usage` only the last one does. The client
+    doesn't know the field yet, so it comes as a dict.
+    """
+
+    usage = getattr(chunk, "usage", None)
+    if isinstance(usage, dict):
+        usage = CompletionUsage.model_validate(usage)
+    return usage
+
+
+def install(client: OpenAI) -> None:
+    """
+    Meters the token usage of the client's chat completions and embeddings.
+    """
+
+    create = client.chat.completions.create
+    create_embedding = client.embeddings.create
+
+    def meter_stream(chunks: Iterator[Any],
+                     model: str) -> Iterator[Any]:
+        try:
+            for chunk in chunks:
+                usage = get_chunk_usage(chunk)
+                if usage:
+                    token_usage_meter.record(model, usage.prompt_tokens, usage.completion_tokens)
+                yield chunk
+        finally:
+            close_stream(chunks)
+
+    def create_with_meter(**kwargs) -> Any:
+        response = create(**kwargs)
+        if kwargs.get("stream"):
+            return meter_stream(response, kwargs.get("model"))
+
+        usage = getattr(response, "usage", None)
+        if usage:
+            token_usage_meter.record(kwargs.get("model"), usage.prompt_tokens, usage.completion_tokens)
+        return response
+
+    def create_embedding_with_meter(**kwargs) -> Any:
+        response = create_embedding(**kwargs)
+        usage = getattr(response, "usage", None)
+        if usage:
+            # Embeddings only have input tokens.
+            token_usage_meter.record(kwargs.get("model"), usage.prompt_tokens, 0)
+        return response
+
+    client.chat.completions.create = create_with_meter
+    client.embeddings.create = create_embedding_with_meter
+
+
+def record_llm_call(record: LLMCallRecord) -> None:
+    """
+    Adds a call's record to the aggregator and, for a sample of calls,
+    saves it to the database for capacity planning.
+    """
+
+    llm_call_aggregator.record(record)
+    if Configuration.LLM_TELEMETRY_SAMPLE_RATE > 0 and random.random() < Configuration.LLM_TELEMETRY_SAMPLE_RATE:
+        try:
+            _sample_executor.submit(AnalyticsLLMCall.create, record.as_dict())
+        except RuntimeError:
+            pass  # Shutting down.
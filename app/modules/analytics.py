@@ -1,3 +1,5 @@
+import uuid
+
 from app.config import DatabaseTable, ProtocolKey
 from app.modules.db import RelationalDB
 
@@ -7,6 +9,91 @@ from app.modules.db import RelationalDB
 ###########
 
 
+class AnalyticsEntryStageTiming:
+    @staticmethod
+    def create_all(entry_id: uuid.UUID,
+                   timings: dict[str, tuple[float, float]]) -> None:
+        """
+        Call this method to log how long each stage of an entry's creation
+        took. Timings map a stage name to its (start offset, duration) in
+        seconds.
+        """
+
+        if not isinstance(entry_id, uuid.UUID):
+            raise TypeError(f"Argument 'entry_id' must be of type UUID, not {type(entry_id)}.")
+
+        if not isinstance(timings, dict):
+            raise TypeError(f"Argument 'timings' must be of type dict, not {type(timings)}.")
+
+        if not timings:
+            return
+
+        db = RelationalDB()
+        try:
+            cursor = db.connection.cursor()
+            cursor.executemany(
+                f"""
+                INSERT INTO
+                    {DatabaseTable.ANALYTICS_ENTRY_STAGE_TIMING}
+                    ({ProtocolKey.DURATION_MS}, {ProtocolKey.ENTRY_ID}, {ProtocolKey.STAGE},
+                     {ProtocolKey.START_OFFSET_MS})
+                VALUES
+                    (%s, %s, %s,
+                     %s);
+                """,
+                [
+                    (round(duration * 1000), entry_id, stage,
+                     round(start_offset * 1000))
+                    for stage, (start_offset, duration) in timings.items()
+                ]
+            )
+            db.connection.commit()
+        except Exception as e:
+            print(e)
+        finally:
+            db.close()
+
+
+class AnalyticsLLMCall:
+    @staticmethod
+    def create(data: dict) -> None:
+        """
+        Call this method to log the telemetry record of a single LLM call,
+        as returned by `LLMCallRecord.as_dict()`.
+        """
+
+        if not isinstance(data, dict):
+            raise TypeError(f"Argument 'data' must be of type dict, not {type(data)}.")
+
+        db = RelationalDB()
+        try:
+            cursor = db.connection.cursor()
+            cursor.execute(
+                f"""
+                INSERT INTO
+                    {DatabaseTable.ANALYTICS_LLM_CALL}
+                    ({ProtocolKey.ATTEMPT}, {ProtocolKey.BACKEND}, {ProtocolKey.COMPLETION_TOKENS},
+                     {ProtocolKey.ERROR}, {ProtocolKey.FINISH_REASON}, {ProtocolKey.LATENCY_MS},
+                     {ProtocolKey.MODEL}, {ProtocolKey.PROMPT_TOKENS}, {ProtocolKey.REPAIR},
+                     {ProtocolKey.TASK})
+                VALUES
+                    (%s, %s, %s,
+                     %s, %s, %s,
+                     %s, %s, %s,
+                     %s);
+                """,
+                (data[ProtocolKey.ATTEMPT], data[ProtocolKey.BACKEND], data[ProtocolKey.COMPLETION_TOKENS],
+                 data[ProtocolKey.ERROR], data[ProtocolKey.FINISH_REASON], data[ProtocolKey.LATENCY_MS],
+                 data[ProtocolKey.MODEL], data[ProtocolKey.PROMPT_TOKENS], data[ProtocolKey.REPAIR],
+                 data[ProtocolKey.TASK])
+            )
+            db.connection.commit()
+        except Exception as e:
+            print(e)
+        finally:
+            db.close()
+
+
 class AnalyticsTopicHistory:
     @staticmethod
     def create(topic: str) -> None:
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+import threading
+from typing import Hashable
+
+import numpy as np
+
+from app.config import Configuration
+
+
+###########
+# CLASSES #
+###########
+
+
+class SemanticAnswerCache:
+    """
+    Earlier answers, per key, along with the embeddings of the questions
+    they answered. A question is answered from the cache when its cosine
+    similarity to a cached question reaches the threshold.
+
+    Up to `max_keys` keys are kept, least recently used first out, each with
+    its latest `max_answers` answers.
+    """
+
+    def __init__(self,
+                 threshold: float,
+                 max_answers: int,
+                 max_keys: int) -> None:
+        self.max_answers: int = max_answers
+        self.max_keys: int = max_keys
+        self.threshold: float = threshold
+        self._entries: OrderedDict[Hashable, tuple[np.ndarray, list]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def add(self,
+            key: Hashable,
+            embedding: list[float],
+            answer: object) -> None:
+        vector = self._normalize(embedding)
+        with self._lock:
+            if key in self._entries:
+                embeddings, answers = self._entries.pop(key)
+                embeddings = np.vstack([embeddings, vector])[-self.max_answers:]
+                answers = (answers + [answer])[-self.max_answers:]
+            else:
+                embeddings, answers = vector[np.newaxis, :], [answer]
+
+            self._entries[key] = (embeddings, answers)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get(self,
+            key: Hashable,
+            embedding: list[float]) -> object | None:
+        """
+        Returns the answer to the most similar cached question, if it is
+        similar enough.
+        """
+
+        vector = self._normalize(embedding)
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            self._entries.move_to_end(key)
+            embeddings, answers = entry
+
+        # Rows are unit vectors, so the dot products are the cosine similarities.
+        similarities = embeddings @ vector
+        index = int(np.argmax(similarities))
+        if similarities[index] < self.threshold:
+            return None
+        return answers[index]
+
+
+chat_answer_cache = SemanticAnswerCache(
+    Configuration.CHAT_ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    Configuration.CHAT_ANSWER_CACHE_MAX_ANSWERS,
+    Configuration.CHAT_ANSWER_CACHE_MAX_KEYS
+)
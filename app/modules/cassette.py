@@ -0,0 +1,225 @@
+"""
+Record/replay of OpenAI and SerpAPI traffic.
+
+In record mode, every call goes out as usual and its request fingerprint,
+response and timing are saved to a cassette on disk. In replay mode, calls
+are answered from the cassettes without any network access, after waiting
+as long as the original call took (scaled by CASSETTE_LATENCY_SCALE). That
+makes benchmarks of the generation pipeline reproducible.
+"""
+
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Iterator
+
+from openai import OpenAI
+from openai.types import CreateEmbeddingResponse
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from serpapi import GoogleSearch
+
+from app.config import CassetteMode, Configuration
+
+
+###########
+# CLASSES #
+###########
+
+
+class CassetteMissError(LookupError):
+    """
+    Raised in replay mode when no recording matches a request.
+    """
+
+
+class Cassette:
+    def __init__(self,
+                 directory: str,
+                 mode: CassetteMode,
+                 latency_scale: float = 1.0) -> None:
+        self.directory: str = directory
+        self.latency_scale: float = latency_scale
+        self.mode: CassetteMode = mode
+        self._lock = threading.Lock()
+        # Next interaction to replay per fingerprint, so repeated requests cycle through recordings.
+        self._replay_positions: dict[str, int] = {}
+
+    def _load(self,
+              kind: str,
+              fingerprint: str) -> list[dict]:
+        path = self.path(kind, fingerprint)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["interactions"]
+
+    def _next_interaction(self,
+                          kind: str,
+                          request: dict) -> dict:
+        fingerprint = make_fingerprint(request)
+        interactions = self._load(kind, fingerprint)
+        if not interactions:
+            raise CassetteMissError(f"No {kind} recording for request {fingerprint}.")
+
+        with self._lock:
+            position = self._replay_positions.get(fingerprint, 0)
+            self._replay_positions[fingerprint] = position + 1
+        return interactions[position % len(interactions)]
+
+    def _save(self,
+              kind: str,
+              request: dict,
+              interaction: dict) -> None:
+        fingerprint = make_fingerprint(request)
+        path = self.path(kind, fingerprint)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            interactions = self._load(kind, fingerprint)
+            interactions.append({
+                "recorded_at": datetime.now().astimezone().isoformat(),
+                "request": request,
+                **interaction
+            })
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"interactions": interactions}, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, path)
+
+    def _sleep(self,
+               seconds: float) -> None:
+        if seconds > 0 and self.latency_scale > 0:
+            time.sleep(seconds * self.latency_scale)
+
+    def path(self,
+             kind: str,
+             fingerprint: str) -> str:
+        return os.path.join(self.directory, kind, f"{fingerprint}.json")
+
+    def play(self,
+             kind: str,
+             request: dict,
+             call: Callable[[], Any],
+             dump: Callable[[Any], Any] = lambda response: response,
+             load: Callable[[Any], Any] = lambda response: response) -> Any:
+        """
+        Makes (and records) or replays a call. `dump` and `load` convert
+        the response to and from something JSON-serializable.
+        """
+
+        if self.mode == CassetteMode.REPLAY:
+            interaction = self._next_interaction(kind, request)
+            self._sleep(interaction["elapsed"])
+            return load(interaction["response"])
+
+        start_time = time.monotonic()
+        response = call()
+        if self.mode == CassetteMode.RECORD:
+            self._save(kind, request, {
+                "elapsed": time.monotonic() - start_time,
+                "response": dump(response)
+            })
+        return response
+
+    def play_stream(self,
+                    kind: str,
+                    request: dict,
+                    call: Callable[[], Iterator[Any]],
+                    dump: Callable[[Any], Any] = lambda chunk: chunk,
+                    load: Callable[[Any], Any] = lambda chunk: chunk) -> Iterator[Any]:
+        """
+        Like `play`, for streamed responses. The arrival time of every chunk
+        is recorded and replayed.
+        """
+
+        if self.mode == CassetteMode.REPLAY:
+            interaction = self._next_interaction(kind, request)
+            previous_offset = 0.0
+            for offset, chunk in interaction["chunks"]:
+                self._sleep(offset - previous_offset)
+                previous_offset = offset
+                yield load(chunk)
+            return
+
+        start_time = time.monotonic()
+        chunks = []
+        for chunk in call():
+            chunks.append([time.monotonic() - start_time, dump(chunk)])
+            yield chunk
+
+        if self.mode == CassetteMode.RECORD:
+            self._save(kind, request, {
+                "elapsed": time.monotonic() - start_time,
+                "chunks": chunks
+            })
+
+
+cassette = Cassette(
+    Configuration.CASSETTE_DIR,
+    Configuration.CASSETTE_MODE,
+    latency_scale=Configuration.CASSETTE_LATENCY_SCALE
+)
+
+
+####################
+# MODULE FUNCTIONS #
+####################
+
+
+def get_search_results(params: dict) -> dict:
+    """
+    A drop-in for `GoogleSearch(params).get_dict()`.
+    """
+
+    # The API key doesn't change the results, so it's kept out of the fingerprint and the cassette.
+    request = {key: value for key, value in params.items() if key != "api_key"}
+    return cassette.play("serpapi", request, lambda: GoogleSearch(params).get_dict())
+
+
+def install(client: OpenAI) -> None:
+    """
+    Routes the client's chat completions and embeddings through the
+    cassette.
+    """
+
+    create = client.chat.completions.create
+    create_embedding = client.embeddings.create
+
+    def create_with_cassette(**kwargs) -> Any:
+        # The timeout doesn't change the response.
+        request = {key: value for key, value in kwargs.items() if key != "timeout"}
+        if kwargs.get("stream"):
+            return cassette.play_stream(
+                "openai",
+                request,
+                lambda: create(**kwargs),
+                dump=lambda chunk: chunk.model_dump(),
+                load=ChatCompletionChunk.model_validate
+            )
+        return cassette.play(
+            "openai",
+            request,
+            lambda: create(**kwargs),
+            dump=lambda response: response.model_dump(),
+            load=ChatCompletion.model_validate
+        )
+
+    def create_embedding_with_cassette(**kwargs) -> Any:
+        request = {key: value for key, value in kwargs.items() if key != "timeout"}
+        return cassette.play(
+            "openai_embeddings",
+            request,
+            lambda: create_embedding(**kwargs),
+            dump=lambda response: response.model_dump(),
+            load=CreateEmbeddingResponse.model_validate
+        )
+
+    client.chat.completions.create = create_with_cassette
+    client.embeddings.create = create_embedding_with_cassette
+
+
+def make_fingerprint(request: dict) -> str:
+    canonical = json.dumps(request, default=str, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
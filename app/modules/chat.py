@@ -2,7 +2,6 @@ from bs4 import BeautifulSoup
 from datetime import datetime
 from flask import request
 from flask_socketio import disconnect, Namespace, send
-import markdown
 import sched
 import threading
 import time
@@ -10,10 +9,11 @@ from typing import TypeVar, Type
 import uuid
 
 from app.config import (ChatMessageSenderRole, Configuration, DatabaseTable,
-                        ProtocolKey, ResponseStatus)
+                        MarkdownProfile, ProtocolKey, ResponseStatus)
 from app.llm import gpt
 from app.modules.db import RelationalDB
 from app.modules.chat_message import ChatMessage
+from app.modules.rendering import render_markdown
 from app.modules.user import User
 from app.modules.user_session import UserSession
 
@@ -120,19 +120,7 @@ class ChatNamespace(Namespace):
             send({ProtocolKey.ERROR: "Message exceeds maximum length allowed."})
             return
 
-        md_extension_configs = {
-            "pymdownx.highlight": {
-                "auto_title": True,
-                "auto_title_map": {
-                    "Python Console Session": "Python"
-                }
-            }
-        }
-        content_html = markdown.markdown(
-            content_md,
-            extensions=["pymdownx.superfences"],
-            extension_configs=md_extension_configs
-        )
+        content_html = render_markdown(content_md, MarkdownProfile.CHAT_MESSAGE)
 
         if not chat_session.chat.messages:
             # Message history of the chat might not be loaded yet.
@@ -158,11 +146,7 @@ class ChatNamespace(Namespace):
 
         # Get a response from OpenAI.
         llm_response_md = gpt.chat(chat_session.chat.messages)
-        llm_response_html = markdown.markdown(
-            llm_response_md,
-            extensions=["pymdownx.superfences"],
-            extension_configs=md_extension_configs
-        )
+        llm_response_html = render_markdown(llm_response_md, MarkdownProfile.CHAT_MESSAGE)
         response: ChatMessage = ChatMessage.create(
             chat_id=chat_id,
             content_html=llm_response_html,
@@ -595,15 +579,6 @@ def make(session_id: str,
         else:
             message = None
 
-        md_extension_configs = {
-            "pymdownx.highlight": {
-                "auto_title": True,
-                "auto_title_map": {
-                    "Python Console Session": "Python"
-                }
-            }
-        }
-
         if len(content_md) > Configuration.CHAT_MESSAGE_MAX_LEN:
             response_status = ResponseStatus.BAD_REQUEST
             response = {
@@ -666,20 +641,12 @@ def make(session_id: str,
                     )
                     updated_md = message.content_md[:md_start] + "[" + message.content_md[md_start:md_end] + \
                         f"](/c/{str(chat.id)})" + message.content_md[md_end:]
-                    updated_html = markdown.markdown(
-                        updated_md,
-                        extensions=["pymdownx.superfences"],
-                        extension_configs=md_extension_configs
-                    )
-                    message.content_html = updated_html
                     message.content_md = updated_md
+                    # Rendered again from the Markdown when it's next read (or saved, if HTML is stored).
+                    message.content_html = None
                     message.update()
 
-                content_html = markdown.markdown(
-                    content_md,
-                    extensions=["pymdownx.superfences"],
-                    extension_configs=md_extension_configs
-                )
+                content_html = render_markdown(content_md, MarkdownProfile.CHAT_MESSAGE)
 
                 if message:
                     chat_history = message.get_all_prior()
@@ -695,11 +662,7 @@ def make(session_id: str,
                 chat.messages.append(first_user_message)
                 # Get a response from OpenAI.
                 llm_response_md = gpt.chat(chat.messages)
-                llm_response_html = markdown.markdown(
-                    llm_response_md,
-                    extensions=["pymdownx.superfences"],
-                    extension_configs=md_extension_configs
-                )
+                llm_response_html = render_markdown(llm_response_md, MarkdownProfile.CHAT_MESSAGE)
 
                 llm_response: ChatMessage = ChatMessage.create(
                     chat_id=chat.id,
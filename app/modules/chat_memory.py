@@ -0,0 +1,99 @@
+import concurrent.futures
+import threading
+
+from app.config import Configuration
+from app.llm import gpt
+from app.modules.chat_message import ChatMessage
+
+
+###########
+# CLASSES #
+###########
+
+
+class ChatMemory:
+    """
+    The history of an entry chat as the LLM sees it: the last few turns
+    verbatim and a running summary of everything before them, so that the
+    prompt stops growing with the conversation. The summary is brought up
+    to date in the background after each reply; until it is, the turns
+    still waiting to be folded in are sent verbatim.
+    """
+
+    def __init__(self,
+                 topic: str,
+                 recent_turns: int = Configuration.CHAT_MEMORY_RECENT_TURNS) -> None:
+        if not isinstance(topic, str):
+            raise TypeError(f"Argument 'topic' must be of type str, not {type(topic)}.")
+
+        if not isinstance(recent_turns, int) or recent_turns < 1:
+            raise ValueError(f"Argument 'recent_turns' must be a positive int, not {recent_turns}.")
+
+        self.messages: list[ChatMessage] = []
+        self.recent_turns: int = recent_turns
+        self.summary: str | None = None
+        # Number of messages at the start of `messages` that are in the summary.
+        self.summarized_count: int = 0
+        self.topic: str = topic
+        self._lock = threading.Lock()
+        self._summarizing: bool = False
+
+    def __repr__(self) -> str:
+        return f"Chat Memory '{self.topic}' ({len(self.messages)} messages, {self.summarized_count} summarized)"
+
+    def _summarize(self,
+                   summary: str | None,
+                   messages: list[ChatMessage],
+                   end: int) -> None:
+        try:
+            new_summary = gpt.get_entry_chat_summary(self.topic, summary, messages)
+        except Exception as e:
+            print(e)
+            new_summary = None
+
+        with self._lock:
+            if new_summary:
+                self.summary = new_summary
+                self.summarized_count = end
+            self._summarizing = False
+
+    def append(self,
+               message: ChatMessage) -> None:
+        with self._lock:
+            self.messages.append(message)
+
+    def get_context(self) -> tuple[str | None, list[ChatMessage]]:
+        """
+        Returns the summary and the messages after it, to send along with
+        the next request.
+        """
+
+        with self._lock:
+            return (self.summary, self.messages[self.summarized_count:])
+
+    def summarize(self) -> None:
+        """
+        Folds the turns before the last `recent_turns` into the summary, in
+        the background. Does nothing if there are none or if a summary is
+        already being made.
+        """
+
+        with self._lock:
+            # A turn is a user message and its reply.
+            end = len(self.messages) - self.recent_turns * 2
+            if self._summarizing or end <= self.summarized_count:
+                return
+
+            self._summarizing = True
+            summary = self.summary
+            messages = self.messages[self.summarized_count:end]
+
+        try:
+            summary_executor.submit(self._summarize, summary, messages, end)
+        except RuntimeError:
+            # Shutting down.
+            with self._lock:
+                self._summarizing = False
+
+
+summary_executor = concurrent.futures.ThreadPoolExecutor(Configuration.CHAT_MEMORY_SUMMARY_MAX_WORKERS)
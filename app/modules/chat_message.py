@@ -3,9 +3,10 @@ from flask import request
 from typing import TypeVar, Type
 import uuid
 
-from app.config import (ChatMessageSenderRole, DatabaseTable, ProtocolKey,
-                        ResponseStatus)
+from app.config import (ChatMessageSenderRole, DatabaseTable, MarkdownProfile,
+                        ProtocolKey, ResponseStatus)
 from app.modules.db import RelationalDB
+from app.modules.rendering import RENDERER_VERSION, get_html, get_html_to_store
 from app.modules.user import User
 
 
@@ -21,10 +22,11 @@ class ChatMessage:
     def __init__(self,
                  data: dict = {}) -> None:
         self.chat_id: uuid.UUID = None
-        self.content_html: str = None
+        self._content_html: str = None
         self.content_md: str = None
         self.creation_timestamp: datetime = None
         self.id: uuid.UUID = None
+        self.renderer_version: int = None
         self.sender_id: int = None
         self.sender: User = None
         self.sender_role: ChatMessageSenderRole = None
@@ -33,7 +35,7 @@ class ChatMessage:
             self.chat_id: uuid.UUID = data[ProtocolKey.CHAT_ID]
 
         if ProtocolKey.CONTENT_HTML in data:
-            self.content_html: str = data[ProtocolKey.CONTENT_HTML]
+            self._content_html: str = data[ProtocolKey.CONTENT_HTML]
 
         if ProtocolKey.CONTENT_MARKDOWN in data:
             self.content_md: str = data[ProtocolKey.CONTENT_MARKDOWN]
@@ -44,6 +46,9 @@ class ChatMessage:
         if ProtocolKey.ID in data:
             self.id: uuid.UUID = data[ProtocolKey.ID]
 
+        if ProtocolKey.RENDERER_VERSION in data:
+            self.renderer_version: int = data[ProtocolKey.RENDERER_VERSION]
+
         if ProtocolKey.SENDER in data:
             self.sender: User = User(data[ProtocolKey.SENDER])
 
@@ -67,6 +72,16 @@ class ChatMessage:
     def __repr__(self) -> str:
         return f"Chat Message {self.id}: {self.content_md}"
 
+    @property
+    def content_html(self) -> str | None:
+        return get_html(self.content_md, self._content_html, self.renderer_version, MarkdownProfile.CHAT_MESSAGE)
+
+    @content_html.setter
+    def content_html(self,
+                     content_html: str | None) -> None:
+        self._content_html = content_html
+        self.renderer_version = RENDERER_VERSION
+
     def as_dict(self) -> dict:
         serialized = {
             ProtocolKey.CHAT_ID: str(self.chat_id),
@@ -142,14 +157,14 @@ class ChatMessage:
                     INSERT INTO
                         {DatabaseTable.CHAT_MESSAGE}
                         ({ProtocolKey.CHAT_ID}, {ProtocolKey.CONTENT_HTML}, {ProtocolKey.CONTENT_MARKDOWN},
-                        {ProtocolKey.SENDER_ID}, {ProtocolKey.SENDER_ROLE})
+                        {ProtocolKey.RENDERER_VERSION}, {ProtocolKey.SENDER_ID}, {ProtocolKey.SENDER_ROLE})
                     VALUES
                         (%s, %s, %s,
-                         %s, %s)
+                         %s, %s, %s)
                     RETURNING *;
                     """,
-                    (chat_id, content_html, content_md,
-                     sender_id, sender_role.value)
+                    (chat_id, get_html_to_store(content_html), content_md,
+                     RENDERER_VERSION, sender_id, sender_role.value)
                 )
             else:
                 cursor.execute(
@@ -157,14 +172,14 @@ class ChatMessage:
                     INSERT INTO
                         {DatabaseTable.CHAT_MESSAGE}
                         ({ProtocolKey.CHAT_ID}, {ProtocolKey.CONTENT_HTML}, {ProtocolKey.CONTENT_MARKDOWN},
-                        {ProtocolKey.SENDER_ROLE})
+                        {ProtocolKey.RENDERER_VERSION}, {ProtocolKey.SENDER_ROLE})
                     VALUES
                         (%s, %s, %s,
-                         %s)
+                         %s, %s)
                     RETURNING *;
                     """,
-                    (chat_id, content_html, content_md,
-                     sender_role.value)
+                    (chat_id, get_html_to_store(content_html), content_md,
+                     RENDERER_VERSION, sender_role.value)
                 )
             result = cursor.fetchone()
             db.connection.commit()
@@ -331,11 +346,13 @@ class ChatMessage:
                 UPDATE
                     {DatabaseTable.CHAT_MESSAGE}
                 SET
-                    {ProtocolKey.CONTENT_HTML} = %s, {ProtocolKey.CONTENT_MARKDOWN} = %s
+                    {ProtocolKey.CONTENT_HTML} = %s, {ProtocolKey.CONTENT_MARKDOWN} = %s,
+                    {ProtocolKey.RENDERER_VERSION} = %s
                 WHERE
                     {ProtocolKey.ID} = %s;
                 """,
-                (self.content_html, self.content_md, self.id)
+                (get_html_to_store(self.content_html), self.content_md, RENDERER_VERSION,
+                 self.id)
             )
             db.connection.commit()
         except Exception as e:
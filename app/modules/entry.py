@@ -1,33 +1,53 @@
+import collections
 import concurrent.futures
 from datetime import datetime
-import json
 import sched
 import threading
 import time
 from typing import (
     Any,
+    Iterable,
     Iterator,
     Type,
     TypeVar
 )
 import uuid
 
-import markdown
-from serpapi import GoogleSearch
+import orjson
 
+from app import llm_router
 from app.config import (
     ChatMessageSenderRole,
     Configuration,
     DatabaseTable,
+    EntryChannelCommand,
+    EntryEventType,
+    GenerationArtifact,
+    GenerationEventType,
+    MarkdownProfile,
     ProtocolKey,
+    RenderMode,
     ResponseStatus,
     UserTopicProficiency
 )
 from app.llm import gpt
-from app.modules import util
-from app.modules.analytics import AnalyticsTopicHistory
+from app.modules import cassette, topic_normalization, util
+from app.modules.answer_cache import chat_answer_cache
+from app.modules.analytics import AnalyticsEntryStageTiming, AnalyticsTopicHistory
+from app.modules.chat_memory import ChatMemory
 from app.modules.chat_message import ChatMessage
 from app.modules.db import RelationalDB
+from app.modules.generation_lock import GenerationLock, single_flight
+from app.modules.notifications import notification_listener, notify
+from app.modules.pipeline import Pipeline, PipelineRun, PipelineStage
+from app.modules.rendering import (
+    RENDERER_VERSION,
+    IncrementalMarkdownRenderer,
+    get_html,
+    get_html_to_store,
+    render_markdown
+)
+from app.modules.serialization import SSE_CLOSE, SSEFragmentEncoder, dumps, sse_event
 from app.modules.user import User
 from app.modules.user_session import UserSession
 
@@ -39,6 +59,7 @@ from app.modules.user_session import UserSession
 
 T = TypeVar("T", bound="Entry")
 X = TypeVar("X", bound="EntryCoverImage")
+Z = TypeVar("Z", bound="EntryEvent")
 U = TypeVar("U", bound="EntryFunFact")
 Y = TypeVar("Y", bound="EntryRelatedTopic")
 V = TypeVar("V", bound="EntrySection")
@@ -56,6 +77,7 @@ class EntryPurgeJob(threading.Thread):
     def purge(self,
               scheduled_task) -> None:
         Entry.purge()
+        EntryEvent.purge()
         scheduled_task.enter(
             Configuration.ENTRY_PURGE_CHECK_INTERVAL,
             1,
@@ -348,6 +370,57 @@ class Entry:
 
         return ret
 
+    @classmethod
+    def get_by_topic(cls: Type,
+                     proficiency: UserTopicProficiency,
+                     topic: str,
+                     user_id: int) -> T | None:
+        """
+        Returns the user's latest entry on the topic whose header was made.
+        """
+
+        if not isinstance(proficiency, UserTopicProficiency):
+            raise TypeError(f"Argument 'proficiency' must be of type UserTopicProficiency, not {type(proficiency)}.")
+
+        if not isinstance(topic, str):
+            raise TypeError(f"Argument 'topic' must be of type str, not {type(topic)}.")
+
+        if not isinstance(user_id, int):
+            raise TypeError(f"Argument 'user_id' must be of type int, not {type(user_id)}.")
+
+        ret: Type = None
+        db = RelationalDB()
+        try:
+            cursor = db.connection.cursor()
+            cursor.execute(
+                f"""
+                SELECT
+                    *
+                FROM
+                    {DatabaseTable.ENTRY}
+                WHERE
+                    {ProtocolKey.PROFICIENCY} = %s AND
+                    {ProtocolKey.TOPIC} = %s AND
+                    {ProtocolKey.USER_ID} = %s AND
+                    {ProtocolKey.SUMMARY} IS NOT NULL
+                ORDER BY
+                    {ProtocolKey.CREATION_TIMESTAMP} DESC
+                LIMIT
+                    1;
+                """,
+                (proficiency, topic, user_id)
+            )
+            result = cursor.fetchone()
+            db.connection.commit()
+            if result:
+                ret = cls(result)
+        except Exception as e:
+            print(e)
+        finally:
+            db.close()
+
+        return ret
+
     @staticmethod
     def purge() -> None:
         db = RelationalDB()
@@ -367,6 +440,484 @@ class Entry:
         finally:
             db.close()
 
+    def update(self) -> None:
+        if not isinstance(self.id, uuid.UUID):
+            raise TypeError(f"Entry must have an existing ID in order to update.")
+
+        db = RelationalDB()
+        try:
+            cursor = db.connection.cursor()
+            cursor.execute(
+                f"""
+                UPDATE
+                    {DatabaseTable.ENTRY}
+                SET
+                    {ProtocolKey.SUMMARY} = %s
+                WHERE
+                    {ProtocolKey.ID} = %s;
+                """,
+                (self.summary, self.id)
+            )
+            db.connection.commit()
+        except Exception as e:
+            print(e)
+        finally:
+            db.close()
+
+
+class EntryBroadcast:
+    """
+    The sections of an entry as they are generated, for every request in
+    this process that waits on another one, in any worker, to generate
+    them.
+
+    The generating request logs to `entry_event_` when it starts each part,
+    each fragment of it, and when it saves it. It then notifies the entry's
+    channel with the section's stream. After a notification, the first
+    request that needs what's new in a stream reads it, once for every
+    request waiting here. A request that joins late reads the log from the
+    beginning, so it catches up on the part in progress.
+    """
+
+    def __init__(self,
+                 entry_id: uuid.UUID) -> None:
+        self.entry_id: uuid.UUID = entry_id
+        self._events: dict[str, list[EntryEvent]] = {}
+        self._fetch_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._signals: list[util.CrossThreadEvent] = []
+        # Streams with events not read yet.
+        self._stale: set[str] = set()
+
+    def __repr__(self) -> str:
+        return f"Entry Broadcast {self.entry_id} ({len(self._signals)} waiting)"
+
+    @staticmethod
+    def notification_channel(entry_id: uuid.UUID) -> str:
+        return f"entry_broadcast_{entry_id.hex}"
+
+    @staticmethod
+    def stream(section_id: uuid.UUID) -> str:
+        return f"generation:{section_id}"
+
+    def _notified(self,
+                  stream: str) -> None:
+        with self._lock:
+            self._stale.add(stream)
+            signals = list(self._signals)
+
+        for signal in signals:
+            signal.set()
+
+    def events(self,
+               section_id: uuid.UUID,
+               position: int = 0) -> list[Z]:
+        """
+        The events of a section's generation, from the given position in
+        its log on.
+        """
+
+        stream = EntryBroadcast.stream(section_id)
+        with self._fetch_lock:
+            with self._lock:
+                stale = stream in self._stale or stream not in self._events
+                self._stale.discard(stream)
+                events = self._events.setdefault(stream, [])
+                after_id = events[-1].id if events else 0
+
+            if stale:
+                new_events = EntryEvent.get_all_for_stream(self.entry_id, stream, after_id)
+                with self._lock:
+                    events.extend(new_events)
+
+        with self._lock:
+            return events[position:]
+
+    def follow(self,
+               part: V,
+               position: int,
+               signal: util.CrossThreadEvent,
+               streamed: set[uuid.UUID],
+               render_mode: RenderMode = RenderMode.SERVER,
+               timeout: float = None,
+               cancellation: util.Cancellation = None) -> Iterator["EntrySectionFragment"]:
+        """
+        Yields the fragments of a part that another request is generating
+        from the start of its latest attempt at it, until the part is saved,
+        the timeout runs out or it's cancelled. `streamed` has the parts
+        that fragments have been yielded of, which are reset if their
+        generation starts over. Returns the position in the section's log
+        to go on from.
+        """
+
+        encoder = EntrySectionFragment.make_encoder(part, render_mode)
+        deadline = time.monotonic() + (timeout or 0)
+        while True:
+            events = [(event, orjson.loads(event.data)) for event in self.events(part.parent_id or part.id, position)]
+
+            # Only the latest attempt at the part is of interest.
+            start = 0
+            for i, (event, data) in enumerate(events):
+                if event.part_id == part.id:
+                    if data[ProtocolKey.TYPE] == GenerationEventType.STARTED:
+                        start = i
+                    elif data[ProtocolKey.TYPE] == GenerationEventType.SAVED:
+                        break
+            position += start
+
+            for event, data in events[start:]:
+                position += 1
+                if event.part_id != part.id:
+                    continue
+
+                event_type = GenerationEventType(data[ProtocolKey.TYPE])
+                if event_type == GenerationEventType.SAVED:
+                    return position
+                elif event_type == GenerationEventType.STARTED and part.id in streamed:
+                    streamed.discard(part.id)
+                    yield EntrySectionFragment.make_reset(part, render_mode)
+                elif event_type == GenerationEventType.FRAGMENT:
+                    streamed.add(part.id)
+                    yield EntrySectionFragment.from_markdown(part, data[ProtocolKey.FRAGMENT_MARKDOWN], render_mode, encoder)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (cancellation and cancellation.cancelled):
+                return position
+            signal.wait(remaining)
+
+    @classmethod
+    def join(cls: Type,
+             entry_id: uuid.UUID) -> tuple["EntryBroadcast", util.CrossThreadEvent]:
+        """
+        Returns the entry's broadcast, and an event that is set whenever
+        there is news, until `leave()` is called with it.
+        """
+
+        signal = util.CrossThreadEvent()
+        with entry_broadcasts_lock:
+            broadcast: EntryBroadcast = entry_broadcasts.get(entry_id)
+            if not broadcast:
+                broadcast = cls(entry_id)
+                entry_broadcasts[entry_id] = broadcast
+                notification_listener.subscribe(EntryBroadcast.notification_channel(entry_id), broadcast._notified)
+
+            with broadcast._lock:
+                broadcast._signals.append(signal)
+
+        return (broadcast, signal)
+
+    def leave(self,
+              signal: util.CrossThreadEvent) -> None:
+        signal.close()
+        with entry_broadcasts_lock:
+            with self._lock:
+                if signal in self._signals:
+                    self._signals.remove(signal)
+                waiting = bool(self._signals)
+
+            if not waiting:
+                entry_broadcasts.pop(self.entry_id, None)
+                notification_listener.unsubscribe(EntryBroadcast.notification_channel(self.entry_id), self._notified)
+
+    @staticmethod
+    def make_event_data(event_type: GenerationEventType,
+                        fragment_md: str = None) -> str:
+        data = {ProtocolKey.TYPE: event_type}
+        if fragment_md is not None:
+            data[ProtocolKey.FRAGMENT_MARKDOWN] = fragment_md
+        return dumps(data).decode("utf-8")
+
+    @staticmethod
+    def publish(part: V,
+                event_type: GenerationEventType,
+                fragment_md: str = None) -> None:
+        """
+        Logs an event of the generation of a part, for whoever waits on it.
+        The events of a part being generated go through an
+        `EntryEventWriter` instead.
+        """
+
+        EntryEvent.create(
+            entry_id=part.entry_id,
+            stream=EntryBroadcast.stream(part.parent_id or part.id),
+            data=EntryBroadcast.make_event_data(event_type, fragment_md),
+            part_id=part.id,
+            notify_channel=EntryBroadcast.notification_channel(part.entry_id)
+        )
+
+
+class EntryChannel:
+    """
+    One stream of everything an entry page waits for: the events of the
+    sources it asks for (its ToC and first section, cover image, related
+    topics and header), and of the sections it asks for by command as the
+    reader goes, each with the type of its source. The sources share the
+    entry, loaded once, and run on threads while the stream's greenlet waits
+    for their events without blocking the hub.
+
+    Commands may reach any worker, so they are sent as notifications on the
+    channel's ID (see `send_channel_command`).
+
+    The events of the sources are sent in the order they are queued, not
+    the order they are made in, so a resumed channel picks each stream up
+    from its own position: the ID of every event that moves one has the
+    positions of all of them (see `EntryEventStream`).
+
+    A channel only takes a thread while one of its sources runs, so an
+    idle one costs its greenlet alone. A source that finds every thread
+    taken and too many others waiting for one ends at once with an error
+    (see `ENTRY_CHANNEL_MAX_QUEUED`). When a channel closes, its sources
+    stop waiting on others (see `util.Cancellation`) and end.
+    """
+
+    SOURCES = (
+        EntryEventType.COVER_IMAGE,
+        EntryEventType.HEADER,
+        EntryEventType.RELATED_TOPICS,
+        EntryEventType.SECTIONS
+    )
+
+    def __init__(self,
+                 entry: Entry,
+                 render_mode: RenderMode = RenderMode.SERVER,
+                 last_event_id: str = None) -> None:
+        self.entry: Entry = entry
+        self.id: uuid.UUID = uuid.uuid4()
+        self.render_mode: RenderMode = render_mode
+        self._cancellation = util.Cancellation()
+        self._closed: bool = False
+        self._events: collections.deque[bytes] = collections.deque()
+        self._lock = threading.Lock()
+        # The number of parts sent of each stream, resumed from the ID of the last event the client got.
+        self._positions: dict[str, int] = {}
+        self._signal: util.CrossThreadEvent | None = None
+        # Those of the sources and sections being sent, named as in their done events.
+        self._streams: set[str] = set()
+
+        if last_event_id:
+            try:
+                self._positions = EntryChannel.parse_event_id(last_event_id)
+            except ValueError as e:
+                print(e)
+
+    def __repr__(self) -> str:
+        return f"Entry Channel {self.id} ({self.entry.id})"
+
+    @staticmethod
+    def make_event_id(positions: dict[str, int]) -> str:
+        return ",".join(f"{stream}:{position}" for stream, position in positions.items())
+
+    @staticmethod
+    def notification_channel(channel_id: uuid.UUID) -> str:
+        return f"entry_channel_{channel_id.hex}"
+
+    @staticmethod
+    def parse_event_id(event_id: str) -> dict[str, int]:
+        """
+        The positions of the streams in an event ID. Raises ValueError if
+        it is badly formed.
+        """
+
+        ret: dict[str, int] = {}
+        for pair in event_id.split(","):
+            stream, _, position = pair.rpartition(":")
+            if not stream or not position.isdigit():
+                raise ValueError(f"Invalid entry channel event ID '{event_id}'.")
+            ret[stream] = int(position)
+        return ret
+
+    def _make_section(self,
+                      section_id: uuid.UUID,
+                      position: int | None) -> Iterator[bytes]:
+        section: EntrySection = EntrySection.get_by_id(section_id)
+        if section and section.entry_id == self.entry.id:
+            yield from stream_section(self.entry, section, self.render_mode, position, self._cancellation)
+        else:
+            response_status = ResponseStatus.NOT_FOUND
+            response = {
+                ProtocolKey.ERROR: {
+                    ProtocolKey.ERROR_CODE: response_status.value,
+                    ProtocolKey.ERROR_MESSAGE: "No section of this entry exists for the given ID."
+                }
+            }
+            yield sse_event(response)
+
+    def _end(self,
+             event_type: EntryEventType,
+             stream: str) -> None:
+        with self._lock:
+            self._streams.discard(stream)
+        self._put(
+            f"event: {EntryEventType.DONE.value}\n".encode("utf-8") + sse_event({ProtocolKey.STREAM: stream}),
+            # The client asks for a section again from where it was if it didn't get to the end of it.
+            stream if event_type == EntryEventType.SECTION else None,
+            done=True
+        )
+
+    def _put(self,
+             event: bytes,
+             stream: str = None,
+             done: bool = False) -> None:
+        """
+        Queues an event. One of a stream's parts moves the stream's position
+        on, and the end of a section asked for by command drops it, so
+        these get the positions as their ID, as of their place in the queue.
+        """
+
+        with self._lock:
+            if stream:
+                if done:
+                    self._positions.pop(stream, None)
+                else:
+                    self._positions[stream] = self._positions.get(stream, 0) + 1
+                event = f"id: {EntryChannel.make_event_id(self._positions)}\n".encode("utf-8") + event
+            self._events.append(event)
+        self._signal.set()
+
+    def _run(self,
+             event_type: EntryEventType,
+             stream: str,
+             events: Iterator[bytes]) -> None:
+        prefix = f"event: {event_type.value}\n".encode("utf-8")
+        try:
+            # Once the client is gone, not even the first event is made.
+            while not self._closed:
+                event = next(events, None)
+                if event is None:
+                    break
+
+                if event.startswith(b"id: "):
+                    # A part, with its position in its own stream, which the channel's ID replaces.
+                    self._put(prefix + event.split(b"\n", 1)[1], stream)
+                else:
+                    self._put(prefix + event)
+        except Exception as e:
+            print(e)
+        finally:
+            # Closing the generator releases whatever it holds.
+            events.close()
+            entry_channel_sources.release()
+            self._end(event_type, stream)
+
+    def command(self,
+                payload: str) -> None:
+        """
+        Carries out a command sent to the channel as JSON. A section that is
+        already being sent isn't sent twice.
+        """
+
+        try:
+            command = orjson.loads(payload)
+            name = EntryChannelCommand(command[ProtocolKey.COMMAND])
+            section_id = uuid.UUID(command[ProtocolKey.SECTION_ID])
+            last_event_id = command.get(ProtocolKey.LAST_EVENT_ID)
+            positions = EntryChannel.parse_event_id(last_event_id) if last_event_id else {}
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            print(e)
+            return
+
+        if name == EntryChannelCommand.MAKE_SECTION:
+            stream = str(section_id)
+            with self._lock:
+                position = positions.get(stream, self._positions.get(stream))
+            self.start(EntryEventType.SECTION, stream, self._make_section(section_id, position), position)
+
+    def events(self,
+               sources: Iterable[EntryEventType]) -> Iterator[bytes]:
+        """
+        The channel's stream. It starts with a ready event carrying the ID
+        that commands are sent to, and closes once it has had nothing to
+        send for a while. Before uWSGI would kill the request, it ends
+        without closing, and the browser reconnects.
+        """
+
+        self._signal = util.CrossThreadEvent()
+        entry_channels[self.id] = self
+        notification_listener.subscribe(EntryChannel.notification_channel(self.id), self.command)
+        try:
+            yield f"event: {EntryEventType.READY.value}\n".encode("utf-8") + sse_event({ProtocolKey.ID: self.id})
+
+            for source in sources:
+                if source == EntryEventType.COVER_IMAGE:
+                    self.start(source, source.value, stream_cover_image(self.entry, self._cancellation))
+                elif source == EntryEventType.HEADER:
+                    self.start(source, source.value, stream_header(self.entry, self._cancellation))
+                elif source == EntryEventType.RELATED_TOPICS:
+                    self.start(source, source.value, stream_related_topics(self.entry, self._cancellation))
+                elif source == EntryEventType.SECTIONS:
+                    position = self._positions.get(EntryEventStream.SECTIONS)
+                    self.start(source, EntryEventStream.SECTIONS,
+                               stream_sections(self.entry, self.render_mode, position, self._cancellation), position)
+
+            start_time = time.monotonic()
+            idle_since = start_time
+            while True:
+                with self._lock:
+                    events = list(self._events)
+                    self._events.clear()
+                    running = bool(self._streams)
+
+                now = time.monotonic()
+                if events:
+                    yield b"".join(events)
+                    idle_since = now
+                elif running:
+                    idle_since = now
+
+                if now - start_time >= Configuration.ENTRY_CHANNEL_MAX_DURATION:
+                    return
+
+                if now - idle_since >= Configuration.ENTRY_CHANNEL_IDLE_TIMEOUT:
+                    yield SSE_CLOSE
+                    return
+
+                if not self._signal.wait(Configuration.ENTRY_CHANNEL_KEEPALIVE_INTERVAL):
+                    # Also how a client that's gone is found out.
+                    yield b": keepalive\n\n"
+        finally:
+            with self._lock:
+                self._closed = True
+            self._cancellation.cancel()
+            notification_listener.unsubscribe(EntryChannel.notification_channel(self.id), self.command)
+            entry_channels.pop(self.id, None)
+            self._signal.close()
+
+    def start(self,
+              event_type: EntryEventType,
+              stream: str,
+              events: Iterator[bytes],
+              position: int = None) -> bool:
+        """
+        Starts sending the events of a source, unless it is being sent
+        already or the channel is closed. `position` is the number of the
+        stream's parts that the client has, which the events skip. A source
+        that there's no room for is sent as an error.
+        """
+
+        with self._lock:
+            if self._closed or stream in self._streams:
+                events.close()
+                return False
+            self._streams.add(stream)
+            if position is not None:
+                self._positions[stream] = position
+
+        if not entry_channel_sources.acquire(blocking=False):
+            events.close()
+            response_status = ResponseStatus.TOO_MANY_REQUESTS
+            response = {
+                ProtocolKey.ERROR: {
+                    ProtocolKey.ERROR_CODE: response_status.value,
+                    ProtocolKey.ERROR_MESSAGE: "Too many entry streams are being sent."
+                }
+            }
+            self._put(f"event: {event_type.value}\n".encode("utf-8") + sse_event(response))
+            self._end(event_type, stream)
+            return False
+
+        entry_channel_executor.submit(self._run, event_type, stream, events)
+        return True
+
 
 class EntryCoverImage:
     def __init__(self,
@@ -504,61 +1055,63 @@ class EntryCoverImage:
         return ret
 
 
-class EntryFunFact:
+class EntryEvent:
+    """
+    An event of the generation of one of an entry's sections, logged for
+    the requests that follow it (see `EntryBroadcast`). IDs increase with
+    every event logged.
+    """
+
     def __init__(self,
                  data: dict) -> None:
-        self.content_md: str = None
+        self.data: str = None
         self.entry_id: uuid.UUID = None
-        self.id: uuid.UUID = None
+        self.id: int = None
+        self.part_id: uuid.UUID = None
+        self.stream: str = None
 
         if data:
-            if ProtocolKey.CONTENT_MARKDOWN in data:
-                self.content_md: str = data[ProtocolKey.CONTENT_MARKDOWN]
+            if ProtocolKey.DATA in data:
+                self.data: str = data[ProtocolKey.DATA]
 
             if ProtocolKey.ENTRY_ID in data:
                 self.entry_id: uuid.UUID = data[ProtocolKey.ENTRY_ID]
 
             if ProtocolKey.ID in data:
-                self.id: uuid.UUID = data[ProtocolKey.ID]
+                self.id: int = data[ProtocolKey.ID]
 
-    def __eq__(self,
-               __o: object) -> bool:
-        ret = False
-        if isinstance(__o, type(self)) and \
-                self.id == __o.id:
-            ret = True
-        return ret
+            if ProtocolKey.PART_ID in data:
+                self.part_id: uuid.UUID = data[ProtocolKey.PART_ID]
 
-    def __hash__(self) -> int:
-        return hash(self.id)
+            if ProtocolKey.STREAM in data:
+                self.stream: str = data[ProtocolKey.STREAM]
 
     def __repr__(self) -> str:
         ret = ""
         if self.id:
-            ret += f"Entry Fun Fact {self.id} ('{self.content_md}')"
+            ret += f"Entry Event {self.id} ('{self.stream}')"
         return ret
 
-    def as_dict(self) -> dict[str, str]:
-        serialized = {
-            ProtocolKey.ENTRY_ID: str(self.entry_id),
-            ProtocolKey.ID: str(self.id),
-            ProtocolKey.CONTENT_MARKDOWN: self.content_md
-        }
-        return serialized
-
     @classmethod
     def create(cls: Type,
-               content_md: str = None,
-               entry_id: uuid.UUID = None) -> U:
+               entry_id: uuid.UUID,
+               stream: str,
+               data: str,
+               part_id: uuid.UUID = None,
+               notify_channel: str = None) -> Z:
         """
-        Call this method to create an Entry Fun Fact object.
+        Logs an event. With a notification channel, also notifies it with
+        the name of the stream once the event is logged.
         """
 
         if not isinstance(entry_id, uuid.UUID):
             raise TypeError(f"Argument 'entry_id' must be of type UUID, not {type(entry_id)}.")
 
-        if not isinstance(content_md, str):
-            raise TypeError(f"Argument 'content_md' must be of type str, not {type(content_md)}.")
+        if not isinstance(stream, str):
+            raise TypeError(f"Argument 'stream' must be of type str, not {type(stream)}.")
+
+        if not isinstance(data, str):
+            raise TypeError(f"Argument 'data' must be of type str, not {type(data)}.")
 
         ret: Type = None
         db = RelationalDB()
@@ -567,15 +1120,21 @@ class EntryFunFact:
             cursor.execute(
                 f"""
                 INSERT INTO
-                    {DatabaseTable.ENTRY_FUN_FACT}
-                    ({ProtocolKey.ENTRY_ID}, {ProtocolKey.CONTENT_MARKDOWN})
+                    {DatabaseTable.ENTRY_EVENT}
+                    ({ProtocolKey.DATA}, {ProtocolKey.ENTRY_ID}, {ProtocolKey.PART_ID},
+                     {ProtocolKey.STREAM})
                 VALUES
-                    (%s, %s)
+                    (%s, %s, %s,
+                     %s)
                 RETURNING *;
                 """,
-                (entry_id, content_md)
+                (data, entry_id, part_id,
+                 stream)
             )
             result = cursor.fetchone()
+            if notify_channel:
+                # Sent on commit, so the event can be read by then.
+                cursor.execute("SELECT pg_notify(%s, %s);", (notify_channel, stream))
             db.connection.commit()
             if result:
                 ret = cls(result)
@@ -587,8 +1146,10 @@ class EntryFunFact:
         return ret
 
     @classmethod
-    def get_all_for_entry(cls: Type,
-                          entry_id: uuid.UUID) -> list:
+    def get_all_for_stream(cls: Type,
+                           entry_id: uuid.UUID,
+                           stream: str,
+                           after_id: int = 0) -> list:
         if not isinstance(entry_id, uuid.UUID):
             raise TypeError(f"Argument 'entry_id' must be of type UUID, not {type(entry_id)}.")
 
@@ -598,14 +1159,16 @@ class EntryFunFact:
             cursor = db.connection.cursor()
             cursor.execute(
                 f"""
-                SELECT 
+                SELECT
                     *
-                FROM 
-                    {DatabaseTable.ENTRY_FUN_FACT}
+                FROM
+                    {DatabaseTable.ENTRY_EVENT}
                 WHERE
-                    {ProtocolKey.ENTRY_ID} = %s;
+                    {ProtocolKey.ENTRY_ID} = %s AND {ProtocolKey.STREAM} = %s AND {ProtocolKey.ID} > %s
+                ORDER BY
+                    {ProtocolKey.ID};
                 """,
-                (entry_id,)
+                (entry_id, stream, after_id)
             )
             results = cursor.fetchall()
             db.connection.commit()
@@ -618,65 +1181,303 @@ class EntryFunFact:
 
         return ret
 
-    @classmethod
-    def get_by_id(cls: Type,
-                  fact_id: uuid.UUID) -> U:
-        if not isinstance(fact_id, uuid.UUID):
-            raise TypeError(f"Argument 'fact_id' must be of type UUID, not {type(fact_id)}.")
-
-        ret: Type = None
+    @staticmethod
+    def purge() -> None:
         db = RelationalDB()
         try:
             cursor = db.connection.cursor()
             cursor.execute(
                 f"""
-                SELECT
-                    *
-                FROM
-                    {DatabaseTable.ENTRY_FUN_FACT}
+                DELETE FROM
+                    {DatabaseTable.ENTRY_EVENT}
                 WHERE
-                    {ProtocolKey.ID} = %s;
+                    {ProtocolKey.CREATION_TIMESTAMP} < NOW() - %s * INTERVAL '1 second';
                 """,
-                (fact_id,)
+                (Configuration.ENTRY_EVENT_RETENTION,)
             )
-            result = cursor.fetchone()
             db.connection.commit()
-            if result:
-                ret = cls(result)
         except Exception as e:
             print(e)
         finally:
             db.close()
 
-        return ret
 
+class EntryEventStream:
+    """
+    The events of a stream of an entry's sections. The event of each whole
+    part has, as its ID, the number of parts sent on the stream so far.
+    Parts are always sent in the same order, so a client that reconnects
+    with the ID of the last event it got is only sent the parts after it.
+    The ID is all a resumed stream needs, so nothing is logged per client.
+    """
+
+    # The stream of the ToC and first section. Those of other sections are named after the section.
+    SECTIONS = "sections"
 
-class EntryRelatedTopic:
     def __init__(self,
-                 data: dict) -> None:
-        self.entry_id: uuid.UUID = None
-        self.id: uuid.UUID = None
-        self.topic: str = None
+                 last_event_id: int = None) -> None:
+        self.last_event_id: int | None = last_event_id
+        self.position: int = 0
 
-        if data:
-            if ProtocolKey.ENTRY_ID in data:
-                self.entry_id: uuid.UUID = data[ProtocolKey.ENTRY_ID]
+    def send(self,
+             serialized: dict[str, Any]) -> bytes | None:
+        """
+        Returns the event of the stream's next part, unless the client
+        already has it.
+        """
 
-            if ProtocolKey.ID in data:
-                self.id: uuid.UUID = data[ProtocolKey.ID]
+        self.position += 1
+        if self.last_event_id is not None and self.position <= self.last_event_id:
+            return None
+        return f"id: {self.position}\n".encode("utf-8") + sse_event(serialized)
 
-            if ProtocolKey.TOPIC in data:
-                self.topic: str = data[ProtocolKey.TOPIC]
 
-    def __eq__(self,
-               __o: object) -> bool:
-        ret = False
-        if isinstance(__o, type(self)) and \
-                self.id == __o.id:
-            ret = True
-        return ret
+class EntryEventWriter:
+    """
+    Logs the events of a part's generation for the requests following it
+    (see `EntryBroadcast`), on a connection of its own for as long as the
+    part is being generated. A fragment that completes within
+    `ENTRY_EVENT_FLUSH_INTERVAL` seconds of the last write is held, and
+    written with the next event or on `close()`. Each write is one
+    transaction with one notification, however many events it has.
+    """
 
-    def __hash__(self) -> int:
+    def __init__(self,
+                 part: V) -> None:
+        self.part: V = part
+        self._db: RelationalDB | None = None
+        self._events: list[str] = []
+        self._written_at: float = 0
+
+    def __repr__(self) -> str:
+        return f"Entry Event Writer {self.part.id} ({len(self._events)} held)"
+
+    def close(self) -> None:
+        self.flush()
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    def flush(self) -> None:
+        if not self._events:
+            return
+
+        if not self._db:
+            self._db = RelationalDB()
+
+        stream = EntryBroadcast.stream(self.part.parent_id or self.part.id)
+        try:
+            cursor = self._db.connection.cursor()
+            cursor.executemany(
+                f"""
+                INSERT INTO
+                    {DatabaseTable.ENTRY_EVENT}
+                    ({ProtocolKey.DATA}, {ProtocolKey.ENTRY_ID}, {ProtocolKey.PART_ID},
+                     {ProtocolKey.STREAM})
+                VALUES
+                    (%s, %s, %s,
+                     %s);
+                """,
+                [
+                    (data, self.part.entry_id, self.part.id,
+                     stream)
+                    for data in self._events
+                ]
+            )
+            # Sent on commit, so the events can be read by then.
+            cursor.execute("SELECT pg_notify(%s, %s);", (EntryBroadcast.notification_channel(self.part.entry_id), stream))
+            self._db.connection.commit()
+        except Exception as e:
+            print(e)
+            # The connection may be broken, so the next write gets a new one.
+            self._db.close()
+            self._db = None
+        finally:
+            self._events.clear()
+            self._written_at = time.monotonic()
+
+    def publish(self,
+                event_type: GenerationEventType,
+                fragment_md: str = None) -> None:
+        self._events.append(EntryBroadcast.make_event_data(event_type, fragment_md))
+        if event_type != GenerationEventType.FRAGMENT or \
+                time.monotonic() - self._written_at >= Configuration.ENTRY_EVENT_FLUSH_INTERVAL:
+            self.flush()
+
+
+class EntryFunFact:
+    def __init__(self,
+                 data: dict) -> None:
+        self.content_md: str = None
+        self.entry_id: uuid.UUID = None
+        self.id: uuid.UUID = None
+
+        if data:
+            if ProtocolKey.CONTENT_MARKDOWN in data:
+                self.content_md: str = data[ProtocolKey.CONTENT_MARKDOWN]
+
+            if ProtocolKey.ENTRY_ID in data:
+                self.entry_id: uuid.UUID = data[ProtocolKey.ENTRY_ID]
+
+            if ProtocolKey.ID in data:
+                self.id: uuid.UUID = data[ProtocolKey.ID]
+
+    def __eq__(self,
+               __o: object) -> bool:
+        ret = False
+        if isinstance(__o, type(self)) and \
+                self.id == __o.id:
+            ret = True
+        return ret
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def __repr__(self) -> str:
+        ret = ""
+        if self.id:
+            ret += f"Entry Fun Fact {self.id} ('{self.content_md}')"
+        return ret
+
+    def as_dict(self) -> dict[str, str]:
+        serialized = {
+            ProtocolKey.ENTRY_ID: str(self.entry_id),
+            ProtocolKey.ID: str(self.id),
+            ProtocolKey.CONTENT_MARKDOWN: self.content_md
+        }
+        return serialized
+
+    @classmethod
+    def create(cls: Type,
+               content_md: str = None,
+               entry_id: uuid.UUID = None) -> U:
+        """
+        Call this method to create an Entry Fun Fact object.
+        """
+
+        if not isinstance(entry_id, uuid.UUID):
+            raise TypeError(f"Argument 'entry_id' must be of type UUID, not {type(entry_id)}.")
+
+        if not isinstance(content_md, str):
+            raise TypeError(f"Argument 'content_md' must be of type str, not {type(content_md)}.")
+
+        ret: Type = None
+        db = RelationalDB()
+        try:
+            cursor = db.connection.cursor()
+            cursor.execute(
+                f"""
+                INSERT INTO
+                    {DatabaseTable.ENTRY_FUN_FACT}
+                    ({ProtocolKey.ENTRY_ID}, {ProtocolKey.CONTENT_MARKDOWN})
+                VALUES
+                    (%s, %s)
+                RETURNING *;
+                """,
+                (entry_id, content_md)
+            )
+            result = cursor.fetchone()
+            db.connection.commit()
+            if result:
+                ret = cls(result)
+        except Exception as e:
+            print(e)
+        finally:
+            db.close()
+
+        return ret
+
+    @classmethod
+    def get_all_for_entry(cls: Type,
+                          entry_id: uuid.UUID) -> list:
+        if not isinstance(entry_id, uuid.UUID):
+            raise TypeError(f"Argument 'entry_id' must be of type UUID, not {type(entry_id)}.")
+
+        ret: list = []
+        db = RelationalDB()
+        try:
+            cursor = db.connection.cursor()
+            cursor.execute(
+                f"""
+                SELECT 
+                    *
+                FROM 
+                    {DatabaseTable.ENTRY_FUN_FACT}
+                WHERE
+                    {ProtocolKey.ENTRY_ID} = %s;
+                """,
+                (entry_id,)
+            )
+            results = cursor.fetchall()
+            db.connection.commit()
+            for result in results:
+                ret.append(cls(result))
+        except Exception as e:
+            print(e)
+        finally:
+            db.close()
+
+        return ret
+
+    @classmethod
+    def get_by_id(cls: Type,
+                  fact_id: uuid.UUID) -> U:
+        if not isinstance(fact_id, uuid.UUID):
+            raise TypeError(f"Argument 'fact_id' must be of type UUID, not {type(fact_id)}.")
+
+        ret: Type = None
+        db = RelationalDB()
+        try:
+            cursor = db.connection.cursor()
+            cursor.execute(
+                f"""
+                SELECT
+                    *
+                FROM
+                    {DatabaseTable.ENTRY_FUN_FACT}
+                WHERE
+                    {ProtocolKey.ID} = %s;
+                """,
+                (fact_id,)
+            )
+            result = cursor.fetchone()
+            db.connection.commit()
+            if result:
+                ret = cls(result)
+        except Exception as e:
+            print(e)
+        finally:
+            db.close()
+
+        return ret
+
+
+class EntryRelatedTopic:
+    def __init__(self,
+                 data: dict) -> None:
+        self.entry_id: uuid.UUID = None
+        self.id: uuid.UUID = None
+        self.topic: str = None
+
+        if data:
+            if ProtocolKey.ENTRY_ID in data:
+                self.entry_id: uuid.UUID = data[ProtocolKey.ENTRY_ID]
+
+            if ProtocolKey.ID in data:
+                self.id: uuid.UUID = data[ProtocolKey.ID]
+
+            if ProtocolKey.TOPIC in data:
+                self.topic: str = data[ProtocolKey.TOPIC]
+
+    def __eq__(self,
+               __o: object) -> bool:
+        ret = False
+        if isinstance(__o, type(self)) and \
+                self.id == __o.id:
+            ret = True
+        return ret
+
+    def __hash__(self) -> int:
         return hash(self.id)
 
     def __repr__(self) -> str:
@@ -801,18 +1602,19 @@ class EntryRelatedTopic:
 class EntrySection:
     def __init__(self,
                  data: dict) -> None:
-        self.content_html: str = None
+        self._content_html: str = None
         self.content_md: str = None
         self.entry_id: uuid.UUID = None
         self.id: uuid.UUID = None
         self.index: int = None
         self.parent_id: uuid.UUID = None
+        self.renderer_version: int = None
         self.subsections: list[EntrySection] = []
         self.title: str = None
 
         if data:
             if ProtocolKey.CONTENT_HTML in data:
-                self.content_html: str = data[ProtocolKey.CONTENT_HTML]
+                self._content_html: str = data[ProtocolKey.CONTENT_HTML]
 
             if ProtocolKey.CONTENT_MARKDOWN in data:
                 self.content_md: str = data[ProtocolKey.CONTENT_MARKDOWN]
@@ -838,6 +1640,9 @@ class EntrySection:
                 else:
                     self.parent_id: uuid.UUID = uuid.UUID(data[ProtocolKey.PARENT_ID])
 
+            if ProtocolKey.RENDERER_VERSION in data:
+                self.renderer_version: int = data[ProtocolKey.RENDERER_VERSION]
+
             if ProtocolKey.SUBSECTIONS in data and data.get(ProtocolKey.SUBSECTIONS):
                 subsections = data.get(ProtocolKey.SUBSECTIONS)
                 for subsection in subsections:
@@ -863,8 +1668,24 @@ class EntrySection:
             ret += f"Entry Section {self.id} ('{self.title}')"
         return ret
 
+    @property
+    def content_html(self) -> str | None:
+        return get_html(self.content_md, self._content_html, self.renderer_version, MarkdownProfile.SECTION)
+
+    @content_html.setter
+    def content_html(self,
+                     content_html: str | None) -> None:
+        self._content_html = content_html
+        self.renderer_version = RENDERER_VERSION
+
     def as_dict(self,
-                include_subsections=True) -> dict[str, Any]:
+                include_subsections=True,
+                render_mode: RenderMode = RenderMode.SERVER) -> dict[str, Any]:
+        """
+        In `RenderMode.CLIENT`, the HTML is left out (and not rendered) and
+        the browser renders the Markdown.
+        """
+
         serialized = {
             ProtocolKey.ENTRY_ID: str(self.entry_id),
             ProtocolKey.ID: str(self.id),
@@ -872,7 +1693,7 @@ class EntrySection:
             ProtocolKey.TITLE: self.title
         }
 
-        if self.content_html:
+        if render_mode == RenderMode.SERVER and self.content_html:
             serialized[ProtocolKey.CONTENT_HTML] = self.content_html
 
         if self.content_md:
@@ -884,7 +1705,7 @@ class EntrySection:
         if include_subsections and self.subsections:
             subsections_serialized = []
             for subsection in self.subsections:
-                subsections_serialized.append(subsection.as_dict())
+                subsections_serialized.append(subsection.as_dict(render_mode=render_mode))
             serialized[ProtocolKey.SUBSECTIONS] = subsections_serialized
 
         return serialized
@@ -928,14 +1749,17 @@ class EntrySection:
                 INSERT INTO
                     {DatabaseTable.ENTRY_SECTION}
                     ({ProtocolKey.CONTENT_HTML}, {ProtocolKey.CONTENT_MARKDOWN}, {ProtocolKey.ENTRY_ID},
-                     {ProtocolKey.INDEX}, {ProtocolKey.PARENT_ID}, {ProtocolKey.TITLE})
+                     {ProtocolKey.INDEX}, {ProtocolKey.PARENT_ID}, {ProtocolKey.RENDERER_VERSION},
+                     {ProtocolKey.TITLE})
                 VALUES
                     (%s, %s, %s,
-                     %s, %s, %s)
+                     %s, %s, %s,
+                     %s)
                 RETURNING *;
                 """,
-                (content_html, content_md, entry_id,
-                 index, parent_id, title)
+                (get_html_to_store(content_html), content_md, entry_id,
+                 index, parent_id, RENDERER_VERSION,
+                 title)
             )
             result = cursor.fetchone()
             db.connection.commit()
@@ -968,6 +1792,7 @@ class EntrySection:
                     {ProtocolKey.ID},
                     {ProtocolKey.INDEX},
                     {ProtocolKey.PARENT_ID},
+                    {ProtocolKey.RENDERER_VERSION},
                     {ProtocolKey.TITLE},
                     jsonb_build_object(
                       '{ProtocolKey.CONTENT_HTML}', {ProtocolKey.CONTENT_HTML},
@@ -976,6 +1801,7 @@ class EntrySection:
                       '{ProtocolKey.ID}', {ProtocolKey.ID},
                       '{ProtocolKey.INDEX}', {ProtocolKey.INDEX},
                       '{ProtocolKey.PARENT_ID}', {ProtocolKey.PARENT_ID},
+                      '{ProtocolKey.RENDERER_VERSION}', {ProtocolKey.RENDERER_VERSION},
                       '{ProtocolKey.SUBSECTIONS}', '[]'::jsonb,
                       '{ProtocolKey.TITLE}', {ProtocolKey.TITLE}
                     ) AS json_data,
@@ -995,6 +1821,7 @@ class EntrySection:
                     c.{ProtocolKey.ID},
                     c.{ProtocolKey.INDEX},
                     c.{ProtocolKey.PARENT_ID},
+                    c.{ProtocolKey.RENDERER_VERSION},
                     c.{ProtocolKey.TITLE},
                     jsonb_build_object(
                       '{ProtocolKey.CONTENT_HTML}', c.{ProtocolKey.CONTENT_HTML},
@@ -1003,6 +1830,7 @@ class EntrySection:
                       '{ProtocolKey.ID}', c.{ProtocolKey.ID},
                       '{ProtocolKey.INDEX}', c.{ProtocolKey.INDEX},
                       '{ProtocolKey.PARENT_ID}', c.{ProtocolKey.PARENT_ID},
+                      '{ProtocolKey.RENDERER_VERSION}', c.{ProtocolKey.RENDERER_VERSION},
                       '{ProtocolKey.SUBSECTIONS}', '[]'::jsonb,
                       '{ProtocolKey.TITLE}', c.{ProtocolKey.TITLE}
                     ),
@@ -1067,6 +1895,7 @@ class EntrySection:
                     {ProtocolKey.ID},
                     {ProtocolKey.INDEX},
                     {ProtocolKey.PARENT_ID},
+                    {ProtocolKey.RENDERER_VERSION},
                     {ProtocolKey.TITLE},
                     jsonb_build_object(
                       '{ProtocolKey.CONTENT_HTML}', {ProtocolKey.CONTENT_HTML},
@@ -1075,6 +1904,7 @@ class EntrySection:
                       '{ProtocolKey.ID}', {ProtocolKey.ID},
                       '{ProtocolKey.INDEX}', {ProtocolKey.INDEX},
                       '{ProtocolKey.PARENT_ID}', {ProtocolKey.PARENT_ID},
+                      '{ProtocolKey.RENDERER_VERSION}', {ProtocolKey.RENDERER_VERSION},
                       '{ProtocolKey.SUBSECTIONS}', '[]'::jsonb,
                       '{ProtocolKey.TITLE}', {ProtocolKey.TITLE}
                     ) AS json_data,
@@ -1094,6 +1924,7 @@ class EntrySection:
                     c.{ProtocolKey.ID},
                     c.{ProtocolKey.INDEX},
                     c.{ProtocolKey.PARENT_ID},
+                    c.{ProtocolKey.RENDERER_VERSION},
                     c.{ProtocolKey.TITLE},
                     jsonb_build_object(
                       '{ProtocolKey.CONTENT_HTML}', c.{ProtocolKey.CONTENT_HTML},
@@ -1102,6 +1933,7 @@ class EntrySection:
                       '{ProtocolKey.ID}', c.{ProtocolKey.ID},
                       '{ProtocolKey.INDEX}', c.{ProtocolKey.INDEX},
                       '{ProtocolKey.PARENT_ID}', c.{ProtocolKey.PARENT_ID},
+                      '{ProtocolKey.RENDERER_VERSION}', c.{ProtocolKey.RENDERER_VERSION},
                       '{ProtocolKey.SUBSECTIONS}', '[]'::jsonb,
                       '{ProtocolKey.TITLE}', c.{ProtocolKey.TITLE}
                     ),
@@ -1158,11 +1990,13 @@ class EntrySection:
                     {DatabaseTable.ENTRY_SECTION}
                 SET
                     {ProtocolKey.CONTENT_HTML} = %s,
-                    {ProtocolKey.CONTENT_MARKDOWN} = %s
+                    {ProtocolKey.CONTENT_MARKDOWN} = %s,
+                    {ProtocolKey.RENDERER_VERSION} = %s
                 WHERE
                     {ProtocolKey.ID} = %s;
                 """,
-                (self.content_html, self.content_md, self.id)
+                (get_html_to_store(self._content_html), self.content_md, RENDERER_VERSION,
+                 self.id)
             )
             db.connection.commit()
         except Exception as e:
@@ -1171,15 +2005,91 @@ class EntrySection:
             db.close()
 
 
+class EntrySectionFragment:
+    """
+    HTML to append to a section while its content is being generated, as
+    the blocks of its Markdown complete. In `RenderMode.CLIENT`, the
+    Markdown of the blocks instead. A fragment that resets the section has
+    the client drop what it has of it, because its generation started over.
+
+    The fragments of a part can share an encoder from `make_encoder()`, so
+    that the section's fields are encoded once rather than per fragment.
+    """
+
+    def __init__(self,
+                 section: EntrySection,
+                 content: str,
+                 render_mode: RenderMode = RenderMode.SERVER,
+                 encoder: SSEFragmentEncoder = None,
+                 reset: bool = False) -> None:
+        self.content: str = content
+        self.encoder: SSEFragmentEncoder | None = encoder
+        self.render_mode: RenderMode = render_mode
+        self.reset: bool = reset
+        self.section: EntrySection = section
+
+    @staticmethod
+    def _fields(section: EntrySection) -> dict[str, Any]:
+        serialized = section.as_dict(include_subsections=False, render_mode=RenderMode.CLIENT)
+        serialized.pop(ProtocolKey.CONTENT_MARKDOWN, None)
+        return serialized
+
+    @staticmethod
+    def _key(render_mode: RenderMode) -> str:
+        if render_mode == RenderMode.CLIENT:
+            return ProtocolKey.FRAGMENT_MARKDOWN
+        return ProtocolKey.FRAGMENT_HTML
+
+    def as_dict(self) -> dict[str, Any]:
+        serialized = self._fields(self.section)
+        serialized[self._key(self.render_mode)] = self.content
+        if self.reset:
+            serialized[ProtocolKey.RESET] = True
+        return serialized
+
+    def as_event(self) -> bytes:
+        if self.encoder and not self.reset:
+            return self.encoder.encode(self.content)
+        return sse_event(self.as_dict())
+
+    @classmethod
+    def from_markdown(cls: Type,
+                      section: EntrySection,
+                      content_md: str,
+                      render_mode: RenderMode = RenderMode.SERVER,
+                      encoder: SSEFragmentEncoder = None) -> "EntrySectionFragment":
+        """
+        The fragment of a block of Markdown, rendered unless the client
+        renders it.
+        """
+
+        if render_mode == RenderMode.SERVER:
+            return cls(section, render_markdown(content_md, MarkdownProfile.SECTION), render_mode, encoder)
+        return cls(section, content_md, render_mode, encoder)
+
+    @classmethod
+    def make_encoder(cls: Type,
+                     section: EntrySection,
+                     render_mode: RenderMode = RenderMode.SERVER) -> SSEFragmentEncoder:
+        return SSEFragmentEncoder(cls._fields(section), cls._key(render_mode))
+
+    @classmethod
+    def make_reset(cls: Type,
+                   section: EntrySection,
+                   render_mode: RenderMode = RenderMode.SERVER) -> "EntrySectionFragment":
+        return cls(section, "", render_mode, reset=True)
+
+
 class EntryStat:
     def __init__(self,
                  data: dict) -> None:
         self.entry_id: uuid.UUID = None
         self.id: uuid.UUID = None
         self.index: int = None
-        self.name_html: str = None
+        self._name_html: str = None
         self.name_md: str = None
-        self.value_html: str = None
+        self.renderer_version: int = None
+        self._value_html: str = None
         self.value_md: str = None
 
         if data:
@@ -1193,13 +2103,16 @@ class EntryStat:
                 self.index: int = data[ProtocolKey.INDEX]
 
             if ProtocolKey.NAME_HTML in data:
-                self.name_html: str = data[ProtocolKey.NAME_HTML]
+                self._name_html: str = data[ProtocolKey.NAME_HTML]
 
             if ProtocolKey.NAME_MARKDOWN in data:
                 self.name_md: str = data[ProtocolKey.NAME_MARKDOWN]
 
+            if ProtocolKey.RENDERER_VERSION in data:
+                self.renderer_version: int = data[ProtocolKey.RENDERER_VERSION]
+
             if ProtocolKey.VALUE_HTML in data:
-                self.value_html: str = data[ProtocolKey.VALUE_HTML]
+                self._value_html: str = data[ProtocolKey.VALUE_HTML]
 
             if ProtocolKey.VALUE_MARKDOWN in data:
                 self.value_md: str = data[ProtocolKey.VALUE_MARKDOWN]
@@ -1221,6 +2134,14 @@ class EntryStat:
             ret += f"Entry Stat {self.id} ('{self.name_md}: {self.value_md}')"
         return ret
 
+    @property
+    def name_html(self) -> str | None:
+        return get_html(self.name_md, self._name_html, self.renderer_version, MarkdownProfile.STAT)
+
+    @property
+    def value_html(self) -> str | None:
+        return get_html(self.value_md, self._value_html, self.renderer_version, MarkdownProfile.STAT)
+
     def as_dict(self) -> dict[str, str]:
         serialized = {
             ProtocolKey.ENTRY_ID: str(self.entry_id),
@@ -1272,14 +2193,17 @@ class EntryStat:
                 INSERT INTO
                     {DatabaseTable.ENTRY_STAT}
                     ({ProtocolKey.ENTRY_ID}, {ProtocolKey.INDEX}, {ProtocolKey.NAME_HTML},
-                     {ProtocolKey.NAME_MARKDOWN}, {ProtocolKey.VALUE_HTML}, {ProtocolKey.VALUE_MARKDOWN})
+                     {ProtocolKey.NAME_MARKDOWN}, {ProtocolKey.RENDERER_VERSION}, {ProtocolKey.VALUE_HTML},
+                     {ProtocolKey.VALUE_MARKDOWN})
                 VALUES
                     (%s, %s, %s,
-                     %s, %s, %s)
+                     %s, %s, %s,
+                     %s)
                 RETURNING *;
                 """,
-                (entry_id, index, name_html,
-                 name_md, value_html, value_md)
+                (entry_id, index, get_html_to_store(name_html),
+                 name_md, RENDERER_VERSION, get_html_to_store(value_html),
+                 value_md)
             )
             result = cursor.fetchone()
             db.connection.commit()
@@ -1325,7 +2249,7 @@ class EntryStat:
         return ret
 
 
-chat_histories = {}
+chat_memories: dict[uuid.UUID, ChatMemory] = {}
 
 
 ####################
@@ -1333,6 +2257,175 @@ chat_histories = {}
 ####################
 
 
+def create_sections(entry_id: uuid.UUID,
+                    toc: list[dict]) -> list[EntrySection]:
+    """
+    Saves a generated table of contents as empty sections and subsections.
+    """
+
+    sections: list[EntrySection] = []
+    for i, section_raw in enumerate(toc):
+        section: EntrySection = EntrySection.create(
+            entry_id=entry_id,
+            index=i,
+            title=section_raw.get("title")
+        )
+        if section:
+            subsections: list[dict] = section_raw.get("subsections")
+            if subsections:
+                for j, subsection_raw in enumerate(subsections):
+                    subsection: EntrySection = EntrySection.create(
+                        entry_id=entry_id,
+                        index=j,
+                        parent_id=section.id,
+                        title=subsection_raw.get("title")
+                    )
+                    if subsection:
+                        section.subsections.append(subsection)
+
+            sections.append(section)
+
+    return sections
+
+
+def finish_entry_pipeline_run(run: PipelineRun) -> None:
+    entry: Entry = run.result("entry")
+    if entry:
+        entry_pipeline_runs.pop(entry.id, None)
+        # Stages that were skipped didn't release theirs.
+        lock: GenerationLock = entry_generation_locks.pop(entry.id, None)
+        if lock:
+            lock.release_all()
+        AnalyticsEntryStageTiming.create_all(entry.id, dict(run.timings))
+
+
+def generate_section_content(entry: Entry,
+                             section: EntrySection,
+                             render_mode: RenderMode = RenderMode.SERVER,
+                             cancellation: util.Cancellation = None) -> Iterator[EntrySection | EntrySectionFragment]:
+    """
+    Generates the content of a top-level section and then of each of its
+    subsections, yielding each part once it is saved, whether it could be
+    generated or not. While a part is being generated, its HTML (or in
+    `RenderMode.CLIENT`, its Markdown) is yielded in fragments as it
+    streams in.
+
+    Only one request at a time generates a given section. Any other, in
+    whichever worker, yields the parts that are saved already, then those
+    being generated, in fragments, as they stream in to that one (see
+    `EntryBroadcast`). It takes over if that one stops. With a
+    cancellation, it stops waiting once it's cancelled.
+    """
+
+    sent = 0
+    # Parts that fragments have been yielded of, which are reset if they are started over.
+    streamed: set[uuid.UUID] = set()
+    broadcast: EntryBroadcast | None = None
+    position = 0
+    deadline = time.monotonic() + Configuration.GENERATION_LOCK_WAIT_TIMEOUT
+    try:
+        while True:
+            lock = GenerationLock()
+            if lock.acquire(GenerationArtifact.SECTION, section.id):
+                try:
+                    # Whoever held the lock before may have generated some of it already.
+                    section = EntrySection.get_by_id(section.id) or section
+                    for part in ([section] + section.subsections)[sent:]:
+                        if not part.content_md:
+                            if part.id in streamed:
+                                yield EntrySectionFragment.make_reset(part, render_mode)
+                            content_md = yield from stream_section_content(entry, part, render_mode)
+                            if content_md:
+                                # Without stored HTML, it's rendered when (and if) someone reads it.
+                                if not Configuration.MARKDOWN_ONLY_STORAGE:
+                                    part.content_html = render_markdown(content_md, MarkdownProfile.SECTION)
+                                part.content_md = content_md
+                                part.update()
+                                EntryBroadcast.publish(part, GenerationEventType.SAVED)
+                        yield part
+                finally:
+                    lock.release_all()
+                return
+
+            if not broadcast:
+                broadcast, signal = EntryBroadcast.join(entry.id)
+                if cancellation:
+                    cancellation.watch(signal)
+
+            if cancellation and cancellation.cancelled:
+                return
+
+            current = EntrySection.get_by_id(section.id) or section
+            parts = [current] + current.subsections
+            if time.monotonic() >= deadline:
+                yield from parts[sent:]
+                return
+
+            # Parts are generated in order, so everything up to the first one without content is done.
+            while sent < len(parts) and parts[sent].content_md:
+                yield parts[sent]
+                sent += 1
+
+            if sent == len(parts):
+                return
+
+            position = yield from broadcast.follow(
+                parts[sent],
+                position,
+                signal,
+                streamed,
+                render_mode,
+                timeout=Configuration.GENERATION_LOCK_POLL_INTERVAL,
+                cancellation=cancellation
+            )
+    finally:
+        if broadcast:
+            if cancellation:
+                cancellation.unwatch(signal)
+            broadcast.leave(signal)
+
+
+def stream_section_content(entry: Entry,
+                           section: EntrySection,
+                           render_mode: RenderMode = RenderMode.SERVER) -> Iterator[EntrySectionFragment]:
+    """
+    Generates the Markdown of a section or subsection, yielding its HTML
+    (or Markdown) block by block as it streams in, and logging the blocks
+    for the requests waiting on it. Returns the Markdown, or None if it
+    couldn't be generated.
+    """
+
+    encoder = EntrySectionFragment.make_encoder(section, render_mode)
+    renderer = IncrementalMarkdownRenderer(MarkdownProfile.SECTION, render_blocks=False)
+    events = EntryEventWriter(section)
+    try:
+        events.publish(GenerationEventType.STARTED)
+        chunks = gpt.stream_entry_section(
+            proficiency=entry.proficiency.prompt_format(),
+            section_title=section.title,
+            topic=entry.topic
+        )
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration as e:
+                content_md = e.value
+                break
+
+            for block in renderer.feed(chunk):
+                events.publish(GenerationEventType.FRAGMENT, block)
+                yield EntrySectionFragment.from_markdown(section, block, render_mode, encoder)
+
+        if content_md:
+            for block in renderer.close():
+                events.publish(GenerationEventType.FRAGMENT, block)
+                yield EntrySectionFragment.from_markdown(section, block, render_mode, encoder)
+    finally:
+        # Before the part is saved, which is published after this.
+        events.close()
+    return content_md
+
+
 def get_entry(session_id: str,
               entry_id: uuid.UUID) -> tuple[dict, ResponseStatus]:
     if not entry_id:
@@ -1382,7 +2475,7 @@ def get_entries(session_id: str) -> tuple[list, ResponseStatus]:
     return (response, response_status)
 
 
-def get_cover_image(entry_id: uuid.UUID) -> Iterator[str]:
+def get_cover_image(entry_id: uuid.UUID) -> Iterator[bytes]:
     if not entry_id:
         response_status = ResponseStatus.BAD_REQUEST
         response = {
@@ -1391,38 +2484,50 @@ def get_cover_image(entry_id: uuid.UUID) -> Iterator[str]:
                 ProtocolKey.ERROR_MESSAGE: "Missing argument: 'entry_id'."
             }
         }
-        yield f"data: {json.dumps(response)}\n\n"
-        yield "event: close\n\n"
+        yield sse_event(response)
+        yield SSE_CLOSE
     else:
         entry: Entry = Entry.get_by_id(entry_id)
-        if entry and not entry.cover_image:
-            query = entry.topic
-            params = {
-                "engine": "google_images",
-                "q": query,
-                "api_key": Configuration.SERPAPI_API_KEY
+        if entry:
+            yield from stream_cover_image(entry)
+            yield SSE_CLOSE
+        else:
+            response_status = ResponseStatus.NOT_FOUND
+            response = {
+                ProtocolKey.ERROR: {
+                    ProtocolKey.ERROR_CODE: response_status.value,
+                    ProtocolKey.ERROR_MESSAGE: "No entry exists for the given ID."
+                }
             }
+            yield sse_event(response)
+            yield SSE_CLOSE
 
-            search = GoogleSearch(params)
-            results = search.get_dict()
-            if results:
-                results: list[dict] = results.get("images_results")
-                if results:
-                    image_data = results[0]
-                    caption = image_data["title"]
-                    source = image_data["source"]
-                    url = image_data["original"]
-
-                    image: EntryCoverImage = EntryCoverImage.create(
-                        caption=caption,
-                        entry_id=entry_id,
-                        source=source,
-                        url=url
-                    )
-                    if image:
-                        yield f"data: {json.dumps(image.as_dict())}\n\n"
 
-            yield "event: close\n\n"
+def get_events(entry_id: uuid.UUID,
+               sources: Iterable[EntryEventType] = (),
+               render_mode: RenderMode = RenderMode.SERVER,
+               last_event_id: str = None) -> Iterator[bytes]:
+    """
+    The event stream of an entry page, with the events of the given sources
+    and of the sections the page asks for by command. With the ID of the
+    last event a client got, resumes the stream it lost.
+    """
+
+    if not entry_id:
+        response_status = ResponseStatus.BAD_REQUEST
+        response = {
+            ProtocolKey.ERROR: {
+                ProtocolKey.ERROR_CODE: response_status.value,
+                ProtocolKey.ERROR_MESSAGE: "Missing argument: 'entry_id'."
+            }
+        }
+        yield sse_event(response)
+        yield SSE_CLOSE
+    else:
+        entry: Entry = Entry.get_by_id(entry_id)
+        if entry:
+            channel = EntryChannel(entry, render_mode, last_event_id)
+            yield from channel.events([source for source in sources if source in EntryChannel.SOURCES])
         else:
             response_status = ResponseStatus.NOT_FOUND
             response = {
@@ -1431,11 +2536,16 @@ def get_cover_image(entry_id: uuid.UUID) -> Iterator[str]:
                     ProtocolKey.ERROR_MESSAGE: "No entry exists for the given ID."
                 }
             }
-            yield f"data: {json.dumps(response)}\n\n"
-            yield "event: close\n\n"
+            yield sse_event(response)
+            yield SSE_CLOSE
 
 
-def get_related_topics(entry_id: uuid.UUID) -> Iterator[str]:
+def get_header(entry_id: uuid.UUID) -> Iterator[bytes]:
+    """
+    Streams the summary, fun facts and stats of a new entry as they are
+    saved. The summary is saved last, so once it exists the rest does too.
+    """
+
     if not entry_id:
         response_status = ResponseStatus.BAD_REQUEST
         response = {
@@ -1444,35 +2554,41 @@ def get_related_topics(entry_id: uuid.UUID) -> Iterator[str]:
                 ProtocolKey.ERROR_MESSAGE: "Missing argument: 'entry_id'."
             }
         }
-        yield f"data: {json.dumps(response)}\n\n"
-        yield "event: close\n\n"
+        yield sse_event(response)
+        yield SSE_CLOSE
     else:
         entry: Entry = Entry.get_by_id(entry_id)
         if entry:
-            if not entry.related_topics:
-                related_topics = gpt.get_entry_related_topics(
-                    proficiency=entry.proficiency.prompt_format(),
-                    topic=entry.topic
-                )
-                if related_topics:
-                    for related_topic in related_topics:
-                        topic: EntryRelatedTopic = EntryRelatedTopic.create(
-                            entry_id=entry_id,
-                            topic=related_topic
-                        )
-                        if topic:
-                            yield f"data: {json.dumps(topic.as_dict())}\n\n"
-            else:
-                response_status = ResponseStatus.ALREADY_EXISTS
-                response = {
-                    ProtocolKey.ERROR: {
-                        ProtocolKey.ERROR_CODE: response_status.value,
-                        ProtocolKey.ERROR_MESSAGE: "This entry's related topics have already been created."
-                    }
+            yield from stream_header(entry)
+            yield SSE_CLOSE
+        else:
+            response_status = ResponseStatus.NOT_FOUND
+            response = {
+                ProtocolKey.ERROR: {
+                    ProtocolKey.ERROR_CODE: response_status.value,
+                    ProtocolKey.ERROR_MESSAGE: "No entry exists for the given ID."
                 }
-                yield f"data: {json.dumps(response)}\n\n"
+            }
+            yield sse_event(response)
+            yield SSE_CLOSE
+
 
-            yield "event: close\n\n"
+def get_related_topics(entry_id: uuid.UUID) -> Iterator[bytes]:
+    if not entry_id:
+        response_status = ResponseStatus.BAD_REQUEST
+        response = {
+            ProtocolKey.ERROR: {
+                ProtocolKey.ERROR_CODE: response_status.value,
+                ProtocolKey.ERROR_MESSAGE: "Missing argument: 'entry_id'."
+            }
+        }
+        yield sse_event(response)
+        yield SSE_CLOSE
+    else:
+        entry: Entry = Entry.get_by_id(entry_id)
+        if entry:
+            yield from stream_related_topics(entry)
+            yield SSE_CLOSE
         else:
             response_status = ResponseStatus.NOT_FOUND
             response = {
@@ -1481,8 +2597,8 @@ def get_related_topics(entry_id: uuid.UUID) -> Iterator[str]:
                     ProtocolKey.ERROR_MESSAGE: "No entry exists for the given ID."
                 }
             }
-            yield f"data: {json.dumps(response)}\n\n"
-            yield "event: close\n\n"
+            yield sse_event(response)
+            yield SSE_CLOSE
 
 
 def make(session_id: str,
@@ -1522,64 +2638,44 @@ def make(session_id: str,
             else:
                 creator_id = None
 
-            md_extension_configs = {
-                "pymdownx.highlight": {
-                    "auto_title": True,
-                    "auto_title_map": {
-                        "Python Console Session": "Python"
-                    }
-                }
-            }
+            # Get a proper topic from the LLM (or from the normalization cache).
+            topic = topic_normalization.get_entry_topic(user_topic)
+            if topic and Configuration.PREGENERATION_USER_ID:
+                pregenerated_entry: Entry = Entry.get_by_topic(
+                    proficiency=proficiency,
+                    topic=topic,
+                    user_id=Configuration.PREGENERATION_USER_ID
+                )
+            else:
+                pregenerated_entry = None
 
-            # Get a proper topic from the LLM.
-            topic = gpt.get_entry_topic(user_topic)
-            if topic:
-                topic = util.unquote(topic)  # Sometimes the LLM returns the topic enclosed in quotes.
-                summary = gpt.get_entry_summary(topic)
-                entry: Entry = Entry.create(
+            if pregenerated_entry:
+                response = {ProtocolKey.ID: pregenerated_entry.id}
+            elif topic:
+                run = entry_pipeline.run(
                     proficiency=proficiency,
-                    summary=summary,
                     topic=topic,
-                    user_id=creator_id
+                    user_id=creator_id,
+                    user_topic=user_topic
                 )
+                # Only the entry row is needed to redirect. Everything else carries on in
+                # the background and is picked up by the entry page's own requests.
+                run.wait(["entry"])
+
+                entry: Entry = run.result("entry")
                 if entry:
-                    AnalyticsTopicHistory.create(user_topic)
-
-                    with concurrent.futures.ThreadPoolExecutor() as executor:
-                        facts_future = executor.submit(gpt.get_entry_fun_facts, topic)
-                        stats_future = executor.submit(gpt.get_entry_stats, topic)
-
-                        facts_raw = facts_future.result()
-                        stats_raw = stats_future.result()
-
-                        if facts_raw:
-                            for fact in facts_raw:
-                                EntryFunFact.create(fact, entry.id)
-
-                        if stats_raw:
-                            for i, stat in enumerate(stats_raw):
-                                name_md, value_md = stat.popitem()
-
-                                name_html = markdown.markdown(
-                                    name_md,
-                                    extensions=["pymdownx.superfences"],
-                                    extension_configs=md_extension_configs
-                                )
-                                value_html = markdown.markdown(
-                                    value_md,
-                                    extensions=["pymdownx.superfences"],
-                                    extension_configs=md_extension_configs
-                                )
-                                EntryStat.create(
-                                    entry_id=entry.id,
-                                    index=i,
-                                    name_html=name_html,
-                                    name_md=name_md,
-                                    value_html=value_html,
-                                    value_md=value_md
-                                )
-
-                        response = {ProtocolKey.ID: entry.id}
+                    entry_pipeline_runs[entry.id] = run
+                    run.add_done_callback(finish_entry_pipeline_run)
+
+                    response = {ProtocolKey.ID: entry.id}
+                else:
+                    response_status = ResponseStatus.INTERNAL_SERVER_ERROR
+                    response = {
+                        ProtocolKey.ERROR: {
+                            ProtocolKey.ERROR_CODE: response_status.value,
+                            ProtocolKey.ERROR_MESSAGE: "An internal server error occurred."
+                        }
+                    }
             else:
                 if topic == "":
                     response_status = ResponseStatus.NOT_FOUND
@@ -1608,7 +2704,7 @@ def make_chat_completion(context: str,
                          reset_chat: bool,
                          section_id: uuid.UUID,
                          session_id: str,
-                         user_query_md: str) -> Iterator[str]:
+                         user_query_md: str) -> Iterator[bytes]:
     if not entry_id:
         response_status = ResponseStatus.BAD_REQUEST
         response = {
@@ -1617,8 +2713,8 @@ def make_chat_completion(context: str,
                 ProtocolKey.ERROR_MESSAGE: "Missing argument: 'entry_id'."
             }
         }
-        yield f"data: {json.dumps(response)}\n\n"
-        yield "event: close\n\n"
+        yield sse_event(response)
+        yield SSE_CLOSE
     else:
         entry: Entry = Entry.get_by_id(entry_id)
         if entry:
@@ -1637,24 +2733,12 @@ def make_chat_completion(context: str,
                 else:
                     creator_id = None
 
-                history = chat_histories.get(section_id)
-                if not history or reset_chat:
-                    history = []
-                    chat_histories[section_id] = history
+                memory = chat_memories.get(section_id)
+                if not memory or reset_chat:
+                    memory = ChatMemory(entry.topic)
+                    chat_memories[section_id] = memory
 
-                md_extension_configs = {
-                    "pymdownx.highlight": {
-                        "auto_title": True,
-                        "auto_title_map": {
-                            "Python Console Session": "Python"
-                        }
-                    }
-                }
-                user_query_html = markdown.markdown(
-                    user_query_md,
-                    extensions=["pymdownx.superfences", "tables"],
-                    extension_configs=md_extension_configs
-                )
+                user_query_html = render_markdown(user_query_md, MarkdownProfile.USER_MESSAGE)
 
                 user_message = ChatMessage()
                 user_message.chat_id = section_id
@@ -1662,32 +2746,47 @@ def make_chat_completion(context: str,
                 user_message.content_md = user_query_md
                 user_message.sender_id = creator_id
                 user_message.sender_role = ChatMessageSenderRole.USER
-                history.append(user_message)
-
-                response_md = gpt.get_entry_chat_completion(
-                    context=context,
-                    messages=history,
-                    proficiency=entry.proficiency.prompt_format(),
-                    section_md=section.content_md,
-                    topic=entry.topic
-                )
-                response_html = markdown.markdown(
-                    response_md,
-                    extensions=["footnotes", "pymdownx.superfences", "tables"],
-                    extension_configs=md_extension_configs
-                )
+
+                cache_key = (section_id, (context or "").strip())
+                cached_answer = None
+                question_embedding = None
+                if Configuration.CHAT_ANSWER_CACHE_ENABLED and not memory.messages:
+                    # Only first questions are cached since later answers depend on the conversation.
+                    question_embedding = gpt.get_embedding(user_query_md)
+                    if question_embedding:
+                        cached_answer = chat_answer_cache.get(cache_key, question_embedding)
+
+                memory.append(user_message)
+
+                if cached_answer:
+                    response_md, response_html = cached_answer
+                else:
+                    summary, messages = memory.get_context()
+                    response_md = gpt.get_entry_chat_completion(
+                        context=context,
+                        messages=messages,
+                        proficiency=entry.proficiency.prompt_format(),
+                        section_md=section.content_md,
+                        summary=summary,
+                        topic=entry.topic
+                    )
+                    response_html = render_markdown(response_md, MarkdownProfile.CHAT)
+
+                    if question_embedding and response_md:
+                        chat_answer_cache.add(cache_key, question_embedding, (response_md, response_html))
 
                 llm_message = ChatMessage()
                 llm_message.chat_id = section_id
                 llm_message.content_html = response_html
                 llm_message.content_md = response_md
                 llm_message.sender_role = ChatMessageSenderRole.ASSISTANT
-                history.append(llm_message)
+                memory.append(llm_message)
+                memory.summarize()
 
-                yield f"data: {response_html}\n\n"
-                yield "event: close\n\n"
+                yield b"data: " + response_html.encode("utf-8") + b"\n\n"
+                yield SSE_CLOSE
             else:
-                yield "event: close\n\n"
+                yield SSE_CLOSE
         else:
             response_status = ResponseStatus.NOT_FOUND
             response = {
@@ -1696,11 +2795,18 @@ def make_chat_completion(context: str,
                     ProtocolKey.ERROR_MESSAGE: "No entry exists for the given ID."
                 }
             }
-            yield f"data: {json.dumps(response)}\n\n"
-            yield "event: close\n\n"
+            yield sse_event(response)
+            yield SSE_CLOSE
 
 
-def make_section(section_id: uuid.UUID) -> Iterator[str]:
+def make_section(section_id: uuid.UUID,
+                 render_mode: RenderMode = RenderMode.SERVER,
+                 last_event_id: int = None) -> Iterator[bytes]:
+    """
+    For generating a section other than the first. With the ID of the last
+    event a client got, resumes the stream it lost.
+    """
+
     if not section_id:
         response_status = ResponseStatus.BAD_REQUEST
         response = {
@@ -1709,70 +2815,15 @@ def make_section(section_id: uuid.UUID) -> Iterator[str]:
                 ProtocolKey.ERROR_MESSAGE: "Missing argument: 'section_id'."
             }
         }
-        yield f"data: {json.dumps(response)}\n\n"
-        yield "event: close\n\n"
+        yield sse_event(response)
+        yield SSE_CLOSE
     else:
         section: EntrySection = EntrySection.get_by_id(section_id)
         if section:
-            if not section.content_html:
+            if not section.content_md or last_event_id is not None:
                 entry: Entry = Entry.get_by_id(section.entry_id)
                 if entry:
-                    md_extension_configs = {
-                        "pymdownx.highlight": {
-                            "auto_title": True,
-                            "auto_title_map": {
-                                "Python Console Session": "Python"
-                            }
-                        }
-                    }
-
-                    content_md = gpt.get_entry_section(
-                        proficiency=entry.proficiency.prompt_format(),
-                        section_title=section.title,
-                        topic=entry.topic
-                    )
-                    if content_md:
-                        content_html = markdown.markdown(
-                            content_md,
-                            extensions=["footnotes", "pymdownx.superfences", "tables"],
-                            extension_configs=md_extension_configs
-                        )
-                        section.content_html = content_html
-                        section.content_md = content_md
-
-                        yield f"data: {json.dumps(section.as_dict())}\n\n"
-                        section.update()
-
-                        for subsection in section.subsections:
-                            subtitle = subsection.title
-
-                            content_md = gpt.get_entry_section(
-                                proficiency=entry.proficiency.prompt_format(),
-                                section_title=subtitle,
-                                topic=entry.topic
-                            )
-
-                            if content_md:
-                                content_html = markdown.markdown(
-                                    content_md,
-                                    extensions=["footnotes", "pymdownx.superfences", "tables"],
-                                    extension_configs=md_extension_configs
-                                )
-
-                            subsection.content_html = content_html
-                            subsection.content_md = content_md
-
-                            yield f"data: {json.dumps(subsection.as_dict())}\n\n"
-                            subsection.update()
-                    else:
-                        response_status = ResponseStatus.NO_CONTENT
-                        response = {
-                            ProtocolKey.ERROR: {
-                                ProtocolKey.ERROR_CODE: response_status.value,
-                                ProtocolKey.ERROR_MESSAGE: "There was an error generating this section."
-                            }
-                        }
-                        yield f"data: {json.dumps(response)}\n\n"
+                    yield from stream_section(entry, section, render_mode, last_event_id)
                 else:
                     response_status = ResponseStatus.NOT_FOUND
                     response = {
@@ -1781,9 +2832,9 @@ def make_section(section_id: uuid.UUID) -> Iterator[str]:
                             ProtocolKey.ERROR_MESSAGE: "No entry exists for the given section ID."
                         }
                     }
-                    yield f"data: {json.dumps(response)}\n\n"
+                    yield sse_event(response)
 
-                yield "event: close\n\n"
+                yield SSE_CLOSE
             else:
                 response_status = ResponseStatus.ALREADY_EXISTS
                 response = {
@@ -1792,8 +2843,8 @@ def make_section(section_id: uuid.UUID) -> Iterator[str]:
                         ProtocolKey.ERROR_MESSAGE: "This section has already been created."
                     }
                 }
-                yield f"data: {json.dumps(response)}\n\n"
-                yield "event: close\n\n"
+                yield sse_event(response)
+                yield SSE_CLOSE
         else:
             response_status = ResponseStatus.NOT_FOUND
             response = {
@@ -1802,13 +2853,16 @@ def make_section(section_id: uuid.UUID) -> Iterator[str]:
                     ProtocolKey.ERROR_MESSAGE: "No section exists for the given ID."
                 }
             }
-            yield f"data: {json.dumps(response)}\n\n"
-            yield "event: close\n\n"
+            yield sse_event(response)
+            yield SSE_CLOSE
 
 
-def make_sections(entry_id: uuid.UUID) -> Iterator[str]:
+def make_sections(entry_id: uuid.UUID,
+                  render_mode: RenderMode = RenderMode.SERVER,
+                  last_event_id: int = None) -> Iterator[bytes]:
     """
-    For generating the ToC and the first section.
+    For generating the ToC and the first section. With the ID of the last
+    event a client got, resumes the stream it lost.
     """
 
     if not entry_id:
@@ -1819,112 +2873,13 @@ def make_sections(entry_id: uuid.UUID) -> Iterator[str]:
                 ProtocolKey.ERROR_MESSAGE: "Missing argument: 'entry_id'."
             }
         }
-        yield f"data: {json.dumps(response)}\n\n"
-        yield "event: close\n\n"
+        yield sse_event(response)
+        yield SSE_CLOSE
     else:
         entry: Entry = Entry.get_by_id(entry_id)
         if entry:
-            if not entry.sections:
-                md_extension_configs = {
-                    "pymdownx.highlight": {
-                        "auto_title": True,
-                        "auto_title_map": {
-                            "Python Console Session": "Python"
-                        }
-                    }
-                }
-
-                toc = gpt.get_entry_table_of_contents(
-                    proficiency=entry.proficiency.prompt_format(),
-                    topic=entry.topic
-                )
-                if toc:
-                    for i, section_raw in enumerate(toc):
-                        title = section_raw.get("title")
-
-                        # Only fetch the content of the first section. The rest are lazy-loaded.
-                        if i == 0:
-                            content_md = gpt.get_entry_section(
-                                proficiency=entry.proficiency.prompt_format(),
-                                section_title=title,
-                                topic=entry.topic
-                            )
-                        else:
-                            content_md = None
-
-                        if content_md:
-                            content_html = markdown.markdown(
-                                content_md,
-                                extensions=["footnotes", "pymdownx.superfences", "tables"],
-                                extension_configs=md_extension_configs
-                            )
-                        else:
-                            content_html = None
-
-                        section: EntrySection = EntrySection.create(
-                            content_html=content_html,
-                            content_md=content_md,
-                            entry_id=entry.id,
-                            index=i,
-                            title=title
-                        )
-
-                        yield f"data: {json.dumps(section.as_dict())}\n\n"
-
-                        subsections: list[dict] = section_raw.get("subsections")
-                        if subsections:
-                            for j, subsection_raw in enumerate(subsections):
-                                subtitle = subsection_raw.get("title")
-
-                                if i == 0:
-                                    content_md = gpt.get_entry_section(
-                                        proficiency=entry.proficiency.prompt_format(),
-                                        section_title=subtitle,
-                                        topic=entry.topic
-                                    )
-                                else:
-                                    content_md = None
-
-                                if content_md:
-                                    content_html = markdown.markdown(
-                                        content_md,
-                                        extensions=["footnotes", "pymdownx.superfences", "tables"],
-                                        extension_configs=md_extension_configs
-                                    )
-                                else:
-                                    content_html = None
-
-                                subsection: EntrySection = EntrySection.create(
-                                    content_html=content_html,
-                                    content_md=content_md,
-                                    entry_id=entry.id,
-                                    index=j,
-                                    parent_id=section.id,
-                                    title=subtitle
-                                )
-
-                                yield f"data: {json.dumps(subsection.as_dict())}\n\n"
-                else:
-                    response_status = ResponseStatus.NO_CONTENT
-                    response = {
-                        ProtocolKey.ERROR: {
-                            ProtocolKey.ERROR_CODE: response_status.value,
-                            ProtocolKey.ERROR_MESSAGE: "There was an error generating sections."
-                        }
-                    }
-                    yield f"data: {json.dumps(response)}\n\n"
-
-                yield "event: close\n\n"
-            else:
-                response_status = ResponseStatus.ALREADY_EXISTS
-                response = {
-                    ProtocolKey.ERROR: {
-                        ProtocolKey.ERROR_CODE: response_status.value,
-                        ProtocolKey.ERROR_MESSAGE: "This entry has already been created."
-                    }
-                }
-                yield f"data: {json.dumps(response)}\n\n"
-                yield "event: close\n\n"
+            yield from stream_sections(entry, render_mode, last_event_id)
+            yield SSE_CLOSE
         else:
             response_status = ResponseStatus.NOT_FOUND
             response = {
@@ -1933,8 +2888,60 @@ def make_sections(entry_id: uuid.UUID) -> Iterator[str]:
                     ProtocolKey.ERROR_MESSAGE: "No entry exists for the given ID."
                 }
             }
-            yield f"data: {json.dumps(response)}\n\n"
-            yield "event: close\n\n"
+            yield sse_event(response)
+            yield SSE_CLOSE
+
+
+def pregenerate(user_topic: str,
+                proficiency: UserTopicProficiency,
+                user_id: int) -> Entry | None:
+    """
+    Makes a complete entry, down to the last section, owned by the given
+    user. An existing entry on the same topic is completed instead.
+    """
+
+    entry: Entry = None
+    topic = topic_normalization.get_entry_topic(user_topic.strip())
+    if topic:
+        entry = Entry.get_by_topic(
+            proficiency=proficiency,
+            topic=topic,
+            user_id=user_id
+        )
+        if not entry:
+            run = entry_pipeline.run(
+                proficiency=proficiency,
+                topic=topic,
+                user_id=user_id,
+                user_topic=user_topic
+            )
+            run.wait()
+            finish_entry_pipeline_run(run)
+            entry = run.result("entry")
+
+        if entry:
+            # Same code paths as the entry page, minus the streaming.
+            for _ in make_sections(entry.id):
+                pass
+
+            for section in EntrySection.get_all_for_entry(entry.id):
+                for _ in make_section(section.id):
+                    pass
+
+            entry = Entry.get_by_id(entry.id)
+
+    return entry
+
+
+def release_entry_generation_lock(entry_id: uuid.UUID,
+                                  artifact: GenerationArtifact) -> None:
+    """
+    Releases a lock taken by an entry's pipeline run, if it holds it.
+    """
+
+    lock: GenerationLock = entry_generation_locks.get(entry_id)
+    if lock:
+        lock.release(artifact, entry_id)
 
 
 def remove(session_id: str,
@@ -1975,5 +2982,496 @@ def remove(session_id: str,
     return (response, response_status)
 
 
+def send_channel_command(entry_id: uuid.UUID,
+                         channel_id: uuid.UUID,
+                         command: dict) -> tuple[dict, ResponseStatus]:
+    """
+    Sends a command to an entry page's event stream, in whichever worker
+    it is open.
+    """
+
+    response_status = ResponseStatus.OK
+    try:
+        if not entry_id or not channel_id or not isinstance(command, dict):
+            raise ValueError("Missing argument.")
+
+        # Only what the command needs is passed on; notifications are limited to 8000 bytes.
+        payload = {
+            ProtocolKey.COMMAND: EntryChannelCommand(command.get(ProtocolKey.COMMAND)),
+            ProtocolKey.SECTION_ID: uuid.UUID(str(command.get(ProtocolKey.SECTION_ID)))
+        }
+        if command.get(ProtocolKey.LAST_EVENT_ID) is not None:
+            last_event_id = str(command[ProtocolKey.LAST_EVENT_ID])
+            if len(last_event_id) > 4000:
+                raise ValueError("Last event ID too long.")
+            EntryChannel.parse_event_id(last_event_id)
+            payload[ProtocolKey.LAST_EVENT_ID] = last_event_id
+    except (TypeError, ValueError):
+        response_status = ResponseStatus.BAD_REQUEST
+
+    if response_status == ResponseStatus.OK:
+        channel: EntryChannel = entry_channels.get(channel_id)
+        if channel and channel.entry.id == entry_id:
+            channel.command(dumps(payload).decode("utf-8"))
+        elif not notify(EntryChannel.notification_channel(channel_id), dumps(payload).decode("utf-8")):
+            response_status = ResponseStatus.INTERNAL_SERVER_ERROR
+
+    if response_status == ResponseStatus.OK:
+        response = payload
+    elif response_status == ResponseStatus.BAD_REQUEST:
+        response = {
+            ProtocolKey.ERROR: {
+                ProtocolKey.ERROR_CODE: response_status.value,
+                ProtocolKey.ERROR_MESSAGE: "Missing or badly-formed command."
+            }
+        }
+    else:
+        response = {
+            ProtocolKey.ERROR: {
+                ProtocolKey.ERROR_CODE: response_status.value,
+                ProtocolKey.ERROR_MESSAGE: "The command couldn't be sent."
+            }
+        }
+
+    return (response, response_status)
+
+
+def search_cover_image(topic: str) -> dict[str, str] | None:
+    ret = None
+    params = {
+        "engine": "google_images",
+        "q": topic,
+        "api_key": Configuration.SERPAPI_API_KEY
+    }
+
+    results = cassette.get_search_results(params)
+    if results:
+        results: list[dict] = results.get("images_results")
+        if results:
+            image_data = results[0]
+            ret = {
+                ProtocolKey.CAPTION: image_data["title"],
+                ProtocolKey.SOURCE: image_data["source"],
+                ProtocolKey.URL: image_data["original"]
+            }
+
+    return ret
+
+
+###################
+# PIPELINE STAGES #
+###################
+
+
+def stage_cover_image(topic: str) -> dict[str, str] | None:
+    return search_cover_image(topic)
+
+
+def stage_entry(proficiency: UserTopicProficiency,
+                topic: str,
+                user_id: int | None) -> Entry:
+    entry: Entry = Entry.create(
+        proficiency=proficiency,
+        topic=topic,
+        user_id=user_id
+    )
+    if not entry:
+        raise Exception("The entry could not be created.")
+
+    # Taken before anyone can see the entry so that no other process starts on what this run makes.
+    lock = GenerationLock()
+    for artifact in (GenerationArtifact.COVER_IMAGE, GenerationArtifact.HEADER, GenerationArtifact.RELATED_TOPICS,
+                     GenerationArtifact.TABLE_OF_CONTENTS):
+        lock.acquire(artifact, entry.id)
+    entry_generation_locks[entry.id] = lock
+    return entry
+
+
+def stage_fun_facts(header: dict | None,
+                    topic: str) -> list[str] | None:
+    if header:
+        return header[ProtocolKey.FUN_FACTS]
+    return gpt.get_entry_fun_facts(topic)
+
+
+def stage_header(topic: str) -> dict | None:
+    # Without the single call, the parts are generated concurrently by their own stages.
+    if Configuration.ENTRY_HEADER_SINGLE_CALL:
+        return gpt.get_entry_header(topic)
+    return None
+
+
+def stage_related_topics(proficiency: UserTopicProficiency,
+                         topic: str) -> list[str] | None:
+    return gpt.get_entry_related_topics(
+        proficiency=proficiency.prompt_format(),
+        topic=topic
+    )
+
+
+def stage_save_cover_image(entry: Entry,
+                           cover_image: dict[str, str] | None) -> EntryCoverImage | None:
+    ret = None
+    try:
+        if cover_image:
+            ret = EntryCoverImage.create(
+                caption=cover_image[ProtocolKey.CAPTION],
+                entry_id=entry.id,
+                source=cover_image[ProtocolKey.SOURCE],
+                url=cover_image[ProtocolKey.URL]
+            )
+    finally:
+        release_entry_generation_lock(entry.id, GenerationArtifact.COVER_IMAGE)
+    return ret
+
+
+def stage_save_fun_facts(entry: Entry,
+                         fun_facts: list[str] | None) -> list[EntryFunFact]:
+    ret = []
+    if fun_facts:
+        for fact in fun_facts:
+            fact: EntryFunFact = EntryFunFact.create(fact, entry.id)
+            if fact:
+                ret.append(fact)
+    return ret
+
+
+def stage_save_related_topics(entry: Entry,
+                              related_topics: list[str] | None) -> list[EntryRelatedTopic]:
+    ret = []
+    try:
+        if related_topics:
+            for related_topic in related_topics:
+                topic: EntryRelatedTopic = EntryRelatedTopic.create(
+                    entry_id=entry.id,
+                    topic=related_topic
+                )
+                if topic:
+                    ret.append(topic)
+    finally:
+        release_entry_generation_lock(entry.id, GenerationArtifact.RELATED_TOPICS)
+    return ret
+
+
+def stage_save_stats(entry: Entry,
+                     stats: list[dict] | None) -> list[EntryStat]:
+    ret = []
+    if stats:
+        for i, stat in enumerate(stats):
+            name_md, value_md = stat.popitem()
+
+            name_html = render_markdown(name_md, MarkdownProfile.STAT)
+            value_html = render_markdown(value_md, MarkdownProfile.STAT)
+            stat: EntryStat = EntryStat.create(
+                entry_id=entry.id,
+                index=i,
+                name_html=name_html,
+                name_md=name_md,
+                value_html=value_html,
+                value_md=value_md
+            )
+            if stat:
+                ret.append(stat)
+    return ret
+
+
+def stage_save_summary(entry: Entry,
+                       summary: str | None,
+                       save_fun_facts: list[EntryFunFact],
+                       save_stats: list[EntryStat]) -> str | None:
+    # Saved after the fun facts and stats so that a saved summary means the whole header is ready.
+    try:
+        if summary:
+            entry.summary = summary
+            entry.update()
+    finally:
+        release_entry_generation_lock(entry.id, GenerationArtifact.HEADER)
+    return summary
+
+
+def stage_save_table_of_contents(entry: Entry,
+                                 table_of_contents: list[dict] | None) -> list[EntrySection]:
+    ret = []
+    try:
+        if table_of_contents:
+            ret = create_sections(entry.id, table_of_contents)
+    finally:
+        release_entry_generation_lock(entry.id, GenerationArtifact.TABLE_OF_CONTENTS)
+    return ret
+
+
+def stage_save_topic_history(entry: Entry,
+                             user_topic: str) -> None:
+    AnalyticsTopicHistory.create(user_topic)
+
+
+def stage_stats(header: dict | None,
+                topic: str) -> list[dict] | None:
+    if header:
+        return header[ProtocolKey.STATS]
+    return gpt.get_entry_stats(topic)
+
+
+def stage_summary(header: dict | None,
+                  topic: str) -> str | None:
+    if header:
+        return header[ProtocolKey.SUMMARY]
+    return gpt.get_entry_summary(topic)
+
+
+def stage_table_of_contents(proficiency: UserTopicProficiency,
+                            topic: str) -> list[dict] | None:
+    return gpt.get_entry_table_of_contents(
+        proficiency=proficiency.prompt_format(),
+        topic=topic
+    )
+
+
+def stream_cover_image(entry: Entry,
+                       cancellation: util.Cancellation = None) -> Iterator[bytes]:
+    """
+    The event of an entry's cover image, searched for first if need be.
+    """
+
+    image: EntryCoverImage = entry.cover_image
+    run: PipelineRun = entry_pipeline_runs.get(entry.id)
+    if not image and run:
+        # The search was started along with the entry.
+        image = run.result("save_cover_image")
+    elif not image:
+        def make_cover_image() -> EntryCoverImage | None:
+            image_data = search_cover_image(entry.topic)
+            if image_data:
+                return EntryCoverImage.create(
+                    caption=image_data[ProtocolKey.CAPTION],
+                    entry_id=entry.id,
+                    source=image_data[ProtocolKey.SOURCE],
+                    url=image_data[ProtocolKey.URL]
+                )
+            return None
+
+        image = single_flight(
+            GenerationArtifact.COVER_IMAGE,
+            entry.id,
+            fetch=lambda: EntryCoverImage.get_for_entry(entry.id),
+            generate=make_cover_image,
+            cancellation=cancellation
+        )
+
+    if image:
+        yield sse_event(image.as_dict())
+
+
+def stream_header(entry: Entry,
+                  cancellation: util.Cancellation = None) -> Iterator[bytes]:
+    """
+    The events of an entry's summary, fun facts and stats, as they are
+    saved. The summary is saved last, so once it exists the rest does too.
+    """
+
+    run: PipelineRun = entry_pipeline_runs.get(entry.id)
+    if run:
+        for stage_name in run.as_completed(["save_fun_facts", "save_stats", "save_summary"]):
+            result = run.result(stage_name)
+            if stage_name == "save_summary" and result:
+                yield sse_event({ProtocolKey.SUMMARY: result})
+            elif stage_name == "save_fun_facts" and result:
+                facts_serialized = [fact.as_dict() for fact in result]
+                yield sse_event({ProtocolKey.FUN_FACTS: facts_serialized})
+            elif stage_name == "save_stats" and result:
+                stats_serialized = [stat.as_dict() for stat in result]
+                yield sse_event({ProtocolKey.STATS: stats_serialized})
+    else:
+        if not entry.summary:
+            # The entry may be getting made by another worker, whose run holds the header's lock until it's saved.
+            entry_id = entry.id
+
+            def get_entry_with_header() -> Entry | None:
+                ret: Entry = Entry.get_by_id(entry_id)
+                return ret if ret and ret.summary else None
+
+            entry = single_flight(
+                GenerationArtifact.HEADER,
+                entry_id,
+                fetch=get_entry_with_header,
+                generate=lambda: None,
+                timeout=Configuration.ENTRY_HEADER_WAIT_TIMEOUT,
+                cancellation=cancellation
+            )
+
+        if entry and entry.summary:
+            if entry.fun_facts:
+                facts_serialized = [fact.as_dict() for fact in entry.fun_facts]
+                yield sse_event({ProtocolKey.FUN_FACTS: facts_serialized})
+
+            if entry.stats:
+                stats_serialized = [stat.as_dict() for stat in entry.stats]
+                yield sse_event({ProtocolKey.STATS: stats_serialized})
+
+            yield sse_event({ProtocolKey.SUMMARY: entry.summary})
+
+
+def stream_related_topics(entry: Entry,
+                          cancellation: util.Cancellation = None) -> Iterator[bytes]:
+    """
+    The events of an entry's related topics, generated first if need be.
+    """
+
+    related_topics: list[EntryRelatedTopic] = entry.related_topics
+    run: PipelineRun = entry_pipeline_runs.get(entry.id)
+    if run:
+        # These were started along with the entry and may still be getting saved.
+        related_topics = run.result("save_related_topics") or []
+    elif not related_topics:
+        def make_related_topics() -> list[EntryRelatedTopic]:
+            related_topics_raw = gpt.get_entry_related_topics(
+                proficiency=entry.proficiency.prompt_format(),
+                topic=entry.topic
+            )
+            return stage_save_related_topics(entry, related_topics_raw)
+
+        related_topics = single_flight(
+            GenerationArtifact.RELATED_TOPICS,
+            entry.id,
+            fetch=lambda: EntryRelatedTopic.get_all_for_entry(entry.id),
+            generate=make_related_topics,
+            cancellation=cancellation
+        )
+
+    for topic in related_topics:
+        yield sse_event(topic.as_dict())
+
+
+def stream_section(entry: Entry,
+                   section: EntrySection,
+                   render_mode: RenderMode = RenderMode.SERVER,
+                   last_event_id: int = None,
+                   cancellation: util.Cancellation = None) -> Iterator[bytes]:
+    """
+    The events of a section other than the first and of its subsections,
+    generated first if need be. With the ID of the last event a client got,
+    resumes the stream it lost.
+    """
+
+    events = EntryEventStream(last_event_id)
+    parts = generate_section_content(entry, section, render_mode, cancellation)
+    for part in parts:
+        if isinstance(part, EntrySectionFragment):
+            yield part.as_event()
+        elif part.id != section.id or part.content_md:
+            event = events.send(part.as_dict(render_mode=render_mode))
+            if event:
+                yield event
+        else:
+            parts.close()
+            response_status = ResponseStatus.NO_CONTENT
+            response = {
+                ProtocolKey.ERROR: {
+                    ProtocolKey.ERROR_CODE: response_status.value,
+                    ProtocolKey.ERROR_MESSAGE: "There was an error generating this section."
+                }
+            }
+            yield sse_event(response)
+            break
+
+
+def stream_sections(entry: Entry,
+                    render_mode: RenderMode = RenderMode.SERVER,
+                    last_event_id: int = None,
+                    cancellation: util.Cancellation = None) -> Iterator[bytes]:
+    """
+    The events of a new entry's ToC and first section, generated first if
+    need be. With the ID of the last event a client got, resumes the stream
+    it lost.
+    """
+
+    events = EntryEventStream(last_event_id)
+    run: PipelineRun = entry_pipeline_runs.get(entry.id)
+    if run:
+        # The ToC was started along with the entry and may still be getting saved.
+        entry.sections = run.result("save_table_of_contents") or []
+
+    if not entry.sections:
+        def make_table_of_contents() -> list[EntrySection]:
+            toc = gpt.get_entry_table_of_contents(
+                proficiency=entry.proficiency.prompt_format(),
+                topic=entry.topic
+            )
+            return stage_save_table_of_contents(entry, toc)
+
+        entry.sections = single_flight(
+            GenerationArtifact.TABLE_OF_CONTENTS,
+            entry.id,
+            fetch=lambda: EntrySection.get_all_for_entry(entry.id),
+            generate=make_table_of_contents,
+            cancellation=cancellation
+        )
+
+    # Whoever opens a new entry while it's being made gets what's made of it so far, and then the rest as it's made.
+    if entry.sections:
+        for i, section in enumerate(entry.sections):
+            # Only fetch the content of the first section. The rest are lazy-loaded.
+            if i == 0:
+                parts = generate_section_content(entry, section, render_mode, cancellation)
+            else:
+                parts = [section] + section.subsections
+            for part in parts:
+                if isinstance(part, EntrySectionFragment):
+                    yield part.as_event()
+                    continue
+
+                if part.id == section.id:
+                    event = events.send(part.as_dict(include_subsections=False, render_mode=render_mode))
+                else:
+                    event = events.send(part.as_dict(render_mode=render_mode))
+                if event:
+                    yield event
+    else:
+        response_status = ResponseStatus.NO_CONTENT
+        response = {
+            ProtocolKey.ERROR: {
+                ProtocolKey.ERROR_CODE: response_status.value,
+                ProtocolKey.ERROR_MESSAGE: "There was an error generating sections."
+            }
+        }
+        yield sse_event(response)
+
+
+# Everything that only needs the topic starts at once, including the entry row itself.
+entry_pipeline = Pipeline(
+    [
+        PipelineStage("header", stage_header, ("topic",)),
+        PipelineStage("summary", stage_summary, ("header", "topic")),
+        PipelineStage("fun_facts", stage_fun_facts, ("header", "topic")),
+        PipelineStage("stats", stage_stats, ("header", "topic")),
+        PipelineStage("table_of_contents", stage_table_of_contents, ("proficiency", "topic")),
+        PipelineStage("cover_image", stage_cover_image, ("topic",)),
+        PipelineStage("related_topics", stage_related_topics, ("proficiency", "topic")),
+        PipelineStage("entry", stage_entry, ("proficiency", "topic", "user_id")),
+        PipelineStage("save_topic_history", stage_save_topic_history, ("entry", "user_topic")),
+        PipelineStage("save_fun_facts", stage_save_fun_facts, ("entry", "fun_facts")),
+        PipelineStage("save_stats", stage_save_stats, ("entry", "stats")),
+        PipelineStage("save_summary", stage_save_summary, ("entry", "summary", "save_fun_facts", "save_stats")),
+        PipelineStage("save_table_of_contents", stage_save_table_of_contents, ("entry", "table_of_contents")),
+        PipelineStage("save_cover_image", stage_save_cover_image, ("entry", "cover_image")),
+        PipelineStage("save_related_topics", stage_save_related_topics, ("entry", "related_topics"))
+    ],
+    concurrent.futures.ThreadPoolExecutor(max_workers=Configuration.ENTRY_PIPELINE_MAX_WORKERS)
+)
+# The broadcasts of the entries with requests waiting on their generation in this process.
+entry_broadcasts: dict[uuid.UUID, EntryBroadcast] = {}
+entry_broadcasts_lock = threading.Lock()
+# The entry pages' event streams open in this process, by ID.
+entry_channels: dict[uuid.UUID, EntryChannel] = {}
+# Where the sources of the entry pages' event streams run (see ENTRY_CHANNEL_MAX_WORKERS).
+entry_channel_workers = Configuration.ENTRY_CHANNEL_MAX_WORKERS or llm_router.max_concurrency
+entry_channel_executor = concurrent.futures.ThreadPoolExecutor(max_workers=entry_channel_workers)
+# The sources running or waiting for a thread.
+entry_channel_sources = threading.BoundedSemaphore(entry_channel_workers + Configuration.ENTRY_CHANNEL_MAX_QUEUED)
+# Runs whose background stages are still going, so that the entry page's requests can wait on them.
+entry_pipeline_runs: dict[uuid.UUID, PipelineRun] = {}
+# Generation locks held by the pipeline runs, until their save stages release them.
+entry_generation_locks: dict[uuid.UUID, GenerationLock] = {}
+
 entry_purge_scheduled_task = EntryPurgeJob()
 entry_purge_scheduled_task.start()
@@ -0,0 +1,186 @@
+"""
+Single-flight generation of entry artifacts across processes.
+
+Before generating an artifact (a section, the related topics, ...), a
+process takes a Postgres advisory lock on it. Other processes, and other
+requests in the same process, find the lock taken and wait for the holder
+to save the artifact instead of generating and saving it a second time.
+Releasing a lock notifies its channel, which wakes whoever waits on it.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Callable, TypeVar
+import uuid
+
+from app.config import Configuration, GenerationArtifact
+from app.modules import util
+from app.modules.db import RelationalDB
+from app.modules.notifications import notification_listener
+
+
+T = TypeVar("T")
+
+
+###########
+# CLASSES #
+###########
+
+
+class GenerationLock:
+    """
+    Session-level advisory locks on artifacts, held on a connection of the
+    lock's own until released. If the holder dies, Postgres releases its
+    locks along with the connection.
+    """
+
+    def __init__(self) -> None:
+        self._db: RelationalDB | None = None
+        self._keys: set[int] = set()
+        self._lock = threading.Lock()
+
+    def acquire(self,
+                artifact: GenerationArtifact,
+                artifact_id: uuid.UUID) -> bool:
+        """
+        Takes the artifact's lock if it is free. If the database can't be
+        reached, generation goes ahead without one.
+        """
+
+        if not isinstance(artifact, GenerationArtifact):
+            raise TypeError(f"Argument 'artifact' must be of type GenerationArtifact, not {type(artifact)}.")
+
+        if not isinstance(artifact_id, uuid.UUID):
+            raise TypeError(f"Argument 'artifact_id' must be of type UUID, not {type(artifact_id)}.")
+
+        key = make_lock_key(artifact, artifact_id)
+        ret = True
+        with self._lock:
+            if not self._db:
+                self._db = RelationalDB()
+
+            try:
+                cursor = self._db.connection.cursor()
+                cursor.execute("SELECT pg_try_advisory_lock(%s) AS acquired;", (key,))
+                ret = cursor.fetchone()["acquired"]
+                self._db.connection.commit()
+                if ret:
+                    self._keys.add(key)
+            except Exception as e:
+                print(e)
+
+            if not self._keys:
+                self._close()
+
+        return ret
+
+    def _close(self) -> None:
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    def release(self,
+                artifact: GenerationArtifact,
+                artifact_id: uuid.UUID) -> None:
+        key = make_lock_key(artifact, artifact_id)
+        with self._lock:
+            if key not in self._keys:
+                return
+
+            self._keys.discard(key)
+            try:
+                cursor = self._db.connection.cursor()
+                cursor.execute("SELECT pg_advisory_unlock(%s), pg_notify(%s, '');", (key, notification_channel(key)))
+                self._db.connection.commit()
+            except Exception as e:
+                print(e)
+
+            if not self._keys:
+                self._close()
+
+    def release_all(self) -> None:
+        with self._lock:
+            if self._keys:
+                try:
+                    cursor = self._db.connection.cursor()
+                    cursor.execute("SELECT pg_advisory_unlock_all();")
+                    for key in self._keys:
+                        cursor.execute("SELECT pg_notify(%s, '');", (notification_channel(key),))
+                    self._db.connection.commit()
+                except Exception as e:
+                    print(e)
+
+            # Closing the session releases its advisory locks anyway.
+            self._keys.clear()
+            self._close()
+
+
+####################
+# MODULE FUNCTIONS #
+####################
+
+
+def make_lock_key(artifact: GenerationArtifact,
+                  artifact_id: uuid.UUID) -> int:
+    digest = hashlib.sha256(f"{artifact.value}:{artifact_id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def notification_channel(key: int) -> str:
+    return f"generation_lock_{key & 0xFFFFFFFFFFFFFFFF:016x}"
+
+
+def single_flight(artifact: GenerationArtifact,
+                  artifact_id: uuid.UUID,
+                  fetch: Callable[[], T],
+                  generate: Callable[[], T],
+                  timeout: float = Configuration.GENERATION_LOCK_WAIT_TIMEOUT,
+                  cancellation: util.Cancellation = None) -> T:
+    """
+    Generates an artifact under its lock and returns it. If another request
+    holds the lock, waits for that one to release it and returns what it
+    saved, as read by `fetch`, instead. With a cancellation, stops waiting
+    once it's cancelled.
+    """
+
+    channel = notification_channel(make_lock_key(artifact, artifact_id))
+    signal: util.CrossThreadEvent | None = None
+    deadline = time.monotonic() + timeout
+
+    def notified(payload: str) -> None:
+        signal.set()
+
+    try:
+        while True:
+            lock = GenerationLock()
+            if lock.acquire(artifact, artifact_id):
+                try:
+                    # Whoever held the lock before may have saved it already.
+                    ret = fetch()
+                    if not ret:
+                        ret = generate()
+                finally:
+                    lock.release_all()
+                return ret
+
+            if not signal:
+                signal = util.CrossThreadEvent()
+                notification_listener.subscribe(channel, notified)
+                if cancellation:
+                    cancellation.watch(signal)
+                # The holder may have released it before the subscription.
+                continue
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (cancellation and cancellation.cancelled):
+                return fetch()
+
+            # Notifications can be lost, and a holder that dies releases the lock without one.
+            signal.wait(min(remaining, Configuration.GENERATION_LOCK_POLL_INTERVAL))
+    finally:
+        if signal:
+            notification_listener.unsubscribe(channel, notified)
+            if cancellation:
+                cancellation.unwatch(signal)
+            signal.close()
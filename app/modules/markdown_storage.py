@@ -0,0 +1,146 @@
+"""
+Moves the stored sections, stats and chat messages to the current storage
+mode: Markdown only (MARKDOWN_ONLY_STORAGE), or Markdown along with HTML
+made by the current renderer. See `flask backfill-rendered-html`.
+"""
+
+from app.config import Configuration, DatabaseTable, MarkdownProfile, ProtocolKey
+from app.modules.db import RelationalDB
+from app.modules.rendering import RENDERER_VERSION, render_markdown
+
+
+# The (Markdown, HTML) column pairs of each table, and the profile their HTML is rendered with.
+markdown_storage_columns: dict[str, tuple[MarkdownProfile, list[tuple[str, str]]]] = {
+    DatabaseTable.CHAT_MESSAGE: (
+        MarkdownProfile.CHAT_MESSAGE,
+        [(ProtocolKey.CONTENT_MARKDOWN, ProtocolKey.CONTENT_HTML)]
+    ),
+    DatabaseTable.ENTRY_SECTION: (
+        MarkdownProfile.SECTION,
+        [(ProtocolKey.CONTENT_MARKDOWN, ProtocolKey.CONTENT_HTML)]
+    ),
+    DatabaseTable.ENTRY_STAT: (
+        MarkdownProfile.STAT,
+        [(ProtocolKey.NAME_MARKDOWN, ProtocolKey.NAME_HTML), (ProtocolKey.VALUE_MARKDOWN, ProtocolKey.VALUE_HTML)]
+    )
+}
+
+
+####################
+# MODULE FUNCTIONS #
+####################
+
+
+def backfill(table: str,
+             batch_size: int = 500) -> int:
+    """
+    Updates the table's rows that were saved in another storage mode or by
+    another renderer, a batch per transaction, and returns how many.
+    """
+
+    if table not in markdown_storage_columns:
+        raise ValueError(f"Table '{table}' doesn't store Markdown.")
+
+    profile, columns = markdown_storage_columns[table]
+    ret = 0
+    db = RelationalDB()
+    try:
+        cursor = db.connection.cursor()
+        if Configuration.MARKDOWN_ONLY_STORAGE:
+            while True:
+                cursor.execute(
+                    f"""
+                    UPDATE
+                        {table}
+                    SET
+                        {", ".join(f"{html} = NULL" for _, html in columns)},
+                        {ProtocolKey.RENDERER_VERSION} = %s
+                    WHERE
+                        {ProtocolKey.ID} IN (
+                            SELECT {ProtocolKey.ID} FROM {table}
+                            WHERE
+                                {ProtocolKey.RENDERER_VERSION} IS DISTINCT FROM %s OR
+                                {" OR ".join(f"{html} IS NOT NULL" for _, html in columns)}
+                            LIMIT %s
+                        );
+                    """,
+                    (RENDERER_VERSION, RENDERER_VERSION, batch_size)
+                )
+                db.connection.commit()
+                if not cursor.rowcount:
+                    break
+                ret += cursor.rowcount
+        else:
+            while True:
+                cursor.execute(
+                    f"""
+                    SELECT
+                        {ProtocolKey.ID}, {", ".join(md for md, _ in columns)}
+                    FROM
+                        {table}
+                    WHERE
+                        {ProtocolKey.RENDERER_VERSION} IS DISTINCT FROM %s OR
+                        {" OR ".join(f"({md} IS NOT NULL AND {html} IS NULL)" for md, html in columns)}
+                    LIMIT %s;
+                    """,
+                    (RENDERER_VERSION, batch_size)
+                )
+                results = cursor.fetchall()
+                if not results:
+                    break
+
+                cursor.executemany(
+                    f"""
+                    UPDATE
+                        {table}
+                    SET
+                        {", ".join(f"{html} = %s" for _, html in columns)},
+                        {ProtocolKey.RENDERER_VERSION} = %s
+                    WHERE
+                        {ProtocolKey.ID} = %s;
+                    """,
+                    [
+                        (
+                            *(render_markdown(result[md], profile) if result[md] is not None else None
+                              for md, _ in columns),
+                            RENDERER_VERSION,
+                            result[ProtocolKey.ID]
+                        )
+                        for result in results
+                    ]
+                )
+                db.connection.commit()
+                ret += len(results)
+    except Exception as e:
+        print(e)
+    finally:
+        db.close()
+
+    return ret
+
+
+def migrate_schema() -> None:
+    """
+    Adds the renderer version to databases made before it existed, and lets
+    stats be saved without HTML.
+    """
+
+    db = RelationalDB()
+    try:
+        cursor = db.connection.cursor()
+        for table in markdown_storage_columns:
+            cursor.execute(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {ProtocolKey.RENDERER_VERSION} smallint;"
+            )
+        cursor.execute(
+            f"""
+            ALTER TABLE {DatabaseTable.ENTRY_STAT}
+                ALTER COLUMN {ProtocolKey.NAME_HTML} DROP NOT NULL,
+                ALTER COLUMN {ProtocolKey.VALUE_HTML} DROP NOT NULL;
+            """
+        )
+        db.connection.commit()
+    except Exception as e:
+        print(e)
+    finally:
+        db.close()
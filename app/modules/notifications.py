@@ -0,0 +1,167 @@
+"""
+Postgres notifications, for reaching whatever is waiting for something in
+another worker.
+
+Each process listens on one connection of its own, from a thread of its
+own, and only to the channels that something in the process subscribed
+to. Notifications sent while that connection is being re-established are
+lost, so they should only ever save a poll, not replace the data.
+"""
+
+import os
+import re
+import select
+import threading
+import time
+from typing import Callable
+
+from app.config import Configuration
+from app.modules.db import RelationalDB
+
+
+# Channels are used as SQL identifiers, unquoted.
+_CHANNEL_PATTERN = re.compile(r"^[a-z_][a-z0-9_]{0,62}$")
+
+
+###########
+# CLASSES #
+###########
+
+
+class NotificationListener:
+    """
+    Passes the notifications of a channel to the callbacks subscribed to it,
+    on the listener's thread. The thread starts with the first subscription
+    in each process, so that it starts after uWSGI forks the workers.
+    """
+
+    def __init__(self) -> None:
+        self._callbacks: dict[str, list[Callable[[str], None]]] = {}
+        self._listening: set[str] = set()
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._thread: threading.Thread | None = None
+        self._wake_read: int | None = None
+        self._wake_write: int | None = None
+
+    def _dispatch(self,
+                  channel: str,
+                  payload: str) -> None:
+        with self._lock:
+            callbacks = list(self._callbacks.get(channel, ()))
+
+        for callback in callbacks:
+            try:
+                callback(payload)
+            except Exception as e:
+                print(e)
+
+    def _listen(self,
+                db: RelationalDB) -> None:
+        db.connection.set_session(autocommit=True)
+        cursor = db.connection.cursor()
+        self._listening = set()
+        while True:
+            with self._lock:
+                channels = set(self._callbacks)
+
+            for channel in channels - self._listening:
+                cursor.execute(f"LISTEN {channel};")
+            for channel in self._listening - channels:
+                cursor.execute(f"UNLISTEN {channel};")
+            self._listening = channels
+
+            readable, _, _ = select.select([db.connection, self._wake_read], [], [])
+            if self._wake_read in readable:
+                os.read(self._wake_read, 4096)
+
+            db.connection.poll()
+            while db.connection.notifies:
+                notification = db.connection.notifies.pop(0)
+                self._dispatch(notification.channel, notification.payload)
+
+    def _run(self) -> None:
+        while True:
+            db = RelationalDB()
+            try:
+                if db.connection:
+                    self._listen(db)
+            except Exception as e:
+                print(e)
+            finally:
+                db.close()
+
+            time.sleep(Configuration.NOTIFICATION_RECONNECT_INTERVAL)
+
+    def _wake(self) -> None:
+        if self._wake_write is not None:
+            os.write(self._wake_write, b"\0")
+
+    def subscribe(self,
+                  channel: str,
+                  callback: Callable[[str], None]) -> None:
+        if not isinstance(channel, str):
+            raise TypeError(f"Argument 'channel' must be of type str, not {type(channel)}.")
+
+        if not _CHANNEL_PATTERN.match(channel):
+            raise ValueError(f"Invalid notification channel '{channel}'.")
+
+        if not callable(callback):
+            raise TypeError(f"Argument 'callback' must be callable, not {type(callback)}.")
+
+        with self._lock:
+            self._callbacks.setdefault(channel, []).append(callback)
+            if self._pid != os.getpid():
+                # A thread and pipe inherited through a fork are of no use.
+                self._pid = os.getpid()
+                self._wake_read, self._wake_write = os.pipe()
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._wake()
+
+    def unsubscribe(self,
+                    channel: str,
+                    callback: Callable[[str], None]) -> None:
+        with self._lock:
+            callbacks = self._callbacks.get(channel)
+            if callbacks and callback in callbacks:
+                callbacks.remove(callback)
+                if not callbacks:
+                    del self._callbacks[channel]
+        self._wake()
+
+
+####################
+# MODULE FUNCTIONS #
+####################
+
+
+def notify(channel: str,
+           payload: str) -> bool:
+    """
+    Sends a notification to every process listening on the channel, this
+    one included. Payloads must be shorter than 8000 bytes.
+    """
+
+    if not isinstance(channel, str):
+        raise TypeError(f"Argument 'channel' must be of type str, not {type(channel)}.")
+
+    if not isinstance(payload, str):
+        raise TypeError(f"Argument 'payload' must be of type str, not {type(payload)}.")
+
+    ret = False
+    db = RelationalDB()
+    try:
+        cursor = db.connection.cursor()
+        cursor.execute("SELECT pg_notify(%s, %s);", (channel, payload))
+        db.connection.commit()
+        ret = True
+    except Exception as e:
+        print(e)
+    finally:
+        db.close()
+
+    return ret
+
+
+notification_listener = NotificationListener()
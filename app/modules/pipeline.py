@@ -0,0 +1,210 @@
+import concurrent.futures
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator
+
+
+###########
+# CLASSES #
+###########
+
+
+class PipelineStage:
+    """
+    A unit of work in a pipeline. The stage's function is called with the
+    results of its inputs as keyword arguments, named after the stages (or
+    initial values) they come from.
+    """
+
+    def __init__(self,
+                 name: str,
+                 func: Callable[..., Any],
+                 inputs: Iterable[str] = ()) -> None:
+        if not isinstance(name, str):
+            raise TypeError(f"Argument 'name' must be of type str, not {type(name)}.")
+
+        if not callable(func):
+            raise TypeError(f"Argument 'func' must be callable, not {type(func)}.")
+
+        self.func: Callable[..., Any] = func
+        self.inputs: tuple[str, ...] = tuple(inputs)
+        self.name: str = name
+
+    def __repr__(self) -> str:
+        return f"Pipeline Stage '{self.name}' ({', '.join(self.inputs)})"
+
+
+class Pipeline:
+    """
+    A dependency graph of stages. Every stage starts as soon as all of its
+    inputs are available so independent stages run concurrently.
+    """
+
+    def __init__(self,
+                 stages: list[PipelineStage],
+                 executor: concurrent.futures.Executor) -> None:
+        names = set()
+        for stage in stages:
+            if stage.name in names:
+                raise ValueError(f"Duplicate pipeline stage '{stage.name}'.")
+            names.add(stage.name)
+
+        self.executor: concurrent.futures.Executor = executor
+        self.stages: list[PipelineStage] = stages
+
+    def run(self,
+            **initial: Any) -> "PipelineRun":
+        """
+        Starts a run with the given initial values and returns immediately.
+        """
+
+        run = PipelineRun(self, initial)
+        for stage in self.stages:
+            unknown_inputs = set(stage.inputs) - set(run.futures)
+            if unknown_inputs:
+                raise ValueError(f"Stage '{stage.name}' has unknown inputs: {', '.join(sorted(unknown_inputs))}.")
+
+        for stage in self.stages:
+            run._schedule(stage)
+        return run
+
+
+class PipelineRun:
+    def __init__(self,
+                 pipeline: Pipeline,
+                 initial: dict[str, Any]) -> None:
+        self.futures: dict[str, concurrent.futures.Future] = {}
+        self.pipeline: Pipeline = pipeline
+        self.start_time: float = time.monotonic()
+        """
+        Per-stage (start offset, duration) in seconds, where the offset is
+        relative to the start of the run.
+        """
+        self.timings: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+        for name, value in initial.items():
+            future = concurrent.futures.Future()
+            future.set_result(value)
+            self.futures[name] = future
+
+        for stage in pipeline.stages:
+            self.futures[stage.name] = concurrent.futures.Future()
+
+    def _execute(self,
+                 stage: PipelineStage) -> None:
+        future = self.futures[stage.name]
+        start_time = time.monotonic()
+        try:
+            kwargs = {name: self.futures[name].result() for name in stage.inputs}
+            result = stage.func(**kwargs)
+        except Exception as e:
+            print(f"Pipeline stage '{stage.name}' failed:", e)
+            result = e
+
+        with self._lock:
+            self.timings[stage.name] = (start_time - self.start_time, time.monotonic() - start_time)
+
+        if isinstance(result, Exception):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+    def _schedule(self,
+                  stage: PipelineStage) -> None:
+        pending = set(stage.inputs)
+        if not pending:
+            self._submit(stage)
+            return
+
+        pending_lock = threading.Lock()
+
+        def on_input_done(input_name: str) -> None:
+            with pending_lock:
+                pending.discard(input_name)
+                ready = not pending
+
+            if ready:
+                failed_inputs = [name for name in stage.inputs if self.futures[name].exception()]
+                if failed_inputs:
+                    with self._lock:
+                        self.timings[stage.name] = (time.monotonic() - self.start_time, 0.0)
+                    self.futures[stage.name].set_exception(
+                        RuntimeError(f"Stage '{stage.name}' skipped because of failed inputs: {', '.join(failed_inputs)}.")
+                    )
+                else:
+                    self._submit(stage)
+
+        for input_name in stage.inputs:
+            self.futures[input_name].add_done_callback(lambda _, name=input_name: on_input_done(name))
+
+    def _submit(self,
+                stage: PipelineStage) -> None:
+        try:
+            self.pipeline.executor.submit(self._execute, stage)
+        except RuntimeError as e:
+            # The executor is shutting down; fail the stage rather than leave it pending.
+            self.futures[stage.name].set_exception(e)
+
+    def add_done_callback(self,
+                          func: Callable[["PipelineRun"], None]) -> None:
+        """
+        Calls the given function once every stage of the run has finished.
+        """
+
+        futures = [self.futures[stage.name] for stage in self.pipeline.stages]
+        remaining = [len(futures)]
+        remaining_lock = threading.Lock()
+
+        def on_stage_done(_) -> None:
+            with remaining_lock:
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+
+            if finished:
+                func(self)
+
+        for future in futures:
+            future.add_done_callback(on_stage_done)
+
+    def as_completed(self,
+                     stage_names: Iterable[str],
+                     timeout: float = None) -> Iterator[str]:
+        """
+        Yields the given stage names in the order the stages finish.
+        """
+
+        futures = {self.futures[name]: name for name in stage_names}
+        for future in concurrent.futures.as_completed(futures, timeout=timeout):
+            yield futures[future]
+
+    def done(self) -> bool:
+        return all(self.futures[stage.name].done() for stage in self.pipeline.stages)
+
+    def result(self,
+               stage_name: str,
+               timeout: float = None) -> Any:
+        """
+        Waits for and returns a stage's result, or None if the stage failed.
+        """
+
+        ret = None
+        try:
+            ret = self.futures[stage_name].result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            raise
+        except Exception:
+            pass
+        return ret
+
+    def wait(self,
+             stage_names: Iterable[str] = None,
+             timeout: float = None) -> None:
+        """
+        Waits for the given stages (or all of them) to finish, successfully
+        or not.
+        """
+
+        if stage_names is None:
+            stage_names = [stage.name for stage in self.pipeline.stages]
+        concurrent.futures.wait([self.futures[name] for name in stage_names], timeout=timeout)
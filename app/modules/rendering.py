@@ -0,0 +1,342 @@
+"""
+Markdown rendering with pre-configured, reusable renderers.
+
+Building a `Markdown` instance loads and initializes every one of its
+extensions, which takes longer than converting a typical section. Each
+profile instead keeps one instance per thread and resets it between
+conversions. Greenlets sharing a thread can share its instances too, since
+a conversion never yields to another greenlet.
+
+For the same reason, a long conversion (tables, highlighted code) stalls
+every greenlet of the worker. Long documents are converted in a small
+process pool instead, while the greenlet that asked waits cooperatively.
+"""
+
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import multiprocessing
+import re
+import threading
+from typing import Any
+
+import markdown
+from pymdownx.superfences import highlight_validator
+
+from app.config import Configuration, MarkdownProfile
+from app.modules import util
+
+# Bump this whenever a change to the profiles changes the HTML they produce, so that stored HTML is rendered again.
+RENDERER_VERSION = 1
+
+
+markdown_profile_extensions: dict[MarkdownProfile, list[str]] = {
+    # Answers to questions about entry sections.
+    MarkdownProfile.CHAT: ["footnotes", "pymdownx.superfences", "tables"],
+    # Messages of standalone chats, both ways.
+    MarkdownProfile.CHAT_MESSAGE: ["pymdownx.superfences"],
+    MarkdownProfile.SECTION: ["footnotes", "pymdownx.superfences", "tables"],
+    MarkdownProfile.STAT: ["pymdownx.superfences"],
+    # Questions about entry sections.
+    MarkdownProfile.USER_MESSAGE: ["pymdownx.superfences", "tables"]
+}
+
+
+###########
+# CLASSES #
+###########
+
+
+class HighlightedCodeCache:
+    """
+    The highlighted HTML of fenced code blocks, keyed by language, a hash of
+    the code and the fence's options (highlighted lines, line numbers,
+    title, ...), so that snippets repeated across entries only go through
+    Pygments once. It plugs into superfences as a custom fence for every
+    language. All renderers share one highlight configuration, so that
+    isn't part of the key.
+    """
+
+    def __init__(self,
+                 max_size: int) -> None:
+        self._cache = util.LRUCache(max_size)
+
+    def fence(self) -> dict[str, Any]:
+        return {
+            "name": "*",
+            "class": "highlight",
+            "format": self.format,
+            "validator": highlight_validator
+        }
+
+    def format(self,
+               src: str,
+               language: str,
+               class_name: str,
+               options: dict[str, str],
+               md: markdown.Markdown,
+               **kwargs) -> str:
+        key = (
+            language,
+            hashlib.sha256(src.encode("utf-8")).digest(),
+            tuple(sorted(options.items())),
+            tuple(kwargs.get("classes") or ()),
+            kwargs.get("id_value"),
+            tuple(sorted((kwargs.get("attrs") or {}).items()))
+        )
+        html = self._cache.get(key)
+        if html is None:
+            # Superfences' own formatter, which highlights with Pygments. It consumes some options.
+            html = md.preprocessors["fenced_code_block"].highlight(
+                src=src,
+                language=language,
+                options=dict(options),
+                md=md,
+                **kwargs
+            )
+            self._cache.put(key, html)
+        return html
+
+    def snapshot(self) -> dict[str, Any]:
+        return self._cache.snapshot()
+
+
+class MarkdownRenderer:
+    def __init__(self,
+                 extensions: list[str],
+                 extension_configs: dict[str, dict[str, Any]] = None) -> None:
+        self.extension_configs: dict[str, dict[str, Any]] = extension_configs or {}
+        self.extensions: list[str] = extensions
+        self._local = threading.local()
+
+    def _get_instance(self) -> markdown.Markdown:
+        instance = getattr(self._local, "instance", None)
+        if instance is None:
+            instance = markdown.Markdown(
+                extensions=self.extensions,
+                extension_configs=self.extension_configs
+            )
+            self._local.instance = instance
+        return instance
+
+    def render(self,
+               text: str) -> str:
+        instance = self._get_instance()
+        try:
+            return instance.convert(text)
+        finally:
+            # Footnotes, abbreviations and the like would otherwise carry over to the next document.
+            instance.reset()
+
+
+class IncrementalMarkdownRenderer:
+    """
+    Renders Markdown that arrives in pieces, such as a streamed completion,
+    one block at a time. Each block (a paragraph, heading, list, table,
+    fenced code block, ...) is rendered once, when the text after it shows
+    that it is complete, so rendering a whole stream takes linear time.
+
+    The fragments can be appended to one another as they come. Footnotes
+    and references to link definitions further down only resolve in the
+    full render of `markdown`, which is what gets saved.
+
+    With `render_blocks` off, the fragments are the Markdown of each block
+    instead, for the browser to render.
+    """
+
+    _FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+    _LIST_ITEM = re.compile(r"^ {0,3}([-*+]|\d+[.)])\s")
+
+    def __init__(self,
+                 profile: MarkdownProfile,
+                 render_blocks: bool = True) -> None:
+        self.profile: MarkdownProfile = profile
+        self.render_blocks: bool = render_blocks
+        # Only the block being received is kept as one string, so that adding text doesn't copy the rest.
+        self._blocks: list[str] = []
+        self._pending: str = ""
+        # Where in the pending text the next line to scan starts.
+        self._line_start: int = 0
+        # Whether a blank line followed the block, so that the next line may start another.
+        self._blank: bool = False
+        self._fence: str | None = None
+
+    @property
+    def markdown(self) -> str:
+        return "".join(self._blocks) + self._pending
+
+    def _commit(self,
+                end: int) -> list[str]:
+        block, self._pending = self._pending[:end], self._pending[end:]
+        self._blocks.append(block)
+        self._line_start -= end
+        self._blank = False
+        if not block.strip():
+            return []
+        if not self.render_blocks:
+            return [block]
+        return [render_markdown(block, self.profile)]
+
+    def _continues_block(self,
+                         line: str) -> bool:
+        """
+        Whether a line after a blank one is still part of the block, as in
+        loose lists and multi-paragraph list items or footnotes.
+        """
+
+        if line[:1] in (" ", "\t"):
+            return True
+        first_line = self._pending.lstrip("\n").split("\n", 1)[0]
+        return bool(self._LIST_ITEM.match(first_line) and self._LIST_ITEM.match(line))
+
+    def feed(self,
+             text: str) -> list[str]:
+        """
+        Adds text and returns the fragments of the blocks it completed, if
+        any.
+        """
+
+        fragments = []
+        self._pending += text
+        while True:
+            line_end = self._pending.find("\n", self._line_start)
+            if line_end == -1:
+                break
+
+            line_start, self._line_start = self._line_start, line_end + 1
+            line = self._pending[line_start:line_end]
+            fence = self._FENCE.match(line)
+            if self._fence:
+                if fence and fence.group(1)[0] == self._fence[0] and len(fence.group(1)) >= len(self._fence) and \
+                        not line[fence.end():].strip():
+                    self._fence = None
+                continue
+
+            if not line.strip():
+                if self._pending[:line_start].strip():
+                    self._blank = True
+                continue
+
+            if self._blank and not self._continues_block(line):
+                fragments += self._commit(line_start)
+            self._blank = False
+
+            if fence:
+                self._fence = fence.group(1)
+
+        return fragments
+
+    def close(self) -> list[str]:
+        """
+        Returns the fragment of whatever is left once all the text is in.
+        """
+
+        self._fence = None
+        return self._commit(len(self._pending))
+
+    def render(self) -> str:
+        return render_markdown(self.markdown, self.profile)
+
+
+highlighted_code_cache = HighlightedCodeCache(Configuration.HIGHLIGHTED_CODE_CACHE_SIZE)
+
+_md_extension_configs = {
+    "pymdownx.highlight": {
+        "auto_title": True,
+        "auto_title_map": {
+            "Python Console Session": "Python"
+        }
+    },
+    "pymdownx.superfences": {
+        "custom_fences": [highlighted_code_cache.fence()]
+    }
+}
+
+markdown_renderers: dict[MarkdownProfile, MarkdownRenderer] = {
+    profile: MarkdownRenderer(extensions, _md_extension_configs)
+    for profile, extensions in markdown_profile_extensions.items()
+}
+
+
+# HTML rendered on read, keyed by a hash of the Markdown, the profile and the renderer version.
+rendered_html_cache = util.LRUCache(Configuration.RENDERED_HTML_CACHE_SIZE)
+
+# Made on first use, so that each uWSGI worker forks its own.
+_render_executor: concurrent.futures.ProcessPoolExecutor | None = None
+_render_executor_lock = threading.Lock()
+
+
+####################
+# MODULE FUNCTIONS #
+####################
+
+
+def _get_render_executor() -> concurrent.futures.ProcessPoolExecutor:
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is None:
+            # Forked rather than spawned: under uWSGI, the executable isn't Python.
+            _render_executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=Configuration.MARKDOWN_PROCESS_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("fork")
+            )
+        return _render_executor
+
+
+def _render(text: str,
+            profile: MarkdownProfile) -> str:
+    return markdown_renderers[profile].render(text)
+
+
+def get_html(text: str | None,
+             html: str | None,
+             renderer_version: int | None,
+             profile: MarkdownProfile) -> str | None:
+    """
+    Returns the stored HTML of some Markdown if the current renderer made
+    it, or else the Markdown rendered through the cache.
+    """
+
+    if text is None or (html is not None and renderer_version == RENDERER_VERSION):
+        return html
+    return render_markdown_cached(text, profile)
+
+
+def get_html_to_store(html: str | None) -> str | None:
+    return None if Configuration.MARKDOWN_ONLY_STORAGE else html
+
+
+def render_markdown(text: str,
+                    profile: MarkdownProfile) -> str:
+    """
+    Converts Markdown to HTML with the profile's extensions, the same as
+    `markdown.markdown(text, extensions=..., extension_configs=...)` would.
+    """
+
+    if not isinstance(text, str):
+        raise TypeError(f"Argument 'text' must be of type str, not {type(text)}.")
+
+    if not isinstance(profile, MarkdownProfile):
+        raise TypeError(f"Argument 'profile' must be of type MarkdownProfile, not {type(profile)}.")
+
+    global _render_executor
+    if Configuration.MARKDOWN_PROCESS_POOL_WORKERS and len(text) >= Configuration.MARKDOWN_PROCESS_POOL_THRESHOLD:
+        try:
+            return util.wait_for_future(_get_render_executor().submit(_render, text, profile))
+        except BrokenProcessPool as e:
+            # A worker died; render this one here and start a new pool next time.
+            print(e)
+            with _render_executor_lock:
+                _render_executor = None
+
+    return _render(text, profile)
+
+
+def render_markdown_cached(text: str,
+                           profile: MarkdownProfile) -> str:
+    key = (hashlib.sha256(text.encode("utf-8")).digest(), profile, RENDERER_VERSION)
+    html = rendered_html_cache.get(key)
+    if html is None:
+        html = render_markdown(text, profile)
+        rendered_html_cache.put(key, html)
+    return html
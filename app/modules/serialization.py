@@ -0,0 +1,112 @@
+"""
+JSON serialization for server-sent events and JSON responses.
+
+Everything is encoded with orjson, straight to bytes. UUIDs, enums and
+dataclasses are encoded natively, and objects with an `as_dict()` method,
+such as the models, can be passed as they are. Dates and times are encoded
+as HTTP dates, the way Flask's own JSON provider does, so that responses
+don't change.
+"""
+
+from datetime import date
+import decimal
+from typing import Any
+
+from flask import Response
+from flask.json.provider import JSONProvider
+import orjson
+from werkzeug.http import http_date
+
+
+# Keys can be str enums, e.g. LLM tasks in metrics.
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+# Browsers only dispatch events that have data.
+SSE_CLOSE = b"event: close\ndata: \n\n"
+
+
+###########
+# CLASSES #
+###########
+
+
+class ORJSONProvider(JSONProvider):
+    """
+    Flask's JSON provider, for `jsonify`, `make_response` of a dict or list,
+    and `request.get_json`.
+    """
+
+    def dumps(self,
+              obj: Any,
+              **kwargs) -> str:
+        return dumps(obj).decode("utf-8")
+
+    def loads(self,
+              s: str | bytes,
+              **kwargs) -> Any:
+        return orjson.loads(s)
+
+    def response(self,
+                 *args,
+                 **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype="application/json")
+
+
+class SSEFragmentEncoder:
+    """
+    Encodes a run of events that only differ in the value of one key, such
+    as the fragments of a section being generated, by encoding everything
+    else once.
+    """
+
+    def __init__(self,
+                 fields: dict[str, Any],
+                 key: str) -> None:
+        if not isinstance(fields, dict):
+            raise TypeError(f"Argument 'fields' must be of type dict, not {type(fields)}.")
+
+        if not isinstance(key, str):
+            raise TypeError(f"Argument 'key' must be of type str, not {type(key)}.")
+
+        fields = {k: v for k, v in fields.items() if k != key}
+        # The encoded fields without their closing brace, ready for one more key.
+        head = dumps(fields)[:-1] + (b"," if fields else b"")
+        self._prefix: bytes = b"data: " + head + dumps(key) + b":"
+
+    def encode(self,
+               value: Any) -> bytes:
+        return self._prefix + dumps(value) + b"}\n\n"
+
+
+####################
+# MODULE FUNCTIONS #
+####################
+
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, "as_dict"):
+        return obj.as_dict()
+
+    if isinstance(obj, date):
+        return http_date(obj)
+
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable.")
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+
+def sse_event(obj: Any) -> bytes:
+    """
+    A server-sent event whose data is the object as JSON.
+    """
+
+    return b"data: " + dumps(obj) + b"\n\n"
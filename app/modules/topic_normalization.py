@@ -0,0 +1,182 @@
+from datetime import datetime
+from typing import Type, TypeVar
+
+from app.config import Configuration, DatabaseTable, ProtocolKey
+from app.llm import gpt
+from app.modules import util
+from app.modules.db import RelationalDB
+
+
+###########
+# CLASSES #
+###########
+
+
+T = TypeVar("T", bound="TopicNormalization")
+
+
+class TopicNormalization:
+    """
+    A persisted mapping of normalized user input to the entry title the LLM
+    produced for it. An empty topic records input that the LLM rejected.
+    """
+
+    def __init__(self,
+                 data: dict = {}) -> None:
+        self.creation_timestamp: datetime = None
+        self.key: str = None
+        self.topic: str = None
+
+        if data:
+            if ProtocolKey.CREATION_TIMESTAMP in data:
+                self.creation_timestamp: datetime = data[ProtocolKey.CREATION_TIMESTAMP]
+
+            if ProtocolKey.KEY in data:
+                self.key: str = data[ProtocolKey.KEY]
+
+            if ProtocolKey.TOPIC in data:
+                self.topic: str = data[ProtocolKey.TOPIC]
+
+    def __eq__(self,
+               __o: object) -> bool:
+        ret = False
+        if isinstance(__o, type(self)) and \
+                self.key == __o.key:
+            ret = True
+        return ret
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __repr__(self) -> str:
+        ret = ""
+        if self.key:
+            ret += f"Topic Normalization '{self.key}' → '{self.topic}'"
+        return ret
+
+    @classmethod
+    def create(cls: Type,
+               key: str = None,
+               topic: str = None) -> T:
+        """
+        Call this method to create (or overwrite) a Topic Normalization object.
+        """
+
+        if not isinstance(key, str):
+            raise TypeError(f"Argument 'key' must be of type str, not {type(key)}.")
+
+        if not key:
+            raise ValueError("Argument 'key' must be a non-empty string.")
+
+        if not isinstance(topic, str):
+            raise TypeError(f"Argument 'topic' must be of type str, not {type(topic)}.")
+
+        ret: Type = None
+        db = RelationalDB()
+        try:
+            cursor = db.connection.cursor()
+            cursor.execute(
+                f"""
+                INSERT INTO
+                    {DatabaseTable.TOPIC_NORMALIZATION}
+                    ({ProtocolKey.KEY}, {ProtocolKey.TOPIC})
+                VALUES
+                    (%s, %s)
+                ON CONFLICT ({ProtocolKey.KEY}) DO UPDATE SET
+                    {ProtocolKey.TOPIC} = EXCLUDED.{ProtocolKey.TOPIC}
+                RETURNING *;
+                """,
+                (key, topic)
+            )
+            result = cursor.fetchone()
+            db.connection.commit()
+            if result:
+                ret = cls(result)
+        except Exception as e:
+            print(e)
+        finally:
+            db.close()
+
+        return ret
+
+    @classmethod
+    def get_by_key(cls: Type,
+                   key: str) -> T | None:
+        if not isinstance(key, str):
+            raise TypeError(f"Argument 'key' must be of type str, not {type(key)}.")
+
+        ret: Type = None
+        db = RelationalDB()
+        try:
+            cursor = db.connection.cursor()
+            cursor.execute(
+                f"""
+                SELECT
+                    *
+                FROM
+                    {DatabaseTable.TOPIC_NORMALIZATION}
+                WHERE
+                    {ProtocolKey.KEY} = %s;
+                """,
+                (key,)
+            )
+            result = cursor.fetchone()
+            db.connection.commit()
+            if result:
+                ret = cls(result)
+        except Exception as e:
+            print(e)
+        finally:
+            db.close()
+
+        return ret
+
+
+# Hot normalizations are served from RAM; the table backs it across restarts and workers.
+topic_cache = util.LRUCache(Configuration.TOPIC_NORMALIZATION_CACHE_SIZE)
+
+
+####################
+# MODULE FUNCTIONS #
+####################
+
+
+def get_entry_topic(user_topic: str) -> str | None:
+    """
+    Returns the entry title for the given user input, asking the LLM only
+    on a cache miss. Like `gpt.get_entry_topic`, an empty string means the
+    input was rejected and None means the LLM could not be reached, which
+    is never cached.
+    """
+
+    key = make_key(user_topic)
+    if not key:
+        return ""
+
+    topic: str | None = topic_cache.get(key)
+    if topic is None:
+        normalization: TopicNormalization = TopicNormalization.get_by_key(key)
+        if normalization:
+            topic = normalization.topic
+        else:
+            topic = gpt.get_entry_topic(user_topic)
+            if topic is not None:
+                topic = util.unquote(topic)  # Sometimes the LLM returns the topic enclosed in quotes.
+                TopicNormalization.create(key=key, topic=topic)
+
+        if topic is not None:
+            topic_cache.put(key, topic)
+
+    return topic
+
+
+def make_key(user_topic: str) -> str:
+    """
+    Case-folds the input and collapses runs of whitespace so that trivially
+    different spellings of the same input share a cache entry.
+    """
+
+    if not isinstance(user_topic, str):
+        raise TypeError(f"Argument 'user_topic' must be of type str, not {type(user_topic)}.")
+
+    return " ".join(user_topic.casefold().split())
@@ -1,16 +1,182 @@
+from collections import OrderedDict
+import concurrent.futures
 from flask import request
+import gevent
+from gevent.event import AsyncResult, Event
 from geoip import open_database
 import hashlib
 import ipaddress
+import math
 import os
 import re
 import secrets
 import string
 import sys
+import threading
+from typing import Any, Hashable, TypeVar
 
 from app.config import Configuration
 
 
+E = TypeVar("E", bound="CrossThreadEvent")
+
+
+class Cancellation:
+    """
+    Calls off work done on other threads for whoever is now gone. The
+    events that the work waits on are set when it's cancelled, so that it
+    finds out at once.
+    """
+
+    def __init__(self) -> None:
+        self._cancelled: bool = False
+        self._events: set[E] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            events = list(self._events)
+
+        for event in events:
+            event.set()
+
+    def unwatch(self,
+                event: E) -> None:
+        with self._lock:
+            self._events.discard(event)
+
+    def watch(self,
+              event: E) -> None:
+        with self._lock:
+            self._events.add(event)
+            cancelled = self._cancelled
+
+        if cancelled:
+            event.set()
+
+
+class CrossThreadEvent:
+    """
+    An event that any thread can set. The greenlet that made it waits for it
+    without blocking the hub; outside of gevent, it's a plain
+    `threading.Event`.
+    """
+
+    def __init__(self) -> None:
+        self._closed: bool = False
+        self._lock = threading.Lock()
+        self._watcher = None
+
+        if isinstance(gevent.getcurrent(), gevent.Greenlet):
+            self._event = Event()
+            # An async watcher is how another thread can wake the hub.
+            self._watcher = gevent.get_hub().loop.async_()
+            self._watcher.start(self._event.set)
+        else:
+            self._event = threading.Event()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            if self._watcher:
+                self._watcher.close()
+
+    def set(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+
+            if self._watcher:
+                self._watcher.send()
+            else:
+                self._event.set()
+
+    def wait(self,
+             timeout: float = None) -> bool:
+        """
+        Waits for the event to be set and clears it. Returns whether it was
+        set before the timeout.
+        """
+
+        ret = self._event.wait(timeout)
+        self._event.clear()
+        return bool(ret)
+
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded least-recently-used cache.
+    """
+
+    def __init__(self,
+                 max_size: int) -> None:
+        if not isinstance(max_size, int):
+            raise TypeError(f"Argument 'max_size' must be of type int, not {type(max_size)}.")
+
+        if max_size <= 0:
+            raise ValueError("Argument 'max_size' must be a positive, non-zero integer.")
+
+        self.hits: int = 0
+        self.max_size: int = max_size
+        self.misses: int = 0
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self,
+                     key: Hashable) -> bool:
+        with self._lock:
+            return key in self._items
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def get(self,
+            key: Hashable,
+            default: Any = None) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return default
+
+    def hit_ratio(self) -> float:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return self.hits / lookups if lookups else 0.0
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "hits": self.hits,
+                "max_size": self.max_size,
+                "misses": self.misses,
+                "size": len(self._items)
+            }
+
+    def put(self,
+            key: Hashable,
+            value: Any) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
 def determine_location(ip_address: str | ipaddress.IPv4Address) -> str:
     if not isinstance(ip_address, str) and not isinstance(ip_address, ipaddress.IPv4Address):
         raise TypeError(f"Argument 'ip_address' must be of type str or ip_address, not {type(ip_address)}")
@@ -133,6 +299,43 @@ def generate_salt() -> str:
     return hashlib.sha256(rand).hexdigest()
 
 
+def percentile(values: list[float],
+               p: float) -> float:
+    """
+    Returns the p-th percentile (0–100) of the values using the
+    nearest-rank method, or 0 if there are none.
+    """
+
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def wait_for_future(future: concurrent.futures.Future) -> Any:
+    """
+    Returns the future's result. From a greenlet, only that greenlet waits
+    for it, and the hub goes on serving the others.
+    """
+
+    if not isinstance(gevent.getcurrent(), gevent.Greenlet):
+        return future.result()
+
+    done = AsyncResult()
+    # An async watcher is how another thread can wake the hub, and it keeps the loop alive meanwhile.
+    watcher = gevent.get_hub().loop.async_()
+    watcher.start(done.set)
+    try:
+        # Done callbacks run on whichever thread finished the future.
+        future.add_done_callback(lambda _: watcher.send())
+        done.get()
+    finally:
+        watcher.close()
+    return future.result()
+
+
 def unquote(s: str):
     if isinstance(s, str):
         if s.startswith(("'", '"')) and s.endswith(("'", '"')):
@@ -101,6 +101,15 @@ def health_check() -> Response:
     return Response("OK", 200)
 
 
+@app.route("/actuator/metrics", methods=["GET"])
+def metrics() -> Response:
+    """
+    Metrics endpoint, for operators only.
+    """
+
+    return web.get_metrics()
+
+
 @app.route("/e/<entry_id>", methods=["GET"])
 def web_entry(entry_id: str) -> Response:
     return web.entry_page(entry_id)
@@ -147,6 +156,21 @@ def web_entry_make_chat_completion(entry_id: str) -> Response:
     return web.make_chat_completion(entry_id)
 
 
+@app.route("/e/<entry_id>/events", methods=["GET"])
+def web_entry_get_events(entry_id: str) -> Response:
+    return web.get_entry_events(entry_id)
+
+
+@app.route("/e/<entry_id>/events/<channel_id>/commands", methods=["POST"])
+def web_entry_send_channel_command(entry_id: str, channel_id: str) -> Response:
+    return web.send_entry_channel_command(entry_id, channel_id)
+
+
+@app.route("/e/<entry_id>/header/get", methods=["GET"])
+def web_entry_get_header(entry_id: str) -> Response:
+    return web.get_entry_header(entry_id)
+
+
 @app.route("/e/<entry_id>/image/get-cover", methods=["GET"])
 def web_entry_get_cover_image(entry_id: str) -> Response:
     return web.get_entry_cover_image(entry_id)
@@ -12,21 +12,44 @@ let content = null;
 let coverImage = null;
 let coverImageProgressIndicator = null;
 let coverImageSourceLabel = null;
+let didFinishCoverImage = false;
+let didFinishSections = false;
 let didGetCoverImage = false;
+let didGetFunFacts = false;
 let didSubmitChat = false;
 let didSubmitNewEntry = false;
+// The entry's one event stream (see openEntryChannel), and the ID that commands are sent to once it's ready.
+let entryChannel = null;
+let entryChannelCommands = Array(); // Waiting for the stream to be ready.
+let entryChannelID = null;
+let entryChannelLastEventID = null;
+let entryChannelReconnects = 0;
+let entryChannelSources = Array();
 let entryProgressIndicator;
 let isLoadingSection = false;
 let isNew = null;
+let loadingSectionID = null;
 let lookUpButton = null;
 let newEntryForm = null;
 let progressOverlay = null;
+let relatedTopicEvents = Array(); // Until it's known whether the entry is new.
 let relatedTopics = null;
 let relatedTopicsContainer = null;
+// Opening an entry with ?render=client has streamed sections arrive as Markdown, rendered here.
+const renderMode = new URLSearchParams(window.location.search).get("render") === "client" ? "client" : "server";
 let resetChat = 0;
 let selectedText = null;
 let selectionPopup = null;
 let shouldDisplaySelectionPopup = false;
+let stats = null;
+// The sections of a new entry, for its ToC.
+let streamedSections = Array();
+// Sections whose fragments are arriving, and which are started over if their stream is resumed.
+let streamingSectionIDs = new Set();
+
+// The entry's event stream is resumed this many times in a row (with the ID of the last event it got) before giving up.
+const maxStreamReconnects = 5;
+let summary = null;
 let toc = null;
 
 const Enum = (arr) => Object.freeze(arr.reduce((acc, key, i) => ({ ...acc, [key]: i }), {}));
@@ -56,9 +79,8 @@ function activatePage(index) {
         tocItems[index].classList.add("active");
     }
 
-    if (pages.length == 0) {
-        getSections();
-    } else if (index < pages.length) {
+    // A new entry's pages are on their way (see setUpPage).
+    if (index < pages.length) {
         const page = pages[index];
         const firstSection = page.querySelector("section");
         const firstSectionContent = firstSection.querySelector(".sectionContent");
@@ -125,6 +147,10 @@ function dismissSelectionPopup() {
     selectionPopup.classList.add("hidden");
 }
 
+function entryHasHeader() {
+    return (summary.innerHTML.trim() != "");
+}
+
 function entryHasRelatedTopics() {
     return (relatedTopics.innerHTML.trim() != "");
 }
@@ -200,325 +226,506 @@ function getChatCompletion() {
     }
 }
 
-async function getCoverImage() {
-    const entryID = document.querySelector("article").getAttribute("id");
-    const eventSource = new EventSource(`/e/${entryID}/image/get-cover`);
+function finishCoverImage() {
+    didFinishCoverImage = true;
+    coverImageProgressIndicator.classList.add("hidden");
 
-    coverImage.classList.remove("hidden");
+    if (!didGetCoverImage) { // Failed to get image.
+        coverImage.classList.add("hidden");
+    }
+}
 
-    eventSource.onmessage = function (event) {
-        if (event.data === "event: close") {
-            coverImageProgressIndicator.classList.add("hidden");
+function handleCoverImageEvent(jsonObject) {
+    if (!jsonObject.hasOwnProperty("error")) {
+        if (jsonObject.url != null) {
+            const imageSource = jsonObject.source;
+            const imageURL = jsonObject.url;
 
-            if (!didGetCoverImage) { // Failed to get image.
-                coverImage.classList.add("hidden");
-            }
+            coverImage.href = imageURL;
+            coverImage.style.backgroundImage = `url('${imageURL}')`;
 
-            eventSource.close();
-        } else {
-            const jsonObject = JSON.parse(event.data);
+            if (imageSource != null) {
+                coverImageSourceLabel.innerHTML = `Source: ${imageSource}`;
+                coverImageSourceLabel.classList.remove("hidden");
+            } else {
+                coverImageSourceLabel.classList.add("hidden");
+            }
 
-            if (!jsonObject.hasOwnProperty("error")) {
-                if (jsonObject.url != null) {
-                    const imageSource = jsonObject.source;
-                    const imageURL = jsonObject.url;
+            coverImageProgressIndicator.classList.add("hidden");
 
-                    coverImage.href = imageURL;
-                    coverImage.style.backgroundImage = `url('${imageURL}')`;
+            didGetCoverImage = true;
+        }
+    }
+}
 
-                    if (imageSource != null) {
-                        coverImageSourceLabel.innerHTML = `Source: ${imageSource}`;
-                        coverImageSourceLabel.classList.remove("hidden");
-                    } else {
-                        coverImageSourceLabel.classList.add("hidden");
-                    }
+function handleHeaderEvent(jsonObject) {
+    if (!jsonObject.hasOwnProperty("error")) {
+        if (jsonObject.hasOwnProperty("summary")) {
+            summary.textContent = jsonObject.summary;
+        }
 
-                    coverImageProgressIndicator.classList.add("hidden");
+        // A resumed stream sends them again.
+        if (jsonObject.hasOwnProperty("fun_facts") && !didGetFunFacts) {
+            facts.push(...jsonObject.fun_facts);
+            insertFunFacts();
 
-                    didGetCoverImage = true;
-                }
-            }
+            didGetFunFacts = true;
         }
-    };
 
-    eventSource.onerror = function (error) {
-        coverImageProgressIndicator.classList.add("hidden");
+        if (jsonObject.hasOwnProperty("stats")) {
+            stats.innerHTML = "";
 
-        if (!didGetCoverImage) { // Failed to get image.
-            coverImage.classList.add("hidden");
+            for (let stat of jsonObject.stats) {
+                const statName = document.createElement("dt");
+                statName.innerHTML = stat.name_html;
+                stats.appendChild(statName);
+
+                const statValue = document.createElement("dd");
+                statValue.innerHTML = stat.value_html;
+                stats.appendChild(statValue);
+            }
         }
+    } else {
+        console.error(jsonObject.error.error_message);
+    }
+}
 
-        console.error("EventSource failed:", error);
-        eventSource.close();
-    };
+function handleRelatedTopicEvent(jsonObject) {
+    if (!jsonObject.hasOwnProperty("error")) {
+        if (isNew == null && !didFinishSections) {
+            relatedTopicEvents.push(jsonObject);
+        } else {
+            insertRelatedTopic(jsonObject);
+        }
+    } else {
+        const error = jsonObject.hasOwnProperty("error");
+        console.error(error.error_message);
+    }
 }
 
-async function getRelatedTopics() {
-    const entryID = document.querySelector("article").getAttribute("id");
-    const eventSource = new EventSource(`/e/${entryID}/get-related-topics`);
+function insertRelatedTopic(jsonObject) {
+    if (document.getElementById(jsonObject.id) != null) { // A resumed stream sends them again.
+        return;
+    }
 
-    eventSource.onmessage = function (event) {
-        if (event.data === "event: close") {
-            accuracyNotice.classList.remove("hidden");
-            entryProgressIndicator.classList.add("hidden");
-            eventSource.close();
-        } else {
-            const jsonObject = JSON.parse(event.data);
+    const queryString = `topic=${encodeURIComponent(jsonObject.topic)}`;
+    const url = `/e/new?${queryString}`;
 
-            if (!jsonObject.hasOwnProperty("error")) {
-                const queryString = `topic=${encodeURIComponent(jsonObject.topic)}`;
-                const url = `/e/new?${queryString}`;
+    const topicContainer = document.createElement("li");
 
-                relatedTopicsContainer.classList.remove("hidden");
+    const topic = document.createElement("a");
+    topic.className = "topic";
+    topic.href = url;
+    topic.id = jsonObject.id;
+    topic.innerHTML = jsonObject.topic;
+    topicContainer.appendChild(topic);
 
-                const topicContainer = document.createElement("li");
+    topic.addEventListener("click", function (e) {
+        e.preventDefault();
+        handleRelatedTopicLinkClick(this);
+    });
 
-                const topic = document.createElement("a");
-                topic.className = "topic";
-                topic.href = url;
-                topic.id = jsonObject.id;
-                topic.innerHTML = jsonObject.topic;
-                topicContainer.appendChild(topic);
+    relatedTopics.appendChild(topicContainer);
 
-                topic.addEventListener("click", function (e) {
-                    e.preventDefault();
-                    handleRelatedTopicLinkClick(this);
-                });
+    if (didFinishSections) {
+        relatedTopicsContainer.classList.remove("hidden");
+    }
+}
 
-                relatedTopics.appendChild(topicContainer);
-            } else {
-                const error = jsonObject.hasOwnProperty("error");
-                console.error(error.error_message);
-            }
-        }
-    };
+function insertRelatedTopicEvents() {
+    relatedTopicEvents.forEach(jsonObject => insertRelatedTopic(jsonObject));
+    relatedTopicEvents = Array();
+}
 
-    eventSource.onerror = function (error) {
-        accuracyNotice.classList.remove("hidden");
-        entryProgressIndicator.classList.add("hidden");
+function finishSection() {
+    insertFunFacts();
 
-        console.error("EventSource failed:", error);
-        eventSource.close();
-    };
+    accuracyNotice.classList.remove("hidden");
+    entryProgressIndicator.classList.add("hidden");
+    toc.classList.remove("loading");
+
+    if (entryHasRelatedTopics()) {
+        relatedTopicsContainer.classList.remove("hidden");
+    }
+
+    isLoadingSection = false;
+    loadingSectionID = null;
 }
 
 function getSection(sectionID) {
     if (!isLoadingSection) {
         isLoadingSection = true;
+        loadingSectionID = sectionID;
         toc.classList.add("loading");
 
-        const entryID = document.querySelector("article").getAttribute("id");
-        const eventSource = new EventSource(`/e/${entryID}/section/${sectionID}/make`);
-        const pages = document.querySelectorAll("article .content .page");
+        sendEntryChannelCommand({command: "make_section", section_id: sectionID});
+    }
+}
 
-        eventSource.onmessage = function (event) {
-            if (event.data === "event: close") {
-                insertFunFacts();
+function handleSectionEvent(jsonObject) {
+    if (!jsonObject.hasOwnProperty("error")) {
+        trackStreamedSection(jsonObject);
 
-                accuracyNotice.classList.remove("hidden");
-                entryProgressIndicator.classList.add("hidden");
-                toc.classList.remove("loading");
+        if (updateStreamedSection(jsonObject)) {
+            return;
+        }
 
-                if (entryHasRelatedTopics()) {
-                    relatedTopicsContainer.classList.remove("hidden");
-                }
+        const isSubsection = (jsonObject.parent_id != null);
+        let page;
 
-                isLoadingSection = false;
-                eventSource.close();
-            } else {
-                const jsonObject = JSON.parse(event.data);
+        if (!isSubsection) {
+            const pages = document.querySelectorAll("article .content .page");
+            page = pages[jsonObject.index];
+            page.innerHTML = "";
+            page.classList.remove("hidden"); // Unhide to allow the user to see content as it loads.
+        } else {
+            parent = document.getElementById(jsonObject.parent_id);
+            page = parent.closest(".page");
+        }
 
-                if (!jsonObject.hasOwnProperty("error")) {
-                    const isSubsection = (jsonObject.parent_id != null);
-                    let page;
+        const section = document.createElement("section");
+        section.id = jsonObject.id;
+        section.setAttribute("data-section-id", `s-${jsonObject.id}`);
 
-                    if (!isSubsection) {
-                        page = pages[jsonObject.index];
-                        page.innerHTML = "";
-                        page.classList.remove("hidden"); // Unhide to allow the user to see content as it loads.
-                    } else {
-                        parent = document.getElementById(jsonObject.parent_id);
-                        page = parent.closest(".page");
-                    }
+        if (isSubsection) {
+            section.className = "sub";
+        } else {
+            section.className = "super";
+        }
 
-                    const section = document.createElement("section");
-                    section.id = jsonObject.id;
-                    section.setAttribute("data-section-id", `s-${jsonObject.id}`);
+        const sectionTitle = document.createElement("h2");
+        sectionTitle.className = "sectionTitle";
+        sectionTitle.innerHTML = jsonObject.title;
+        section.appendChild(sectionTitle);
 
-                    if (isSubsection) {
-                        section.className = "sub";
-                    } else {
-                        section.className = "super";
-                    }
+        const sectionContent = document.createElement("div");
+        sectionContent.className = "sectionContent";
+        sectionContent.innerHTML = sectionFragmentHTML(jsonObject) ?? sectionContentHTML(jsonObject) ?? "";
+        section.appendChild(sectionContent);
+        page.appendChild(section);
+    } else {
+        const error = jsonObject.hasOwnProperty("error");
+        console.error(error.error_message);
+    }
+}
 
-                    const sectionTitle = document.createElement("h2");
-                    sectionTitle.className = "sectionTitle";
-                    sectionTitle.innerHTML = jsonObject.title;
-                    section.appendChild(sectionTitle);
+// The HTML of a section's content, or of a fragment of it, from the server or rendered from its Markdown.
+function sectionContentHTML(jsonObject) {
+    if (jsonObject.content_html != null) {
+        return jsonObject.content_html;
+    } else if (jsonObject.content_md != null) {
+        return marked.parse(jsonObject.content_md);
+    }
 
-                    const sectionContent = document.createElement("div");
-                    sectionContent.className = "sectionContent";
-                    sectionContent.innerHTML = jsonObject.content_html;
-                    section.appendChild(sectionContent);
-                    page.appendChild(section);
-                } else {
-                    const error = jsonObject.hasOwnProperty("error");
-                    console.error(error.error_message);
-                }
-            }
-        };
+    return null;
+}
 
-        eventSource.onerror = function (error) {
-            insertFunFacts();
+function sectionFragmentHTML(jsonObject) {
+    if (jsonObject.fragment_html != null) {
+        return jsonObject.fragment_html;
+    } else if (jsonObject.fragment_md != null) {
+        return marked.parse(jsonObject.fragment_md);
+    }
 
-            accuracyNotice.classList.remove("hidden");
-            entryProgressIndicator.classList.add("hidden");
-            toc.classList.remove("loading");
+    return null;
+}
 
-            if (entryHasRelatedTopics()) {
-                relatedTopicsContainer.classList.remove("hidden");
-            }
+function trackStreamedSection(jsonObject) {
+    if (jsonObject.fragment_html != null || jsonObject.fragment_md != null) {
+        streamingSectionIDs.add(jsonObject.id);
+    } else {
+        streamingSectionIDs.delete(jsonObject.id);
+    }
+}
+
+// A section cut off mid-stream is generated again from the start when the stream is resumed.
+function restartStreamedSections() {
+    streamingSectionIDs.forEach(id => {
+        const section = document.querySelector(`section[data-section-id="s-${id}"]`);
+        if (section != null) {
+            section.querySelector(".sectionContent").innerHTML = "";
+        }
+    });
+    streamingSectionIDs.clear();
+}
 
-            isLoadingSection = false;
-            console.error("EventSource failed:", error);
-            eventSource.close();
-        };
+// A section being generated arrives in fragments of HTML to append, then whole.
+// Returns whether the section was already on the page and has been updated.
+function updateStreamedSection(jsonObject) {
+    const section = document.querySelector(`section[data-section-id="s-${jsonObject.id}"]`);
+    if (section == null) {
+        return false;
     }
+
+    const sectionContent = section.querySelector(".sectionContent");
+    const fragmentHTML = sectionFragmentHTML(jsonObject);
+    const contentHTML = sectionContentHTML(jsonObject);
+    if (jsonObject.reset) { // Its generation started over.
+        sectionContent.innerHTML = "";
+    }
+
+    if (fragmentHTML != null) {
+        sectionContent.insertAdjacentHTML("beforeend", fragmentHTML);
+    } else if (contentHTML != null) {
+        sectionContent.innerHTML = contentHTML;
+    }
+
+    return true;
 }
 
-function getSections() {
-    const entryID = document.querySelector("article").getAttribute("id");
-    const eventSource = new EventSource(`/e/${entryID}/section/make`);
-    let sections = Array();
-
-    eventSource.onmessage = function (event) {
-        if (event.data === "event: close") {
-            if (isNew) {
-                makeTOC(sections);
-                getRelatedTopics();
-            } else {
-                accuracyNotice.classList.remove("hidden");
-                entryProgressIndicator.classList.add("hidden");
+function closeEntryChannel() {
+    if (entryChannel != null) {
+        entryChannel.close();
+        entryChannel = null;
+    }
 
-                if (entryHasRelatedTopics()) {
-                    relatedTopicsContainer.classList.remove("hidden");
-                }
-            }
+    entryChannelCommands = Array();
+    entryChannelID = null;
+}
 
-            insertFunFacts();
-            eventSource.close();
-        } else {
-            const jsonObject = JSON.parse(event.data);
+function finishSections() {
+    if (didFinishSections) { // A resumed stream is done again.
+        return;
+    }
 
-            if (!jsonObject.hasOwnProperty("error")) {
-                if (isNew == null) {
-                    content.innerHTML = ""; // Fresh entry.
-                    toc.innerHTML = "";
-                    accuracyNotice.classList.add("hidden");
-                    relatedTopicsContainer.classList.add("hidden");
-                    entryProgressIndicator.classList.remove("hidden");
+    didFinishSections = true;
 
-                    getCoverImage();
+    if (isNew) {
+        makeTOC(streamedSections);
+    }
 
-                    isNew = true;
-                }
-            } else {
-                accuracyNotice.classList.remove("hidden");
-                entryProgressIndicator.classList.add("hidden");
+    accuracyNotice.classList.remove("hidden");
+    entryProgressIndicator.classList.add("hidden");
 
-                isNew = false;
+    insertRelatedTopicEvents();
+    if (entryHasRelatedTopics()) {
+        relatedTopicsContainer.classList.remove("hidden");
+    }
 
-                if (entryHasRelatedTopics()) {
-                    const relatedTopics = document.querySelectorAll("#relatedTopics .topic");
-                    relatedTopics.forEach(topic => {
-                        topic.addEventListener("click", function (e) {
-                            e.preventDefault();
-                            handleRelatedTopicLinkClick(this);
-                        });
-                    });
+    insertFunFacts();
+}
 
-                    relatedTopicsContainer.classList.remove("hidden");
-                }
+function handleDoneEvent(jsonObject) {
+    if (jsonObject.stream === "sections") {
+        finishSections();
+    } else if (jsonObject.stream === "cover_image") {
+        finishCoverImage();
+    } else if (jsonObject.stream === loadingSectionID) {
+        finishSection();
+    }
+}
+
+function handleSectionsEvent(jsonObject) {
+    if (!jsonObject.hasOwnProperty("error")) {
+        if (isNew == null) {
+            content.innerHTML = ""; // Fresh entry.
+            relatedTopics.innerHTML = "";
+            toc.innerHTML = "";
+            accuracyNotice.classList.add("hidden");
+            relatedTopicsContainer.classList.add("hidden");
+            entryProgressIndicator.classList.remove("hidden");
+
+            if (!didFinishCoverImage || didGetCoverImage) {
+                coverImage.classList.remove("hidden");
             }
 
-            if (isNew) {
-                const isSubsection = (jsonObject.parent_id != null);
-                let page;
+            isNew = true;
+            insertRelatedTopicEvents();
+        }
+    } else {
+        accuracyNotice.classList.remove("hidden");
+        entryProgressIndicator.classList.add("hidden");
 
-                if (!isSubsection) {
-                    page = document.createElement("div");
-                    page.className = "page";
-                    content.appendChild(page);
+        isNew = false;
 
-                    if (sections.length > 0) {
-                        page.classList.add("hidden");
-                    }
+        if (entryHasRelatedTopics()) {
+            const relatedTopics = document.querySelectorAll("#relatedTopics .topic");
+            relatedTopics.forEach(topic => {
+                topic.addEventListener("click", function (e) {
+                    e.preventDefault();
+                    handleRelatedTopicLinkClick(this);
+                });
+            });
 
-                    sections.push(jsonObject);
-                } else {
-                    for (let section of sections) {
-                        if (section.id == jsonObject.parent_id) {
-                            if (section.subsections != null) {
-                                section.subsections.push(jsonObject);
-                            } else {
-                                section.subsections = [jsonObject];
-                            }
-
-                            break;
-                        }
-                    }
+            relatedTopicsContainer.classList.remove("hidden");
+        }
 
-                    parent = document.getElementById(jsonObject.parent_id);
-                    page = parent.closest(".page");
-                }
+        insertRelatedTopicEvents();
+    }
 
-                const section = document.createElement("section");
-                section.id = jsonObject.id;
-                section.setAttribute("data-section-id", `s-${jsonObject.id}`);
-                page.appendChild(section);
+    if (isNew) {
+        trackStreamedSection(jsonObject);
 
-                if (isSubsection) {
-                    section.className = "sub";
-                } else {
-                    section.className = "super";
-                }
+        if (updateStreamedSection(jsonObject)) {
+            return;
+        }
+
+        const isSubsection = (jsonObject.parent_id != null);
+        let page;
+
+        if (!isSubsection) {
+            page = document.createElement("div");
+            page.className = "page";
+            content.appendChild(page);
 
-                const sectionTitle = document.createElement("h2");
-                sectionTitle.className = "sectionTitle";
-                sectionTitle.innerHTML = jsonObject.title;
-                section.appendChild(sectionTitle);
+            if (streamedSections.length > 0) {
+                page.classList.add("hidden");
+            }
 
-                const sectionContent = document.createElement("div");
-                sectionContent.className = "sectionContent";
-                section.appendChild(sectionContent);
+            streamedSections.push(jsonObject);
+        } else {
+            for (let section of streamedSections) {
+                if (section.id == jsonObject.parent_id) {
+                    if (section.subsections != null) {
+                        section.subsections.push(jsonObject);
+                    } else {
+                        section.subsections = [jsonObject];
+                    }
 
-                if (jsonObject.content_html != null) {
-                    sectionContent.innerHTML = jsonObject.content_html;
+                    break;
                 }
             }
+
+            parent = document.getElementById(jsonObject.parent_id);
+            page = parent.closest(".page");
         }
-    };
 
-    eventSource.onerror = function (error) {
-        if (isNew) {
-            makeTOC(sections);
-            getRelatedTopics();
+        const section = document.createElement("section");
+        section.id = jsonObject.id;
+        section.setAttribute("data-section-id", `s-${jsonObject.id}`);
+        page.appendChild(section);
+
+        if (isSubsection) {
+            section.className = "sub";
         } else {
-            accuracyNotice.classList.remove("hidden");
-            entryProgressIndicator.classList.add("hidden");
+            section.className = "super";
+        }
 
-            if (entryHasRelatedTopics()) {
-                relatedTopicsContainer.classList.remove("hidden");
+        const sectionTitle = document.createElement("h2");
+        sectionTitle.className = "sectionTitle";
+        sectionTitle.innerHTML = jsonObject.title;
+        section.appendChild(sectionTitle);
+
+        const sectionContent = document.createElement("div");
+        sectionContent.className = "sectionContent";
+        section.appendChild(sectionContent);
+
+        const contentHTML = sectionFragmentHTML(jsonObject) ?? sectionContentHTML(jsonObject);
+        if (contentHTML != null) {
+            sectionContent.innerHTML = contentHTML;
+        }
+    }
+}
+
+// Everything the page waits for arrives on one stream, as events of the type of their source: "sections"
+// (a new entry's ToC and first section), "cover_image", "related_topics" and "header", and "section" for the
+// sections asked for by command (see sendEntryChannelCommand). A "done" event names each source once it's done.
+function openEntryChannel(sources) {
+    const entryID = document.querySelector("article").getAttribute("id");
+    const eventSource = new EventSource(`/e/${entryID}/events?render=${renderMode}&sources=${sources.join(",")}`);
+    entryChannel = eventSource;
+    entryChannelID = null;
+    entryChannelSources = sources;
+
+    const listen = function (type, handler) {
+        eventSource.addEventListener(type, function (event) {
+            if (event.lastEventId) {
+                entryChannelLastEventID = event.lastEventId;
             }
+            entryChannelReconnects = 0;
+
+            handler(JSON.parse(event.data));
+        });
+    };
+
+    listen("ready", function (jsonObject) {
+        entryChannelID = jsonObject.id;
+
+        const commands = entryChannelCommands;
+        entryChannelCommands = Array();
+        commands.forEach(command => sendEntryChannelCommand(command));
+    });
+    listen("sections", handleSectionsEvent);
+    listen("section", handleSectionEvent);
+    listen("cover_image", handleCoverImageEvent);
+    listen("related_topics", handleRelatedTopicEvent);
+    listen("header", handleHeaderEvent);
+    listen("done", handleDoneEvent);
+
+    // The stream closes after a while with nothing to send. A section that was asked for meanwhile is asked for again.
+    eventSource.addEventListener("close", function () {
+        const sectionID = loadingSectionID;
+        closeEntryChannel();
+
+        if (sectionID != null) {
+            sendEntryChannelCommand({command: "make_section", section_id: sectionID});
         }
+    });
 
-        insertFunFacts();
+    eventSource.onerror = function (error) {
+        if (eventSource.readyState === EventSource.CONNECTING && entryChannelReconnects < maxStreamReconnects) {
+            // The browser reconnects by itself and the sources pick up after the last event it got.
+            // The section being loaded is asked for again once the stream is ready.
+            entryChannelReconnects++;
+            entryChannelID = null;
+            restartStreamedSections();
+
+            if (loadingSectionID != null) {
+                entryChannelCommands = entryChannelCommands.filter(command => command.section_id !== loadingSectionID);
+                entryChannelCommands.push({
+                    command: "make_section",
+                    last_event_id: entryChannelLastEventID,
+                    section_id: loadingSectionID
+                });
+            }
+            return;
+        }
 
         console.error("EventSource failed:", error);
-        eventSource.close();
+        closeEntryChannel();
+
+        if (entryChannelSources.includes("sections")) {
+            finishSections();
+        }
+
+        if (entryChannelSources.includes("cover_image")) {
+            finishCoverImage();
+        }
+
+        if (loadingSectionID != null) {
+            finishSection();
+        }
     };
 }
 
+// Commands go to the entry's event stream, which is opened (again) if need be.
+function sendEntryChannelCommand(command) {
+    if (entryChannel == null) {
+        entryChannelCommands.push(command);
+        openEntryChannel(Array());
+    } else if (entryChannelID == null) {
+        entryChannelCommands.push(command);
+    } else {
+        const entryID = document.querySelector("article").getAttribute("id");
+
+        fetch(`/e/${entryID}/events/${entryChannelID}/commands`, {
+            body: JSON.stringify(command),
+            headers: {"Content-Type": "application/json"},
+            method: "POST"
+        })
+            .then(response => {
+                if (!response.ok) {
+                    console.error("Command failed:", response.status);
+                    finishSection();
+                }
+            })
+            .catch(error => {
+                console.error("Error:", error);
+                finishSection();
+            });
+    }
+}
+
 function handleNewEntryRequest(topic) {
     if (topic != null && topic.length > 0) {
         const queryString = `proficiency=${encodeURIComponent(proficiency)}&topic=${encodeURIComponent(topic)}`;
@@ -914,6 +1121,20 @@ function setUpPage() {
     setUpPageEventListeners();
     // --
     insertFunFacts();
+
+    const sources = Array();
+    if (document.querySelectorAll("article .content .page").length == 0) { // A new entry.
+        sources.push("sections", "cover_image", "related_topics");
+    }
+
+    if (!entryHasHeader()) {
+        sources.push("header");
+    }
+
+    if (sources.length > 0) {
+        openEntryChannel(sources);
+    }
+
     activatePage(0);
 }
 
@@ -937,6 +1158,8 @@ function setUpPageBindings() {
     relatedTopics = document.querySelector("#relatedTopics ul");
     relatedTopicsContainer = document.querySelector("#relatedTopics");
     selectionPopup = document.querySelector("#selectionPopup");
+    stats = document.querySelector("#stats dl");
+    summary = document.querySelector("#summary");
     toc = document.querySelector("#toc");
 }
 
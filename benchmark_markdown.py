@@ -0,0 +1,178 @@
+"""
+Microbenchmarks of Markdown rendering.
+
+- Render: a new `Markdown` instance per document, as `markdown.markdown`
+  makes, against one instance that is reset between documents, as
+  app/modules/rendering.py keeps per thread.
+- Read path: getting a document's HTML from a stored column, from the
+  rendered HTML cache used with MARKDOWN_ONLY_STORAGE (hashing the Markdown
+  and looking it up), and by rendering it on a cache miss.
+- Hub lag: how long the gevent hub goes without serving other greenlets
+  while long documents are rendered, inline and in a process pool with a
+  cooperative wait, as render_markdown does past
+  MARKDOWN_PROCESS_POOL_THRESHOLD.
+
+It doesn't import the app, so it runs anywhere the requirements are
+installed:
+
+    python benchmark_markdown.py --iterations 2000
+
+The extensions are those of the section profile.
+"""
+
+import argparse
+from collections import OrderedDict
+import concurrent.futures
+import hashlib
+import multiprocessing
+import time
+
+import gevent
+from gevent.event import AsyncResult
+import markdown
+
+
+EXTENSIONS = ["footnotes", "pymdownx.superfences", "tables"]
+EXTENSION_CONFIGS = {
+    "pymdownx.highlight": {
+        "auto_title": True,
+        "auto_title_map": {
+            "Python Console Session": "Python"
+        }
+    }
+}
+
+DOCUMENTS = {
+    "stat": "**1.4 billion**",
+    "chat": (
+        "A list comprehension builds a list in a single expression[^1]:\n\n"
+        "```python\nsquares = [n * n for n in range(10)]\n```\n\n"
+        "[^1]: See the Python tutorial."
+    ),
+    "section": "\n\n".join([
+        "Photosynthesis converts light energy into chemical energy, storing it in glucose.",
+        "| Stage | Location | Products |\n| --- | --- | --- |\n"
+        "| Light reactions | Thylakoids | ATP, NADPH, O2 |\n"
+        "| Calvin cycle | Stroma | G3P |",
+        "```python\ndef rate(light, co2):\n    return min(light, co2) * 0.8\n```",
+        "Most plants fix carbon through the C3 pathway[^1].",
+        "[^1]: C4 and CAM plants are the exceptions."
+    ] * 3)
+}
+
+
+####################
+# MODULE FUNCTIONS #
+####################
+
+
+def measure_hub_lag(render, text: str, renders: int, concurrency: int) -> tuple[float, float]:
+    """
+    Returns the wall time of the renders and the longest the hub went
+    without running a greenlet that ticks every millisecond.
+    """
+
+    lags = []
+
+    def tick() -> None:
+        while True:
+            start_time = time.perf_counter()
+            gevent.sleep(0.001)
+            lags.append(time.perf_counter() - start_time - 0.001)
+
+    ticker = gevent.spawn(tick)
+    gevent.sleep(0.01)
+    start_time = time.perf_counter()
+    gevent.joinall([
+        gevent.spawn(lambda: [render(text) for _ in range(renders // concurrency)])
+        for _ in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start_time
+    gevent.sleep(0.01)
+    ticker.kill()
+    return (elapsed, max(lags))
+
+
+def render_in_process(text: str) -> str:
+    return markdown.markdown(text, extensions=EXTENSIONS, extension_configs=EXTENSION_CONFIGS)
+
+
+def time_per_render(render, text: str, iterations: int) -> float:
+    render(text)
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        render(text)
+    return (time.perf_counter() - start_time) / iterations
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Markdown rendering microbenchmark.")
+    parser.add_argument("--iterations", default=1000, type=int)
+    parser.add_argument("--hub-renders", default=16, type=int,
+                        help="Long documents rendered for the hub lag measurement.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    instance = markdown.Markdown(extensions=EXTENSIONS, extension_configs=EXTENSION_CONFIGS)
+
+    def render_new(text: str) -> str:
+        return markdown.markdown(text, extensions=EXTENSIONS, extension_configs=EXTENSION_CONFIGS)
+
+    def render_reused(text: str) -> str:
+        html = instance.convert(text)
+        instance.reset()
+        return html
+
+    print(f"{'document':<10}{'new (us)':>12}{'reused (us)':>14}{'saved':>9}")
+    for name, text in DOCUMENTS.items():
+        assert render_new(text) == render_reused(text)
+        new = time_per_render(render_new, text, args.iterations)
+        reused = time_per_render(render_reused, text, args.iterations)
+        print(f"{name:<10}{new * 1e6:>12.1f}{reused * 1e6:>14.1f}{1 - reused / new:>9.0%}")
+
+    cache = OrderedDict()
+    stored = {text: render_reused(text) for text in DOCUMENTS.values()}
+
+    def read_cached(text: str) -> str:
+        key = (hashlib.sha256(text.encode("utf-8")).digest(), "section", 1)
+        html = cache.get(key)
+        if html is None:
+            html = render_reused(text)
+            cache[key] = html
+        cache.move_to_end(key)
+        return html
+
+    print()
+    print(f"{'document':<10}{'stored (us)':>13}{'cache hit (us)':>16}{'miss (us)':>11}")
+    for name, text in DOCUMENTS.items():
+        stored_time = time_per_render(stored.get, text, args.iterations)
+        hit = time_per_render(read_cached, text, args.iterations)
+        miss = time_per_render(render_reused, text, args.iterations)
+        print(f"{name:<10}{stored_time * 1e6:>13.2f}{hit * 1e6:>16.2f}{miss * 1e6:>11.1f}")
+
+    long_text = DOCUMENTS["section"] * 8
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("fork"))
+
+    def render_pooled(text: str) -> str:
+        done = AsyncResult()
+        watcher = gevent.get_hub().loop.async_()
+        watcher.start(done.set)
+        try:
+            future = executor.submit(render_in_process, text)
+            future.add_done_callback(lambda _: watcher.send())
+            done.get()
+        finally:
+            watcher.close()
+        return future.result()
+
+    render_pooled(long_text)  # Start the workers.
+    print()
+    print(f"Hub lag over {args.hub_renders} renders of {len(long_text)} characters, 4 at a time:")
+    print(f"{'':<10}{'wall (s)':>10}{'max lag (ms)':>14}")
+    for name, render in (("inline", render_reused), ("pool", render_pooled)):
+        elapsed, lag = measure_hub_lag(render, long_text, args.hub_renders, 4)
+        print(f"{name:<10}{elapsed:>10.2f}{lag * 1e3:>14.1f}")
+    executor.shutdown()
@@ -0,0 +1,174 @@
+"""
+Throughput of JSON serialization over a 50-section entry.
+
+- Sections: each section of the entry as a server-sent event, with
+  `json.dumps` of its `as_dict()` into an f-string, as the streams used to
+  be built, against orjson straight to bytes, as app/modules/serialization.py
+  does.
+- Fragments: the events of a section streamed in fragments, built from the
+  section's dict per fragment, against an encoder that encodes the section's
+  fields once (`SSEFragmentEncoder`).
+- Entry: the whole entry as one JSON document, as for the `/api/v1`
+  responses.
+
+It doesn't import the app, so it runs anywhere the requirements are
+installed:
+
+    python benchmark_serialization.py --iterations 200
+"""
+
+import argparse
+from datetime import datetime, timezone
+import json
+import time
+import uuid
+
+import orjson
+
+
+SECTION_COUNT = 50
+SUBSECTIONS_PER_SECTION = 3
+FRAGMENTS_PER_SECTION = 12
+
+
+class Section:
+    def __init__(self,
+                 entry_id: uuid.UUID,
+                 index: int,
+                 parent_id: uuid.UUID = None) -> None:
+        self.content_md = "Photosynthesis converts light energy into chemical energy. " * 20
+        self.content_html = f"<p>{self.content_md}</p>"
+        self.entry_id = entry_id
+        self.id = uuid.uuid4()
+        self.index = index
+        self.parent_id = parent_id
+        self.subsections = []
+        self.title = f"Section {index}"
+
+    def as_dict(self,
+                include_subsections: bool = True) -> dict:
+        serialized = {
+            "entry_id": str(self.entry_id),
+            "id": str(self.id),
+            "index": self.index,
+            "title": self.title,
+            "content_html": self.content_html,
+            "content_md": self.content_md
+        }
+
+        if self.parent_id:
+            serialized["parent_id"] = str(self.parent_id)
+
+        if include_subsections and self.subsections:
+            serialized["subsections"] = [subsection.as_dict() for subsection in self.subsections]
+
+        return serialized
+
+
+class Entry:
+    def __init__(self) -> None:
+        self.creation_timestamp = datetime.now(timezone.utc)
+        self.id = uuid.uuid4()
+        self.sections = []
+        for i in range(SECTION_COUNT):
+            section = Section(self.id, i)
+            section.subsections = [Section(self.id, j, section.id) for j in range(SUBSECTIONS_PER_SECTION)]
+            self.sections.append(section)
+
+    def as_dict(self) -> dict:
+        return {
+            "creation_date": self.creation_timestamp.strftime("%e %b %Y"),
+            "creation_timestamp": self.creation_timestamp.astimezone().isoformat(),
+            "id": str(self.id),
+            "sections": [section.as_dict() for section in self.sections],
+            "topic": "Photosynthesis"
+        }
+
+
+class SSEFragmentEncoder:
+    # The same as app/modules/serialization.py's.
+    def __init__(self,
+                 fields: dict,
+                 key: str) -> None:
+        fields = {k: v for k, v in fields.items() if k != key}
+        head = orjson.dumps(fields)[:-1] + (b"," if fields else b"")
+        self._prefix = b"data: " + head + orjson.dumps(key) + b":"
+
+    def encode(self,
+               value) -> bytes:
+        return self._prefix + orjson.dumps(value) + b"}\n\n"
+
+
+def fragment_fields(section: Section) -> dict:
+    serialized = section.as_dict(include_subsections=False)
+    serialized.pop("content_html")
+    serialized.pop("content_md")
+    return serialized
+
+
+def run(name: str,
+        func,
+        iterations: int) -> None:
+    func()
+    size = 0
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        size = func()
+    elapsed = time.perf_counter() - start_time
+    print(f"  {name:<32} {iterations / elapsed:>10.1f} entries/s  {size * iterations / elapsed / 1e6:>8.1f} MB/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    entry = Entry()
+    parts = [part for section in entry.sections for part in [section] + section.subsections]
+    fragment = "<p>Photosynthesis converts light energy into chemical energy.</p>"
+
+    def sections_json() -> int:
+        return sum(len(f"data: {json.dumps(part.as_dict(include_subsections=False))}\n\n".encode("utf-8"))
+                   for part in parts)
+
+    def sections_orjson() -> int:
+        return sum(len(b"data: " + orjson.dumps(part.as_dict(include_subsections=False)) + b"\n\n")
+                   for part in parts)
+
+    def fragments_json() -> int:
+        size = 0
+        for part in parts:
+            for _ in range(FRAGMENTS_PER_SECTION):
+                serialized = fragment_fields(part)
+                serialized["fragment_html"] = fragment
+                size += len(f"data: {json.dumps(serialized)}\n\n".encode("utf-8"))
+        return size
+
+    def fragments_encoder() -> int:
+        size = 0
+        for part in parts:
+            encoder = SSEFragmentEncoder(fragment_fields(part), "fragment_html")
+            for _ in range(FRAGMENTS_PER_SECTION):
+                size += len(encoder.encode(fragment))
+        return size
+
+    def entry_json() -> int:
+        return len(json.dumps(entry.as_dict()).encode("utf-8"))
+
+    def entry_orjson() -> int:
+        return len(orjson.dumps(entry.as_dict()))
+
+    print(f"{SECTION_COUNT} sections, {len(parts)} parts, {FRAGMENTS_PER_SECTION} fragments per part")
+    print("Section events:")
+    run("json.dumps", sections_json, args.iterations)
+    run("orjson", sections_orjson, args.iterations)
+    print("Fragment events:")
+    run("json.dumps per fragment", fragments_json, args.iterations)
+    run("orjson, fields encoded once", fragments_encoder, args.iterations)
+    print("Whole entry:")
+    run("json.dumps", entry_json, args.iterations)
+    run("orjson", entry_orjson, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
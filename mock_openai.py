@@ -0,0 +1,390 @@
+"""
+A stand-in for the OpenAI chat completions API, for load testing without
+paying for (or being rate limited by) the real thing.
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8100/v1 and run:
+
+    python mock_openai.py --latency lognormal:0.5,0.4 --error-rate 0.02 --rate-limit 600
+
+Responses are canned but shaped like the real ones: JSON mode requests get
+a document generated from the JSON schema in the prompt, entry title
+requests get a title, and everything else gets Markdown prose.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Any, Callable, Iterator
+
+from flask import Flask, Response, jsonify, request
+
+
+###########
+# CLASSES #
+###########
+
+
+class RateLimiter:
+    """
+    A token bucket that allows the given number of requests per minute.
+    """
+
+    def __init__(self,
+                 requests_per_minute: int) -> None:
+        self.capacity: float = float(requests_per_minute)
+        self.rate: float = requests_per_minute / 60
+        self.tokens: float = self.capacity
+        self.updated: float = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Takes a token and returns 0, or returns how many seconds to wait for
+        the next one.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+####################
+# MODULE FUNCTIONS #
+####################
+
+
+def make_latency_sampler(spec: str) -> Callable[[], float]:
+    """
+    Parses a latency distribution in seconds, e.g. 'fixed:1', 'uniform:0.5,3',
+    'normal:2,0.5' or 'lognormal:0.5,0.4' (mu and sigma of the underlying normal).
+    """
+
+    name, _, args = spec.partition(":")
+    params = [float(arg) for arg in args.split(",") if arg]
+    if name == "fixed":
+        return lambda: params[0]
+    elif name == "uniform":
+        return lambda: random.uniform(params[0], params[1])
+    elif name == "normal":
+        return lambda: max(0.0, random.gauss(params[0], params[1]))
+    elif name == "lognormal":
+        return lambda: random.lognormvariate(params[0], params[1])
+    raise ValueError(f"Unknown latency distribution: '{spec}'.")
+
+
+def error_response(status: int,
+                   message: str,
+                   error_type: str,
+                   code: str = None,
+                   headers: dict = None) -> Response:
+    response = jsonify({
+        "error": {
+            "message": message,
+            "type": error_type,
+            "param": None,
+            "code": code
+        }
+    })
+    response.status_code = status
+    if headers:
+        response.headers.update(headers)
+    return response
+
+
+def count_tokens(text: str) -> int:
+    # Roughly four characters per token, which is close enough for load testing.
+    return max(1, math.ceil(len(text) / 4))
+
+
+def find_topic(messages: list[dict]) -> str:
+    for message in reversed(messages):
+        content = message.get("content") or ""
+        match = re.search(r"^(?:Entry Topic|Snippet):\s*\"?(.+?)\"?\s*$", content, re.M)
+        if match:
+            return match.group(1)
+    return "the topic"
+
+
+def generate_from_schema(schema: dict,
+                         root: dict,
+                         topic: str,
+                         name: str = "",
+                         index: int = 0) -> Any:
+    if "$ref" in schema:
+        schema = root["$defs"][schema["$ref"].rsplit("/", 1)[-1]]
+    elif "anyOf" in schema:
+        schema = schema["anyOf"][0]
+    elif "allOf" in schema:
+        schema = schema["allOf"][0]
+
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        return {
+            key: generate_from_schema(value, root, topic, name=key, index=index)
+            for key, value in schema.get("properties", {}).items()
+        }
+    elif schema_type == "array":
+        count = max(schema.get("minItems", 0), 3 if name == "subsections" else 5)
+        return [generate_from_schema(schema.get("items", {}), root, topic, name=name, index=i) for i in range(count)]
+    elif schema_type == "integer":
+        return index
+    elif schema_type == "number":
+        return float(index)
+    elif schema_type == "boolean":
+        return True
+    elif schema_type == "null":
+        return None
+    return make_string(name, topic, index)
+
+
+def make_markdown(topic: str,
+                  title: str) -> str:
+    return (
+        f"{title} is a central part of understanding **{topic}**. "
+        f"This mock section stands in for the real thing so that load tests exercise the full rendering path.\n\n"
+        f"### Key Points\n\n"
+        f"- The first point about {topic}.\n"
+        f"- A second point, with *emphasis* and `inline code`.\n"
+        f"- A third point that links back to {title.lower()}.\n\n"
+        f"| Aspect | Detail |\n"
+        f"| ------ | ------ |\n"
+        f"| Origin | Somewhere interesting |\n"
+        f"| Scale | Considerable |\n\n"
+        f"```python\n"
+        f"def describe(topic):\n"
+        f"    return f\"{{topic}} is fascinating\"\n"
+        f"```\n\n"
+        f"In short, {topic} rewards further reading.[^1]\n\n"
+        f"[^1]: A mock footnote."
+    )
+
+
+def make_string(name: str,
+                topic: str,
+                index: int) -> str:
+    if name == "summary":
+        return (
+            f"{topic} is a subject of lasting interest. This mock summary gives a brief overview "
+            f"of its origins, its significance and why readers keep coming back to it."
+        )
+    elif name == "fun_facts":
+        return f"Fun fact number {index + 1} about {topic} is surprisingly true."
+    elif name == "related_topics":
+        return f"{topic} and Related Idea {index + 1}"
+    elif name == "name":
+        return f"Statistic {index + 1}"
+    elif name == "value":
+        return f"**{(index + 1) * 42:,}**"
+    elif name == "title":
+        return f"Aspect {index + 1} of {topic}"
+    return f"{name or 'value'} {index + 1}"
+
+
+def make_content(body: dict) -> str:
+    messages: list[dict] = body.get("messages") or []
+    system_prompt = " ".join(message.get("content") or "" for message in messages if message.get("role") == "system")
+    topic = find_topic(messages)
+
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_object":
+        match = re.search(r"JSON schema: (\{.*\})", system_prompt, re.S)
+        if match:
+            schema = json.loads(match.group(1))
+            return json.dumps(generate_from_schema(schema, schema, topic))
+        return "{}"
+
+    if "entry title" in system_prompt:
+        return topic.strip().title()
+    elif "brief summary" in system_prompt:
+        return make_string("summary", topic, 0)
+
+    section_title = topic
+    for message in messages:
+        match = re.search(r"^Section Title:\s*(.+)$", message.get("content") or "", re.M)
+        if match:
+            section_title = match.group(1)
+    return make_markdown(topic, section_title)
+
+
+def stream_content(completion_id: str,
+                   model: str,
+                   content: str,
+                   chunk_delay: float,
+                   prompt_tokens: int,
+                   include_usage: bool = False) -> Iterator[str]:
+    """
+    Like the real thing, with `stream_options.include_usage` every chunk has
+    a null usage, and a last chunk without choices carries the usage.
+    """
+
+    created = int(time.time())
+
+    def chunk(delta: dict | None, finish_reason: str = None, usage: dict = None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        if include_usage:
+            payload["usage"] = usage
+        return f"data: {json.dumps(payload)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    for piece in re.findall(r"\S+\s*|\s+", content):
+        if chunk_delay:
+            time.sleep(chunk_delay)
+        yield chunk({"content": piece})
+    yield chunk({}, finish_reason="stop")
+    if include_usage:
+        completion_tokens = count_tokens(content)
+        yield chunk(None, usage={
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        })
+    yield "data: [DONE]\n\n"
+
+
+def make_embedding(text: str,
+                   dimensions: int = 1536) -> list[float]:
+    """
+    A normalized bag of hashed words, so that texts sharing most of their
+    words get similar embeddings, like with the real thing.
+    """
+
+    vector = [0.0] * dimensions
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dimensions] += 1.0 if digest[4] % 2 else -1.0
+
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def make_app(args: argparse.Namespace) -> Flask:
+    app = Flask(__name__)
+    sample_latency = make_latency_sampler(args.latency)
+    rate_limiter = RateLimiter(args.rate_limit) if args.rate_limit else None
+
+    @app.route("/v1/models", methods=["GET"])
+    def models() -> Response:
+        return jsonify({"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+
+    @app.route("/v1/embeddings", methods=["POST"])
+    def embeddings() -> Response:
+        body: dict = request.get_json(force=True)
+        inputs = body.get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+
+        time.sleep(sample_latency() / 10)  # Embeddings are much faster than completions.
+        prompt_tokens = sum(count_tokens(text) for text in inputs)
+        return jsonify({
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": make_embedding(text)}
+                for i, text in enumerate(inputs)
+            ],
+            "model": body.get("model", "mock"),
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens}
+        })
+
+    @app.route("/v1/chat/completions", methods=["POST"])
+    def chat_completions() -> Response:
+        body: dict = request.get_json(force=True)
+
+        if rate_limiter:
+            retry_after = rate_limiter.acquire()
+            if retry_after:
+                return error_response(
+                    429,
+                    "Rate limit reached for requests.",
+                    "requests",
+                    code="rate_limit_exceeded",
+                    headers={"retry-after": str(math.ceil(retry_after))}
+                )
+
+        roll = random.random()
+        if roll < args.timeout_rate:
+            # Outlast the client's timeout.
+            time.sleep(args.timeout_seconds)
+        elif roll < args.timeout_rate + args.error_rate:
+            return error_response(500, "The server had an error while processing your request.", "server_error")
+
+        time.sleep(sample_latency())
+
+        model = body.get("model", "mock")
+        content = make_content(body)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        prompt_tokens = sum(count_tokens(message.get("content") or "") for message in body.get("messages") or [])
+        if body.get("stream"):
+            return Response(
+                stream_content(
+                    completion_id,
+                    model,
+                    content,
+                    args.chunk_delay,
+                    prompt_tokens,
+                    include_usage=bool((body.get("stream_options") or {}).get("include_usage"))
+                ),
+                content_type="text/event-stream"
+            )
+
+        completion_tokens = count_tokens(content)
+        return jsonify({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+    return app
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", default=8100, type=int)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="Time to first token in seconds: fixed:S, uniform:LO,HI, normal:MEAN,SD or lognormal:MU,SIGMA.")
+    parser.add_argument("--chunk-delay", default=0.01, type=float,
+                        help="Seconds between streamed chunks.")
+    parser.add_argument("--error-rate", default=0.0, type=float,
+                        help="Fraction of requests that fail with a 500.")
+    parser.add_argument("--timeout-rate", default=0.0, type=float,
+                        help="Fraction of requests that hang for --timeout-seconds.")
+    parser.add_argument("--timeout-seconds", default=120.0, type=float)
+    parser.add_argument("--rate-limit", default=0, type=int,
+                        help="Requests per minute before answering with a 429. 0 disables it.")
+    parser.add_argument("--seed", default=None, type=int)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    make_app(args).run(host=args.host, port=args.port, threaded=True)
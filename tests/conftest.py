@@ -0,0 +1,19 @@
+"""
+Importing the `app` package starts the whole web app, uWSGI's event loop
+included, so the tests import its modules through a bare package instead.
+Tests that call the LLM set `llm_router` on the modules they test.
+"""
+
+import os
+import sys
+import types
+
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+if "app" not in sys.modules:
+    app = types.ModuleType("app")
+    app.__path__ = [APP_DIR]
+    app.APP_ROOT = APP_DIR
+    app.llm_router = None
+    sys.modules["app"] = app
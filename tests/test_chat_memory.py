@@ -0,0 +1,119 @@
+"""
+The rolling summary of an entry chat, with the LLM behind a router that
+summarizes by listing what it was given.
+"""
+
+import time
+
+import pytest
+from openai.types.chat import ChatCompletion
+
+from app.config import ChatMessageSenderRole, Configuration, LLMTask
+from app.llm import gpt
+from app.modules.chat_memory import ChatMemory
+from app.modules.chat_message import ChatMessage
+
+
+class StubBackend:
+    name = "stub"
+
+
+class StubRouter:
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, dict]] = []
+
+    def create_completion(self,
+                          task: str,
+                          **kwargs) -> tuple[ChatCompletion, StubBackend]:
+        self.calls.append((task, kwargs))
+        if task == LLMTask.CHAT_SUMMARY.value:
+            # The prompt has the summary so far and the new messages.
+            content = "Summary of: " + kwargs["messages"][-1]["content"]
+        else:
+            content = "A reply."
+
+        response = ChatCompletion.model_validate({
+            "id": "chatcmpl-stub",
+            "choices": [{
+                "finish_reason": "stop",
+                "index": 0,
+                "message": {"content": content, "role": "assistant"}
+            }],
+            "created": int(time.time()),
+            "model": kwargs.get("model") or "stub",
+            "object": "chat.completion"
+        })
+        return (response, StubBackend())
+
+
+def make_message(role: ChatMessageSenderRole,
+                 content_md: str) -> ChatMessage:
+    message = ChatMessage()
+    message.content_md = content_md
+    message.sender_role = role
+    return message
+
+
+def wait_for_summary(memory: ChatMemory,
+                     timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while memory._summarizing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def router(monkeypatch: pytest.MonkeyPatch) -> StubRouter:
+    router = StubRouter()
+    monkeypatch.setattr(gpt, "llm_router", router)
+    # The tokenizer's encodings are downloaded on first use.
+    monkeypatch.setattr(gpt, "num_tokens_from_messages", lambda messages, model=None: 100)
+    monkeypatch.setattr(Configuration, "LLM_TELEMETRY_SAMPLE_RATE", 0)
+    return router
+
+
+def test_turns_past_the_window_are_summarized(router: StubRouter) -> None:
+    memory = ChatMemory("Topic", recent_turns=1)
+    for i in range(3):
+        memory.append(make_message(ChatMessageSenderRole.USER, f"Question {i}?"))
+        memory.append(make_message(ChatMessageSenderRole.ASSISTANT, f"Answer {i}."))
+        memory.summarize()
+        wait_for_summary(memory)
+
+    summary, messages = memory.get_context()
+    assert memory.summarized_count == 4
+    assert "Question 0?" in summary and "Answer 1." in summary
+    assert [message.content_md for message in messages] == ["Question 2?", "Answer 2."]
+
+    messages.append(make_message(ChatMessageSenderRole.USER, "Question 3?"))
+    gpt.get_entry_chat_completion(
+        context="Selected text",
+        proficiency="Beginner",
+        section_md="Section text.",
+        topic="Topic",
+        messages=messages,
+        summary=summary
+    )
+
+    task, kwargs = router.calls[-1]
+    prompt = "\n".join(message["content"] for message in kwargs["messages"])
+    assert task == LLMTask.CHAT.value
+    assert summary in prompt
+    # The summarized turns are only in the summary, and the rest are verbatim.
+    verbatim = prompt.replace(summary, "")
+    assert "Question 0?" not in verbatim and "Answer 1." not in verbatim
+    assert "Question 2?" in verbatim and "Question 3?" in verbatim
+
+
+def test_summary_is_kept_when_it_cannot_be_made(router: StubRouter,
+                                                monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(gpt, "get_entry_chat_summary", lambda topic, summary, messages: None)
+    memory = ChatMemory("Topic", recent_turns=1)
+    for i in range(2):
+        memory.append(make_message(ChatMessageSenderRole.USER, f"Question {i}?"))
+        memory.append(make_message(ChatMessageSenderRole.ASSISTANT, f"Answer {i}."))
+    memory.summarize()
+    wait_for_summary(memory)
+
+    summary, messages = memory.get_context()
+    assert summary is None
+    assert len(messages) == 4
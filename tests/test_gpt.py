@@ -0,0 +1,86 @@
+"""
+The entry chat's calls to the LLM, against a router that answers every
+call with a fixed reply.
+"""
+
+import time
+
+import pytest
+from openai.types.chat import ChatCompletion
+
+from app.config import ChatMessageSenderRole, Configuration
+from app.llm import gpt
+from app.modules.chat_message import ChatMessage
+
+
+class StubBackend:
+    name = "stub"
+
+
+class StubRouter:
+    def __init__(self,
+                 reply: str) -> None:
+        self.calls: list[dict] = []
+        self.reply: str = reply
+
+    def create_completion(self,
+                          task: str,
+                          **kwargs) -> tuple[ChatCompletion, StubBackend]:
+        self.calls.append(kwargs)
+        response = ChatCompletion.model_validate({
+            "id": "chatcmpl-stub",
+            "choices": [{
+                "finish_reason": "stop",
+                "index": 0,
+                "message": {"content": self.reply, "role": "assistant"}
+            }],
+            "created": int(time.time()),
+            "model": kwargs.get("model") or "stub",
+            "object": "chat.completion",
+            "usage": {"completion_tokens": 1, "prompt_tokens": 1, "total_tokens": 2}
+        })
+        return (response, StubBackend())
+
+
+def make_message(role: ChatMessageSenderRole,
+                 content_md: str) -> ChatMessage:
+    message = ChatMessage()
+    message.content_md = content_md
+    message.sender_role = role
+    return message
+
+
+@pytest.fixture
+def router(monkeypatch: pytest.MonkeyPatch) -> StubRouter:
+    router = StubRouter("A reply.")
+    monkeypatch.setattr(gpt, "llm_router", router)
+    # The tokenizer's encodings are downloaded on first use.
+    monkeypatch.setattr(gpt, "num_tokens_from_messages", lambda messages, model=None: 100)
+    monkeypatch.setattr(Configuration, "LLM_TELEMETRY_SAMPLE_RATE", 0)
+    return router
+
+
+def test_get_entry_chat_completion(router: StubRouter) -> None:
+    response = gpt.get_entry_chat_completion(
+        context="Selected text",
+        proficiency="Beginner",
+        section_md="Section text.",
+        topic="Topic",
+        messages=[make_message(ChatMessageSenderRole.USER, "A question?")]
+    )
+
+    assert response == "A reply."
+    assert len(router.calls) == 1
+    assert router.calls[0]["max_tokens"] > 0
+
+
+def test_get_entry_chat_summary(router: StubRouter) -> None:
+    summary = gpt.get_entry_chat_summary(
+        "Topic",
+        None,
+        [make_message(ChatMessageSenderRole.USER, "A question?"), make_message(ChatMessageSenderRole.ASSISTANT, "An answer.")]
+    )
+
+    assert summary == "A reply."
+    assert len(router.calls) == 1
+    assert "A question?" in router.calls[0]["messages"][-1]["content"]
@@ -0,0 +1,59 @@
+"""
+Lenient parsing of LLM JSON, against a corpus of malformed outputs.
+
+Each case in fixtures/json_repair is a raw output (.txt) and what it should
+parse to (.json): an instance of the named schema, None if it can't be
+repaired into one, or without a schema, the result of `loads`.
+"""
+
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+
+TESTS_ROOT = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(TESTS_ROOT, "fixtures", "json_repair")
+LLM_DIR = os.path.join(os.path.dirname(TESTS_ROOT), "app", "llm")
+
+
+def _load_module(name: str):
+    # Importing the `app` package starts the whole web app, and these modules only need pydantic.
+    spec = importlib.util.spec_from_file_location(f"_{name}", os.path.join(LLM_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+json_repair = _load_module("json_repair")
+schemas = _load_module("schemas")
+
+CASES = sorted(name[:-4] for name in os.listdir(FIXTURES_DIR) if name.endswith(".txt"))
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_corpus(case: str) -> None:
+    with open(os.path.join(FIXTURES_DIR, f"{case}.txt"), "r", encoding="utf-8") as f:
+        text = f.read()
+    with open(os.path.join(FIXTURES_DIR, f"{case}.json"), "r", encoding="utf-8") as f:
+        fixture = json.load(f)
+
+    if fixture["schema"] is None:
+        assert json_repair.loads(text) == fixture["expected"]
+        return
+
+    result = json_repair.parse(text, getattr(schemas, fixture["schema"]))
+    if fixture["expected"] is None:
+        assert result is None
+    else:
+        assert result is not None
+        assert result.model_dump() == fixture["expected"]
+
+
+def test_loads_raises_without_json() -> None:
+    with pytest.raises(ValueError):
+        json_repair.loads("No JSON here.")
+